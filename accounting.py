@@ -0,0 +1,166 @@
+"""
+accounting.py - Per-command resource accounting for the advanced Python shell.
+
+Every stage the shell starts is reaped with os.wait4(), which returns the
+child's rusage along with its status. The executor (foreground pipelines)
+and job control (background jobs) add one record per stage to a
+ResourceStats store:
+
+    user and system CPU seconds, max RSS, voluntary and involuntary
+    context switches, wall time, pid and exit status
+
+The store keeps the newest STATS_SIZE records as tuples, plus running
+totals for each command name. When it is full, the oldest quarter is
+dropped, or appended to STATS_FILE as tab-separated lines if one is set.
+The rest of the records are written there when the shell exits.
+
+    stats [cpu|mem|wall|count] [N]   top N commands (default: by CPU)
+    stats recent [N]                 the last N stages
+    stats clear
+    time [-p] pipeline               real/user/sys of one pipeline
+
+Linux starts a child's max RSS at the peak of the memory it exec'd from,
+which after posix_spawn (vfork) is the shell's, so small commands show
+about the shell's size; so does a forked subshell running builtins. The
+reports say so under the table. In-process utilities (coreutils.py) have
+no rusage: their CPU is the thread time they used and no RSS is reported.
+With SPAWN_BACKEND=popen, only wall time and status are known.
+"""
+import os
+import time
+import threading
+
+FIELDS = ('when', 'name', 'command', 'pid', 'status', 'wall', 'utime', 'stime', 'maxrss', 'nvcsw', 'nivcsw')
+COMMAND_WIDTH = 120
+RSS_NOTE = "(max rss starts at the shell's own size for spawned commands and subshells; '-': in-process)"
+_SORT_KEYS = {'cpu': lambda t: t[2] + t[3], 'mem': lambda t: t[4], 'wall': lambda t: t[1], 'count': lambda t: t[0]}
+
+class ResourceStats:
+    """Bounded store of per-stage resource records, with running totals per command name."""
+    def __init__(self, max_records=10000, spill_path=None):
+        self.max_records = max(1, max_records)
+        self.spill_path = spill_path
+        self.records = []
+        self.totals = {}        # name -> [count, wall, user, sys, max rss]
+        self.spilled = 0
+        # parallel's worker threads and the SIGCHLD handler add records too
+        self.lock = threading.RLock()
+    def add(self, args, pid, status, wall, rusage=None, cpu=0.0):
+        """Record one reaped stage. rusage is os.wait4()'s; cpu stands in for it in-process."""
+        if rusage is not None:
+            usage = (rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss, rusage.ru_nvcsw, rusage.ru_nivcsw)
+        else:
+            usage = (cpu, 0.0, 0, 0, 0)
+        if status is not None and status < 0:
+            # Popen reports death by signal N as -N
+            status = 128 - status
+        if args:
+            name, command = os.path.basename(args[0]), ' '.join(args)[:COMMAND_WIDTH]
+        else:
+            name = command = '(subshell)'
+        record = (time.time(), name, command, pid, status, wall) + usage
+        with self.lock:
+            if len(self.records) >= self.max_records:
+                self._evict(max(1, self.max_records // 4))
+            self.records.append(record)
+            totals = self.totals.get(name)
+            if totals is None:
+                totals = self.totals[name] = [0, 0.0, 0.0, 0.0, 0]
+            totals[0] += 1
+            totals[1] += wall
+            totals[2] += usage[0]
+            totals[3] += usage[1]
+            totals[4] = max(totals[4], usage[2])
+    def add_process(self, proc, status, wall=0.0):
+        """Record a waited-for Process (spawn.py), InProcess (coreutils.py) or Popen.
+
+        wall is used when the handle did not time itself (Popen).
+        """
+        elapsed = getattr(proc, 'elapsed', None)
+        self.add(getattr(proc, 'args', None), proc.pid, status, wall if elapsed is None else elapsed,
+                 getattr(proc, 'rusage', None), getattr(proc, 'cpu', 0.0))
+    def _evict(self, count):
+        old, self.records = self.records[:count], self.records[count:]
+        self._spill(old)
+    def _spill(self, records):
+        if not self.spill_path or not records:
+            return
+        try:
+            with open(self.spill_path, 'a') as f:
+                f.writelines('\t'.join(str(value) for value in record) + '\n' for record in records)
+        except OSError as e:
+            print(f"stats: {self.spill_path}: {e.strerror}")
+            self.spill_path = None
+            return
+        self.spilled += len(records)
+    def close(self):
+        """Spill whatever is still in memory (at exit)."""
+        with self.lock:
+            if self.spill_path:
+                self._evict(len(self.records))
+    def clear(self):
+        with self.lock:
+            self.records = []
+            self.totals = {}
+    # ----- reports -----
+    def top(self, key='cpu', n=10):
+        """Rows for the n command names with the largest key ('cpu', 'mem', 'wall' or 'count')."""
+        rank = _SORT_KEYS[key]
+        return sorted(self.totals.items(), key=lambda item: rank(item[1]), reverse=True)[:n]
+    def report(self, key='cpu', n=10):
+        lines = [f"{'command':<20} {'count':>6} {'cpu s':>9} {'user s':>9} {'sys s':>9} {'wall s':>9} {'max rss':>9}"]
+        for name, (count, wall, user, system, maxrss) in self.top(key, n):
+            lines.append(f"{name[:20]:<20} {count:>6} {user + system:>9.3f} {user:>9.3f} {system:>9.3f} "
+                         f"{wall:>9.3f} {format_rss(maxrss):>9}")
+        lines.append(RSS_NOTE)
+        return '\n'.join(lines)
+    def recent(self, n=10):
+        lines = [f"{'pid':>7} {'status':>6} {'wall s':>8} {'user s':>8} {'sys s':>8} {'max rss':>8} "
+                 f"{'ctx sw':>11}  command"]
+        for _, _, command, pid, status, wall, user, system, maxrss, nvcsw, nivcsw in self.records[-n:]:
+            lines.append(f"{pid if pid else '-':>7} {status:>6} {wall:>8.3f} {user:>8.3f} {system:>8.3f} "
+                         f"{format_rss(maxrss):>8} {f'{nvcsw}/{nivcsw}':>11}  {command}")
+        lines.append(RSS_NOTE)
+        return '\n'.join(lines)
+    # ----- the stats builtin -----
+    def builtin(self, args):
+        """stats [cpu|mem|wall|count] [N] | stats recent [N] | stats clear"""
+        args = list(args)
+        op = args.pop(0) if args and not args[0].isdigit() else 'cpu'
+        if op == 'clear' and not args:
+            self.clear()
+            return 0
+        if (op in _SORT_KEYS or op == 'recent') and len(args) <= 1 and all(a.isdigit() for a in args):
+            n = int(args[0]) if args else 10
+            print(self.recent(n) if op == 'recent' else self.report(op, n))
+            return 0
+        print("Usage: stats [cpu|mem|wall|count] [N] | stats recent [N] | stats clear")
+        return 2
+
+def format_rss(kilobytes):
+    """ru_maxrss (KiB on Linux) as a short size; '-' when unknown."""
+    if not kilobytes:
+        return '-'
+    if kilobytes < 1024:
+        return f"{kilobytes}K"
+    return f"{kilobytes / 1024:.1f}M"
+
+class Timer:
+    """Wall and CPU time used by the shell and its children since creation (the time builtin)."""
+    def __init__(self):
+        import resource
+        self.resource = resource
+        self.start = self._sample()
+    def _sample(self):
+        resource = self.resource
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (time.perf_counter(), own.ru_utime + children.ru_utime, own.ru_stime + children.ru_stime)
+    def report(self, posix=False):
+        """'real/user/sys' lines as bash prints them (-p: POSIX format)."""
+        now = self._sample()
+        real, user, system = (b - a for a, b in zip(self.start, now))
+        if posix:
+            return f"real {real:.2f}\nuser {user:.2f}\nsys {system:.2f}\n"
+        return '\n' + ''.join(f"{label}\t{int(value // 60)}m{value % 60:.3f}s\n"
+                              for label, value in (('real', real), ('user', user), ('sys', system)))
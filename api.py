@@ -0,0 +1,312 @@
+"""
+api.py - Embeddable Python API for running shell pipelines.
+
+    from api import Shell
+
+    shell = Shell(max_concurrency=100)
+    result = await shell.run("ls | grep py", capture=True, timeout=5)
+    async for line in shell.stream("tail -n 100 log.txt | grep ERROR"):
+        ...
+    shell.run_sync("make test", check=True)
+
+Commands are parsed and launched by the same parser and executor as the
+interactive shell, with no interpreter startup per call. Nothing blocks the
+event loop: output is read through asyncio pipe transports and each process
+exit is awaited on a pidfd (polled where pidfds are unavailable), so
+hundreds of pipelines can run from one loop without a thread per command.
+Each call is independent: lists, compound commands, lines with $(...) and
+pipelines that use a builtin or shell function run in a forked subshell, so
+builtins such as cd or export never change the host process and a command
+substitution never blocks the loop.
+"""
+import io
+import os
+import sys
+import signal
+import asyncio
+import weakref
+from parser import CommandParser
+from executor import CommandExecutor
+from shell_builtins import Builtins
+from pathcache import CommandHashTable
+from script import ScriptInterpreter
+from globbing import NoMatch
+from nodes import Pipeline, Subshell, Block, Command
+
+STREAM_LIMIT = 16 * 1024 * 1024     # longest line stream() accepts
+# Names the interpreter handles itself, besides Builtins.builtin_help, functions and plugin commands
+SHELL_COMMANDS = ('break', 'continue', 'return', 'wait', 'feedback')
+
+class Result:
+    """Outcome of one pipeline: exit status and, when captured, its output."""
+    __slots__ = ('line', 'status', 'stdout', 'stderr')
+    def __init__(self, line, status, stdout=None, stderr=None):
+        self.line = line
+        self.status = status
+        self.stdout = stdout
+        self.stderr = stderr
+    @property
+    def ok(self):
+        return self.status == 0
+    def text(self, encoding='utf-8'):
+        return (self.stdout or b'').decode(encoding, errors='replace')
+    def __repr__(self):
+        return f"Result({self.line!r}, status={self.status})"
+
+class PipelineError(Exception):
+    """Raised with check=True when a pipeline exits non-zero."""
+    def __init__(self, result):
+        super().__init__(f"{result.line!r} exited with status {result.status}")
+        self.result = result
+
+class PipelineTimeout(TimeoutError):
+    """Raised when a pipeline runs past its timeout (it has been killed)."""
+    def __init__(self, line, timeout):
+        super().__init__(f"{line!r} timed out after {timeout} seconds")
+        self.line = line
+        self.timeout = timeout
+
+
+class _Running:
+    """A launched pipeline: its processes and the parent's ends of its pipes."""
+    def __init__(self, line, procs, negate, stdout_fd, stderr_fd):
+        self.line = line
+        self.procs = procs
+        self.negate = negate
+        self.stdout_fd = stdout_fd
+        self.stderr_fd = stderr_fd
+    def kill(self, sig):
+        if self.procs:
+            try:
+                # Every stage is in the first stage's process group
+                os.killpg(self.procs[0].pid, sig)
+            except OSError:
+                pass
+
+
+class Shell:
+    """Runs command lines through the shell's parser and executor from Python code."""
+    def __init__(self, max_concurrency=64, kill_grace=1.0, backend=None):
+        hashtable = CommandHashTable()
+        self.executor = CommandExecutor(hashtable=hashtable, backend=backend)
+        self.interpreter = ScriptInterpreter(CommandParser(), self.executor, Builtins(hashtable=hashtable))
+        self.max_concurrency = max_concurrency
+        self.kill_grace = kill_grace
+        self._limits = weakref.WeakKeyDictionary()     # event loop -> Semaphore
+    # ----- entry points -----
+    async def run(self, line, capture=False, input=None, timeout=None, check=False):
+        """Run a command line. Returns a Result (stdout/stderr are bytes when captured)."""
+        async with self._limit():
+            run = self._run(line, capture, input)
+            if timeout is None:
+                result = await run
+            else:
+                try:
+                    result = await asyncio.wait_for(run, timeout)
+                except asyncio.TimeoutError:
+                    raise PipelineTimeout(line, timeout) from None
+        if check and result.status != 0:
+            raise PipelineError(result)
+        return result
+    def run_sync(self, line, **kwargs):
+        """Blocking form of run() for code without an event loop."""
+        return asyncio.run(self.run(line, **kwargs))
+    async def stream(self, line, timeout=None, encoding='utf-8', check=False):
+        """Yield the pipeline's stdout line by line (without newlines) as it is produced."""
+        async with self._limit():
+            loop = asyncio.get_running_loop()
+            deadline = None if timeout is None else loop.time() + timeout
+            running = None
+            try:
+                running, status, errors = self._launch(line, capture=True, input_fd=None, capture_stderr=False)
+                if running is None:
+                    sys.stderr.write(errors.decode(errors='replace'))
+                else:
+                    reader = await self._reader(running.stdout_fd, STREAM_LIMIT)
+                    running.stdout_fd = None
+                    while True:
+                        remaining = None if deadline is None else deadline - loop.time()
+                        if remaining is not None and remaining <= 0:
+                            raise asyncio.TimeoutError
+                        data = await asyncio.wait_for(reader.readline(), remaining)
+                        if not data:
+                            break
+                        yield data.rstrip(b'\n').decode(encoding, errors='replace')
+                    status = await self._wait(running, deadline)
+            except asyncio.TimeoutError:
+                raise PipelineTimeout(line, timeout) from None
+            finally:
+                if running is not None:
+                    await self._cleanup(running)
+        if check and status != 0:
+            raise PipelineError(Result(line, status))
+    # ----- implementation -----
+    def _limit(self):
+        loop = asyncio.get_running_loop()
+        limit = self._limits.get(loop)
+        if limit is None:
+            limit = self._limits[loop] = asyncio.Semaphore(self.max_concurrency)
+        return limit
+    def _parse(self, line):
+        interpreter = self.interpreter
+        if '$(' in line or '`' in line:
+            # Command substitutions run in the forked subshell, which expands the
+            # line itself: in-process they would block the loop and take over fd 1
+            return Pipeline([Subshell(Block(line))])
+        parsed = interpreter.parse(line)
+        if not isinstance(parsed, Pipeline):
+            # Lists and compound commands run in a forked subshell, which expands each item as it runs
+            return Pipeline([Subshell(parsed)])
+        parsed = interpreter.expand_words(parsed)
+        if any(isinstance(cmd, Command) and cmd.args and self._in_shell(cmd.args[0]) for cmd in parsed.commands):
+            # The interpreter runs these (in the subshell, so cd or export stay there)
+            return Pipeline([Subshell(parsed)])
+        return parsed
+    def _in_shell(self, name):
+        """Whether the interpreter, not the executor, runs a command of this name."""
+        interpreter = self.interpreter
+        return (name in SHELL_COMMANDS or name in interpreter.builtins.builtin_help
+                or name in interpreter.functions or name in interpreter.custom_commands)
+    def _launch(self, line, capture, input_fd, capture_stderr=True):
+        """Start the pipeline without waiting.
+
+        Returns (_Running, None, b'') or, when nothing is left running,
+        (None, status, launch error messages).
+        """
+        try:
+            parsed = self._parse(line)
+        except ValueError as e:
+            return None, 2, f"Parse error: {e}\n".encode()
+        except NoMatch as e:
+            return None, 1, f"myshell: no match: {e}\n".encode()
+        stdout_read = stdout_write = stderr_read = stderr_write = None
+        if capture:
+            stdout_read, stdout_write = os.pipe()
+            if capture_stderr:
+                stderr_read, stderr_write = os.pipe()
+        procs = []
+        # Launch errors are kept off the host's stdout; each call has its own buffer
+        messages = io.StringIO()
+        try:
+            status, process = self.executor.execute(parsed, run_in_bg=True, stdout=stdout_write, stderr=stderr_write,
+                                                    procs=procs, stdin=input_fd, messages=messages)
+        finally:
+            for fd in (stdout_write, stderr_write):
+                if fd is not None:
+                    os.close(fd)
+        if process is None:
+            # Launch failed (any started stages were reaped) or there was nothing to run
+            for fd in (stdout_read, stderr_read):
+                if fd is not None:
+                    os.close(fd)
+            return None, status, messages.getvalue().encode()
+        return _Running(line, procs, parsed.negate, stdout_read, stderr_read), None, b''
+    async def _run(self, line, capture, input):
+        input_read = input_write = None
+        if input is not None:
+            input_read, input_write = os.pipe()
+        try:
+            running, status, errors = self._launch(line, capture, input_read)
+        finally:
+            if input_read is not None:
+                os.close(input_read)
+        if running is None:
+            if input_write is not None:
+                os.close(input_write)
+            if capture:
+                return Result(line, status, b'', errors)
+            sys.stderr.write(errors.decode(errors='replace'))
+            return Result(line, status)
+        try:
+            tasks = []
+            if input_write is not None:
+                tasks.append(self._feed(input_write, input))
+                input_write = None
+            if capture:
+                tasks.append(self._read_all(running.stdout_fd))
+                tasks.append(self._read_all(running.stderr_fd))
+                running.stdout_fd = running.stderr_fd = None
+            outputs = await asyncio.gather(*tasks)
+            status = await self._wait(running)
+        finally:
+            if input_write is not None:
+                os.close(input_write)
+            await self._cleanup(running)
+        if capture:
+            return Result(line, status, outputs[-2], outputs[-1])
+        return Result(line, status)
+    async def _reader(self, fd, limit=STREAM_LIMIT):
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=limit)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader),
+                                     os.fdopen(fd, 'rb', buffering=0))
+        return reader
+    async def _read_all(self, fd):
+        reader = await self._reader(fd)
+        return await reader.read()
+    async def _feed(self, fd, data):
+        if isinstance(data, str):
+            data = data.encode()
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_write_pipe(asyncio.Protocol, os.fdopen(fd, 'wb', buffering=0))
+        # Closing flushes what is buffered; a reader that quits early just gets EPIPE
+        transport.write(data)
+        transport.close()
+    async def _wait(self, running, deadline=None):
+        """Wait for every stage; the status is the last stage's."""
+        status = 0
+        for proc in running.procs:
+            status = await _wait_process(proc, deadline)
+        if status < 0:
+            # Popen reports death by signal N as -N
+            status = 128 - status
+        if running.negate:
+            status = int(status == 0)
+        return status
+    async def _cleanup(self, running):
+        """Close the parent's pipe ends and make sure no stage is left running or unreaped."""
+        for name in ('stdout_fd', 'stderr_fd'):
+            fd = getattr(running, name)
+            if fd is not None:
+                os.close(fd)
+                setattr(running, name, None)
+        if all(proc.poll() is not None for proc in running.procs):
+            return
+        running.kill(signal.SIGTERM)
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.shield(self._wait(running, loop.time() + self.kill_grace))
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            running.kill(signal.SIGKILL)
+            for proc in running.procs:
+                proc.wait()
+
+async def _wait_process(proc, deadline=None):
+    """Await a child's exit without blocking the loop. Returns its returncode."""
+    loop = asyncio.get_running_loop()
+    if proc.poll() is not None:
+        return proc.returncode
+    pidfd = None
+    if hasattr(os, 'pidfd_open'):
+        try:
+            pidfd = os.pidfd_open(proc.pid)
+        except OSError:
+            pidfd = None
+    timeout = None if deadline is None else max(0, deadline - loop.time())
+    if pidfd is not None:
+        exited = loop.create_future()
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+        try:
+            await asyncio.wait_for(exited, timeout)
+        finally:
+            loop.remove_reader(pidfd)
+            os.close(pidfd)
+        return proc.wait()
+    # No pidfds: poll with a backoff
+    delay = 0.001
+    while proc.poll() is None:
+        if deadline is not None and loop.time() >= deadline:
+            raise asyncio.TimeoutError
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    return proc.returncode
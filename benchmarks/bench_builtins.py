@@ -0,0 +1,48 @@
+"""
+bench_builtins.py - Script loop throughput with in-process and external coreutils.
+
+Run from the repository root:  python3 benchmarks/bench_builtins.py [iterations]
+
+The loop body is the usual test/echo/printf mix; "external" is the same loop
+after 'enable -n' for each utility, i.e. one fork+exec per command.
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from script import ScriptInterpreter
+import coreutils
+
+LOOP = """for i in {words}; do
+    if [ "$i" -gt 0 ]; then
+        echo "line $i" > {out}
+        printf '%s=%d\\n' count "$i" >> {out}
+    fi
+    true
+done
+"""
+
+def loop_seconds(interpreter, script):
+    start = time.perf_counter()
+    interpreter.run_source(script)
+    return time.perf_counter() - start
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with tempfile.TemporaryDirectory() as d:
+        script = LOOP.format(words=' '.join(str(i) for i in range(1, iterations + 1)),
+                             out=os.path.join(d, 'out'))
+        commands = iterations * 4
+        print(f"{iterations} iterations, {commands} commands")
+        print(f"{'utilities':<12} {'seconds':>8} {'commands/s':>11}")
+        for mode in ('external', 'in-process'):
+            interpreter = ScriptInterpreter()
+            if mode == 'external':
+                interpreter.executor.external.update(coreutils.COMMANDS)
+            seconds = loop_seconds(interpreter, script)
+            print(f"{mode:<12} {seconds:>8.3f} {commands / seconds:>11.0f}")
+
+if __name__ == '__main__':
+    main()
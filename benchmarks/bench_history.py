@@ -0,0 +1,48 @@
+"""
+bench_history.py - History load time and '!prefix' lookup latency for a large history file.
+
+Run from the repository root:  python3 benchmarks/bench_history.py [entries]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from history import HistoryManager
+
+COMMANDS = ['git status', 'git commit -m', 'ls -la', 'cd', 'make', 'python3 -m pytest', 'grep -rn', 'vim']
+
+def linear_expand(history, prefix):
+    """The old lookup: reverse scan over every entry."""
+    for cmd in reversed(history):
+        if cmd.startswith(prefix):
+            return cmd
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'history')
+        with open(path, 'w') as f:
+            for i in range(count):
+                f.write(f'{rng.choice(COMMANDS)} {rng.randrange(count)}\n')
+        start = time.perf_counter()
+        history = HistoryManager(path, max_entries=count)
+        print(f"load {len(history)} entries: {(time.perf_counter() - start) * 1000:.1f} ms")
+        entries = history.history
+        for prefix in ('vim 1234', 'git commit -m 99', 'ls', 'zzz'):
+            start = time.perf_counter()
+            for _ in range(100):
+                history.expand('!' + prefix)
+            indexed = (time.perf_counter() - start) * 10
+            start = time.perf_counter()
+            for _ in range(10):
+                linear_expand(entries, prefix)
+            linear = (time.perf_counter() - start) * 100
+            print(f"!{prefix:<18} indexed {indexed:8.3f} ms   linear {linear:8.3f} ms")
+        history.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+bench_parse.py - Parse throughput of CommandParser against the old split/shlex parser.
+
+Run from the repository root:  python3 benchmarks/bench_parse.py
+"""
+import os
+import sys
+import shlex
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from parser import CommandParser
+
+def legacy_parse(line):
+    """The previous CommandParser.parse pipeline path (split on '|', shlex per segment)."""
+    commands = []
+    for part in [p.strip() for p in line.split('|')]:
+        tokens = shlex.split(part)
+        cmd = {'args': [], 'stdin': None, 'stdout': None, 'stderr': None, 'append': False}
+        i = 0
+        while i < len(tokens):
+            if tokens[i] in ('>', '>>'):
+                cmd['stdout'] = tokens[i+1]
+                cmd['append'] = tokens[i] == '>>'
+                i += 2
+            elif tokens[i] == '<':
+                cmd['stdin'] = tokens[i+1]
+                i += 2
+            elif tokens[i] == '2>':
+                cmd['stderr'] = tokens[i+1]
+                i += 2
+            else:
+                cmd['args'].append(tokens[i])
+                i += 1
+        commands.append(cmd)
+    return {'pipeline': commands}
+
+def make_lines():
+    segment = 'grep -v "some pattern" --color=never file_%d.txt > out_%d.log'
+    return {
+        'short': 'ls -la /tmp',
+        'pipeline-20': ' | '.join(segment % (i, i) for i in range(20)),
+        'long-10KB': 'echo ' + ' '.join(f"'arg {i}' value_{i}" for i in range(700)),
+        'long-100KB': 'printf %s ' + ' '.join(f'"word {i}" plain{i}' for i in range(7000)),
+    }
+
+def bench(func, line, seconds=0.5):
+    timer = timeit.Timer(lambda: func(line))
+    number, elapsed = timer.autorange()
+    runs = max(1, int(number * seconds / max(elapsed, 1e-9)))
+    return min(timer.repeat(3, runs)) / runs
+
+def main():
+    parser = CommandParser()
+    print(f"{'line':<12} {'bytes':>8} {'legacy':>12} {'parser':>12} {'speedup':>8}")
+    for name, line in make_lines().items():
+        old = bench(legacy_parse, line)
+        new = bench(parser.parse, line)
+        print(f"{name:<12} {len(line):>8} {old*1e6:>10.1f}us {new*1e6:>10.1f}us {old/new:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
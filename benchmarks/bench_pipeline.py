@@ -0,0 +1,53 @@
+"""
+bench_pipeline.py - Pipeline throughput (MB/s) of the executor compared with bash.
+
+Run from the repository root:  python3 benchmarks/bench_pipeline.py [MiB]
+"""
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from parser import CommandParser
+from executor import CommandExecutor
+from pump import Meter, Capture, CHUNK
+
+class NaiveCopy(Meter):
+    """Python-level 64 KiB read/write loop, for comparison with the splice path."""
+    def drain(self, fd):
+        while True:
+            data = os.read(fd, 65536)
+            if not data:
+                break
+            os.write(self.dst, data)
+            self.bytes += len(data)
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def main():
+    mib = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    size = mib * 1024 * 1024
+    line = f'head -c {size} /dev/zero | cat'
+    parser = CommandParser()
+    executor = CommandExecutor()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    cases = [
+        ('bash', lambda: subprocess.run(['bash', '-c', line + ' > /dev/null'], check=True)),
+        ('myshell (direct fd)', lambda: executor.execute(parser.parse(line + ' > /dev/null'))),
+        ('myshell meter (splice)', lambda: executor.execute(parser.parse(line), stdout=Meter(devnull))),
+        ('python read/write 64K', lambda: executor.execute(parser.parse(line), stdout=NaiveCopy(devnull))),
+        ('myshell capture', lambda: executor.execute(parser.parse(f'head -c {min(size, 256 * CHUNK)} /dev/zero'), stdout=Capture())),
+    ]
+    print(f"{'case':<26} {'MB/s':>10}")
+    for name, func in cases:
+        moved = min(size, 256 * CHUNK) if name == 'myshell capture' else size
+        best = min(timed(func) for _ in range(3))
+        print(f"{name:<26} {moved / best / 1e6:>10.0f}")
+    os.close(devnull)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+bench_spawn.py - Spawns per second for the posix_spawn and Popen launch backends.
+
+Run from the repository root:  python3 benchmarks/bench_spawn.py [count] [ballast MiB]
+
+The ballast inflates the shell's RSS; fork-based launches slow down with it
+because the page tables are copied on every spawn.
+"""
+import os
+import sys
+import time
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from parser import CommandParser
+import executor as executor_module
+from executor import CommandExecutor
+import spawn
+
+def legacy_spawn(executable, argv, fds, env=None, backend=None, pgroup=0):
+    """The launch the executor used before spawn.py: Popen with preexec_fn=os.setpgrp."""
+    return subprocess.Popen(argv, executable=executable, stdin=fds[0], stdout=fds[1],
+                            stderr=fds[2], env=env, preexec_fn=lambda: os.setpgid(0, pgroup))
+
+def spawns_per_second(executor, parsed, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        executor.execute(parsed)
+    return count / (time.perf_counter() - start)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    ballast_mib = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    # Touch every page so the ballast is really resident
+    ballast = bytearray(b'x' * (ballast_mib * 1024 * 1024))
+    parsed = CommandParser().parse('true > /dev/null')
+    print(f"{count} x 'true', ballast {ballast_mib} MiB")
+    print(f"{'backend':<14} {'spawns/s':>10}")
+    for backend in ('preexec_fn', 'popen', 'posix_spawn'):
+        executor_module.spawn = legacy_spawn if backend == 'preexec_fn' else spawn.spawn
+        executor = CommandExecutor(backend=backend)
+        executor.external.add('true')      # measure the launch, not coreutils.py
+        spawns_per_second(executor, parsed, 20)     # warm up
+        print(f"{backend:<14} {spawns_per_second(executor, parsed, count):>10.0f}")
+    executor_module.spawn = spawn.spawn
+    del ballast
+
+if __name__ == '__main__':
+    main()
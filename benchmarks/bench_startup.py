@@ -0,0 +1,56 @@
+"""
+bench_startup.py - Time to first prompt, 'myshell.py -c true' and the server client.
+
+Run from the repository root:  python3 benchmarks/bench_startup.py [runs] [path/to/myshell.py]
+
+Each run is a fresh interpreter. The interactive case reads its commands
+from /dev/null, so it renders the first prompt, sees EOF and exits. A
+bare 'python -c pass' is shown for reference. The client case starts a
+'myshell.py --server' on a temporary socket and times 'python3 -S
+shellclient.py -c true'. Byte-compile the tree first (python -m compileall .)
+or the numbers include compiling the modules.
+"""
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def median_ms(argv, runs, cwd):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, cwd=cwd)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    shell = os.path.abspath(sys.argv[2] if len(sys.argv) > 2 else os.path.join(ROOT, 'myshell.py'))
+    with tempfile.TemporaryDirectory() as cwd:
+        median_ms([sys.executable, shell], 2, cwd)      # warm up (plugin manifest, page cache)
+        print(f"{'case':<20} {'median ms':>10}")
+        print(f"{'python -c pass':<20} {median_ms([sys.executable, '-c', 'pass'], runs, cwd):>10.1f}")
+        print(f"{'first prompt':<20} {median_ms([sys.executable, shell], runs, cwd):>10.1f}")
+        print(f"{'-c true':<20} {median_ms([sys.executable, shell, '-c', 'true'], runs, cwd):>10.1f}")
+        client = os.path.join(os.path.dirname(shell), 'shellclient.py')
+        if os.path.exists(client):
+            socket_path = os.path.join(cwd, 'server.sock')
+            os.environ['MYSHELL_SOCKET'] = socket_path
+            server = subprocess.Popen([sys.executable, shell, '--server'], stderr=subprocess.DEVNULL, cwd=cwd)
+            try:
+                for _ in range(100):
+                    if os.path.exists(socket_path):
+                        break
+                    time.sleep(0.05)
+                argv = [sys.executable, '-S', client, '-c', 'true']
+                print(f"{'client -c true':<20} {median_ms(argv, runs, cwd):>10.1f}")
+            finally:
+                server.terminate()
+                server.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+suite.py - Benchmarks for the shell's hot paths, with JSON results and baseline comparison.
+
+Run from the repository root:
+
+    python3 benchmarks/suite.py                         print a table
+    python3 benchmarks/suite.py --json results.json     also write the results
+    python3 benchmarks/suite.py --save-baseline base.json
+    python3 benchmarks/suite.py --baseline base.json    compare; exit 1 on a regression
+    python3 benchmarks/suite.py --quick -k parse -k spawn
+
+Each result is the best of several repeats: the lowest latency or the
+highest throughput, which is the least noisy estimate on a busy machine.
+Units ending in '/s' are better when higher, the rest when lower. When a
+baseline is given, a result more than --threshold percent (default 10)
+worse than the baseline is marked REGRESSED.
+
+The numbers depend on the machine, so there is no baseline in the tree.
+Save one before a change and compare with it afterwards. The single-purpose
+bench_*.py scripts next to this one compare against the old implementations
+and bash.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from parser import CommandParser
+from executor import CommandExecutor
+from completion import CompletionEngine
+from prompt import PromptEngine
+from history import HistoryManager
+from script import ScriptInterpreter
+from pump import Meter
+from globbing import Globber
+from bench_parse import make_lines
+
+FORMAT_VERSION = 1
+BENCHMARKS = []
+
+def benchmark(func):
+    BENCHMARKS.append(func)
+    return func
+
+def best_time(func, repeat=5, min_time=0.2):
+    """Seconds per call of func: the best of repeat runs of enough calls to fill min_time."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / 10 or number >= 1 << 20:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+@contextlib.contextmanager
+def chdir(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+# ----- benchmarks: each yields (name, value, unit) -----
+@benchmark
+def parse(opts):
+    parser = CommandParser()
+    for name, line in make_lines().items():
+        if opts.quick and name == 'long-100KB':
+            continue
+        yield f'parse.{name}', best_time(lambda: parser.parse(line), opts.repeat) * 1e6, 'us'
+
+@benchmark
+def spawn(opts):
+    parser = CommandParser()
+    executor = CommandExecutor()
+    for name, line in (('external', '/bin/true'), ('in-process', 'true'), ('pipeline-3', '/bin/true | /bin/true | /bin/true'),
+                       ('prefix-assign', 'LC_ALL=C /bin/true')):
+        parsed = parser.parse(line)
+        yield f'spawn.{name}', best_time(lambda: executor.execute(parsed), opts.repeat) * 1e6, 'us'
+
+@benchmark
+def pipeline(opts):
+    size = (64 if opts.quick else 256) * 1024 * 1024
+    parser = CommandParser()
+    executor = CommandExecutor()
+    with open(os.devnull, 'w') as devnull:
+        for name, line, output in (
+                ('redirect', f'head -c {size} /dev/zero | cat > /dev/null', None),
+                ('metered', f'head -c {size} /dev/zero | cat', Meter(devnull.fileno()))):
+            parsed = parser.parse(line)
+            seconds = best_time(lambda: executor.execute(parsed, stdout=output), min(opts.repeat, 3), 0)
+            yield f'pipeline.{name}', size / seconds / 1e6, 'MB/s'
+
+@benchmark
+def heredoc(opts):
+    size = (4 if opts.quick else 32) * 1024 * 1024
+    parser = CommandParser()
+    executor = CommandExecutor()
+    for name, body in (('small', b'x' * 4000 + b'\n'), ('large', b'x' * (size - 1) + b'\n')):
+        parsed = parser.parse("cat <<'EOF' > /dev/null")
+        parsed.commands[0].redirects[0].body = body
+        seconds = best_time(lambda: executor.execute(parsed), min(opts.repeat, 3), 0 if name == 'large' else 0.2)
+        if name == 'small':
+            yield 'heredoc.small', seconds * 1e6, 'us'
+        else:
+            yield 'heredoc.large', len(body) / seconds / 1e6, 'MB/s'
+
+@benchmark
+def procsub(opts):
+    size = (64 if opts.quick else 256) * 1024 * 1024
+    # The substitution's list runs in a forked subshell, which needs the interpreter
+    interpreter = ScriptInterpreter()
+    parsed = interpreter.parser.parse(f'cat <(head -c {size} /dev/zero) > /dev/null')
+    seconds = best_time(lambda: interpreter.executor.execute(parsed), min(opts.repeat, 3), 0)
+    yield 'procsub.stream', size / seconds / 1e6, 'MB/s'
+
+@benchmark
+def completion(opts):
+    count = 2000 if opts.quick else 10000
+    engine = CompletionEngine()
+    with tempfile.TemporaryDirectory() as tmp:
+        # A long PATH of directories full of executables
+        path_dirs = []
+        for d in range(20):
+            directory = os.path.join(tmp, f'bin{d}')
+            os.mkdir(directory)
+            for i in range(count // 20):
+                open(os.path.join(directory, f'tool{d}-{i}'), 'w').close()
+            path_dirs.append(directory)
+        files = os.path.join(tmp, 'files')
+        os.mkdir(files)
+        for i in range(count):
+            open(os.path.join(files, f'file{i:06d}.txt'), 'w').close()
+        saved = os.environ.get('PATH', '')
+        os.environ['PATH'] = os.pathsep.join(path_dirs + [saved])
+        try:
+            with chdir(files):
+                yield 'completion.command', best_time(lambda: engine.matches('too', 'too'), opts.repeat) * 1e6, 'us'
+                yield 'completion.file', best_time(lambda: engine.matches('cat file0001', 'file0001'), opts.repeat) * 1e6, 'us'
+        finally:
+            os.environ['PATH'] = saved
+
+@benchmark
+def glob(opts):
+    dirs = 200 if opts.quick else 2000
+    globber = Globber()
+    with tempfile.TemporaryDirectory() as tmp:
+        # A source tree: 25 files in each of `dirs` directories, two levels deep
+        for d in range(dirs):
+            directory = os.path.join(tmp, f'pkg{d // 40}', f'mod{d % 40}')
+            os.makedirs(directory)
+            for i in range(25):
+                open(os.path.join(directory, f'f{i}.py' if i % 2 else f'f{i}.txt'), 'w').close()
+        parsed = CommandParser().parse('echo pkg0/mod1/*.py pkg0/mod1/*.txt pkg0/*/f1.py')
+        with chdir(tmp):
+            yield 'glob.command', best_time(lambda: globber.command(parsed.commands[0]), opts.repeat) * 1e6, 'us'
+            seconds = best_time(lambda: globber.expand('**/*.py'), min(opts.repeat, 3), 0)
+            yield 'glob.globstar', dirs * 25 / seconds, 'files/s'
+
+@benchmark
+def prompt(opts):
+    if shutil.which('git') is None:
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['git', 'init', '-q', tmp], check=True)
+        nested = os.path.join(tmp, *'abcdef')
+        os.makedirs(nested)
+        # A budget long enough that every render waits for the git segment
+        engine = PromptEngine(budget=1.0)
+        for name, cwd in (('git-root', tmp), ('git-nested', nested)):
+            with chdir(cwd):
+                yield f'prompt.{name}', best_time(lambda: engine.render('{git} {cwd}$ '), opts.repeat) * 1e6, 'us'
+        with chdir(tmp):
+            yield 'prompt.plain', best_time(lambda: engine.render('myshell:{cwd}$ '), opts.repeat) * 1e6, 'us'
+
+@benchmark
+def history(opts):
+    count = 20000 if opts.quick else 200000
+    rng = random.Random(1)
+    words = ['git status', 'git commit -m', 'ls -la', 'make', 'python3 -m pytest', 'grep -rn', 'vim']
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'history')
+        with open(path, 'w') as f:
+            f.writelines(f'{rng.choice(words)} {rng.randrange(count)}\n' for _ in range(count))
+        start = time.perf_counter()
+        manager = HistoryManager(path, max_entries=count)
+        yield 'history.load', (time.perf_counter() - start) * 1000, 'ms'
+        for name, line in (('hit', '!git commit'), ('miss', '!zzz'), ('plain', 'ls -la /tmp')):
+            yield f'history.expand-{name}', best_time(lambda: manager.expand(line), opts.repeat) * 1e6, 'us'
+        manager.close()
+
+@benchmark
+def script(opts):
+    iterations = 2000 if opts.quick else 10000
+    words = ' '.join(str(i) for i in range(iterations))
+    interpreter = ScriptInterpreter()
+    for name, body in (('assign', 'x=$i'), ('builtin', 'true'), ('if', 'if [ $i = 5 ]; then x=$i; fi'),
+                       ('subst', 'x=$(pwd)')):
+        source = f'for i in {words}; do {body}; done\n'
+        seconds = best_time(lambda: interpreter.run_source(source), min(opts.repeat, 3), 0)
+        yield f'script.loop-{name}', iterations / seconds, 'iter/s'
+
+# ----- running and comparing -----
+def higher_is_better(unit):
+    return unit.endswith('/s')
+
+def run(opts):
+    results = {}
+    for func in BENCHMARKS:
+        if opts.keyword and not any(k in func.__name__ for k in opts.keyword):
+            continue
+        for name, value, unit in func(opts):
+            results[name] = {'value': value, 'unit': unit}
+            print(f"  {name:<28} {value:>12.2f} {unit}", file=sys.stderr)
+    return results
+
+def compare(results, baseline, threshold):
+    """Rows (name, value, unit, baseline value or None, change in percent, verdict)."""
+    rows = []
+    for name, result in results.items():
+        value, unit = result['value'], result['unit']
+        base = baseline.get(name)
+        if base is None or base.get('unit') != unit or not base['value']:
+            rows.append((name, value, unit, None, None, 'new'))
+            continue
+        change = (value - base['value']) / base['value'] * 100
+        worse = -change if higher_is_better(unit) else change
+        verdict = 'REGRESSED' if worse > threshold else 'improved' if worse < -threshold else 'ok'
+        rows.append((name, value, unit, base['value'], change, verdict))
+    return rows
+
+def print_table(rows):
+    print(f"{'benchmark':<28} {'value':>12} {'unit':<7} {'baseline':>12} {'change':>8}  verdict")
+    for name, value, unit, base, change, verdict in rows:
+        base_text = f"{base:>12.2f}" if base is not None else f"{'-':>12}"
+        change_text = f"{change:>+7.1f}%" if change is not None else f"{'-':>8}"
+        print(f"{name:<28} {value:>12.2f} {unit:<7} {base_text} {change_text}  {verdict}")
+
+def load_results(path):
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported results version {data.get('version')}")
+    return data['results']
+
+def write_results(path, results):
+    data = {
+        'version': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'commit': git_commit(),
+        'results': results,
+    }
+    if path == '-':
+        json.dump(data, sys.stdout, indent=2, sort_keys=True)
+        print()
+        return
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the shell's hot paths.")
+    ap.add_argument('-k', dest='keyword', action='append', help='only benchmarks whose name contains this')
+    ap.add_argument('--quick', action='store_true', help='smaller inputs, for a fast check')
+    ap.add_argument('--repeat', type=int, default=5, help='repeats per measurement (best is kept)')
+    ap.add_argument('--json', metavar='FILE', help="write the results as JSON ('-' for stdout)")
+    ap.add_argument('--baseline', metavar='FILE', help='compare with saved results')
+    ap.add_argument('--save-baseline', metavar='FILE', help='write the results as the new baseline')
+    ap.add_argument('--threshold', type=float, default=10.0, help='percent worse that counts as a regression')
+    opts = ap.parse_args()
+    baseline = {}
+    if opts.baseline:
+        baseline = load_results(opts.baseline)
+    results = run(opts)
+    rows = compare(results, baseline, opts.threshold)
+    if opts.json != '-':
+        print_table(rows)
+    if opts.json:
+        write_results(opts.json, results)
+    if opts.save_baseline:
+        write_results(opts.save_baseline, results)
+    return 1 if any(row[-1] == 'REGRESSED' for row in rows) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,36 +1,155 @@
 """
 completion.py - Tab and custom completion for the advanced Python shell.
+
+readline calls complete(text, state) once per candidate, with state 0, 1,
+2 and so on. The candidates are computed once, at state 0, and the later
+states are served from that list.
+
+Candidate sets are kept as sorted lists, and a prefix lookup is two bisects:
+
+- Command names come from the shared $PATH table (pathcache.py), which is
+  only rebuilt when $PATH or one of its directories changes.
+- A directory listing is cached, keyed by the directory's mtime, when it
+  has at most DIR_CACHE_ENTRIES entries. A larger directory is streamed
+  with os.scandir(), and the scan stops after `limit` matches.
+
+Plugins complete a command's arguments either with a readline-style
+function (register) or with a completion source (register_source): a fixed
+list, or a function returning one that is called on first use, optionally
+again every ttl seconds, with the result cached.
 """
 import os
-import glob
+import time
+from bisect import bisect_left
+from pathcache import CommandHashTable
+
+DIR_CACHE_ENTRIES = 20000
+DIR_CACHE_SIZE = 16
+
+def prefix_matches(words, prefix):
+    """The items of the sorted list words that start with prefix."""
+    if not prefix:
+        return words
+    lo = bisect_left(words, prefix)
+    hi = bisect_left(words, prefix + '\U0010ffff', lo)
+    return words[lo:hi]
+
+class CompletionSource:
+    """Sorted candidates for a command's arguments, from a list or a lazily called function."""
+    def __init__(self, candidates, ttl=None):
+        self.func = candidates if callable(candidates) else None
+        self.words = None if self.func else sorted(set(candidates))
+        self.ttl = ttl
+        self.loaded = 0.0
+    def candidates(self):
+        if self.func is not None and (self.words is None or
+                                      self.ttl is not None and time.monotonic() - self.loaded >= self.ttl):
+            self.words = sorted(set(self.func()))
+            self.loaded = time.monotonic()
+        return self.words
+    def matches(self, text):
+        return prefix_matches(self.candidates(), text)
+    def __call__(self, text, state):
+        # Also usable as a readline-style completer
+        matches = self.matches(text)
+        return matches[state] if state < len(matches) else None
 
 class CompletionEngine:
     """Provides tab and custom completion for commands and files."""
-    def __init__(self, custom_completions=None):
+    def __init__(self, custom_completions=None, hashtable=None, limit=1000):
         self.custom_completions = custom_completions or {}
-    def complete(self, text, state):
-        # Use custom completion if available for the command
-        import readline
-        buffer = readline.get_line_buffer()
-        line = buffer.split()
-        if line and line[0] in self.custom_completions:
-            matches = self.custom_completions[line[0]](text, state)
-        elif len(line) <= 1:
+        self.hashtable = hashtable if hashtable is not None else CommandHashTable()
+        self.limit = limit
+        self._session = ('', [])        # (text, matches) of the current Tab press
+        self._dirs = {}                 # directory -> (mtime, sorted names)
+    def complete(self, text, state, buffer=None):
+        if state == 0 or text != self._session[0]:
+            interactive = buffer is None
+            if interactive:
+                import readline
+                buffer = readline.get_line_buffer()
+            matches = self.matches(buffer, text)
+            self._session = (text, matches)
+            if interactive and len(matches) == 1 and matches[0].endswith('/'):
+                # Keep going into the directory instead of ending the word
+                readline.set_completion_append_character('')
+        matches = self._session[1]
+        return matches[state] if state < len(matches) else None
+    def matches(self, buffer, text):
+        """Command, argument or file name candidates for text, the word being completed in buffer."""
+        words = buffer.split()
+        if not words or len(words) == 1 and not buffer[-1:].isspace():
             # Complete command names
-            paths = ['/bin', '/usr/bin', '/usr/local/bin']
-            cmds = set()
-            for p in paths:
-                try:
-                    cmds.update(os.listdir(p))
-                except Exception:
-                    pass
-            matches = [c for c in cmds if c.startswith(text)]
-        else:
-            # Complete file names
-            matches = glob.glob(text+'*')
+            return prefix_matches(self.hashtable.sorted_commands(), text)[:self.limit]
+        # Use custom completion if available for the command
+        func = self.custom_completions.get(words[0])
+        if isinstance(func, CompletionSource):
+            return func.matches(text)[:self.limit]
+        if func is not None:
+            matches = []
+            while len(matches) < self.limit:
+                match = func(text, len(matches))
+                if match is None:
+                    break
+                matches.append(match)
+            return matches
+        # Complete file names
+        return self.file_matches(text)
+    def file_matches(self, text):
+        directory, prefix = os.path.split(text)
+        names = self._listing(os.path.expanduser(directory) if directory else '.', prefix)
+        return [os.path.join(directory, name) for name in names] if directory else names
+    def _listing(self, path, prefix):
+        """Sorted names (directories end in '/') in path starting with prefix, at most limit of them.
+
+        Hidden names are left out unless prefix asks for them.
+        """
         try:
-            return matches[state]
-        except IndexError:
-            return None
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._dirs.get(path)
+        if cached is not None and cached[0] == mtime:
+            return _visible(prefix_matches(cached[1], prefix), prefix)[:self.limit]
+        names = []
+        matches = None
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if matches is None:
+                        names.append(_entry_name(entry))
+                        if len(names) > DIR_CACHE_ENTRIES:
+                            # Too big to keep: only collect matches from here on
+                            matches = _visible([name for name in names if name.startswith(prefix)], prefix)
+                            names = None
+                    elif entry.name.startswith(prefix) and (prefix or entry.name[0] != '.'):
+                        matches.append(_entry_name(entry))
+                        if len(matches) >= self.limit:
+                            break
+        except OSError:
+            return []
+        if matches is not None:
+            return sorted(matches)[:self.limit]
+        names.sort()
+        if len(self._dirs) >= DIR_CACHE_SIZE:
+            del self._dirs[next(iter(self._dirs))]
+        self._dirs[path] = (mtime, names)
+        return _visible(prefix_matches(names, prefix), prefix)[:self.limit]
     def register(self, command, func):
-        self.custom_completions[command] = func 
\ No newline at end of file
+        """Complete command's arguments with func(text, state), as readline calls it, or a CompletionSource."""
+        self.custom_completions[command] = func
+    def register_source(self, command, candidates, ttl=None):
+        """Complete command's arguments from a list, or a function returning one (called on
+        first use and again once ttl seconds have passed)."""
+        source = CompletionSource(candidates, ttl)
+        self.register(command, source)
+        return source
+
+def _visible(names, prefix):
+    return names if prefix else [name for name in names if not name.startswith('.')]
+
+def _entry_name(entry):
+    try:
+        return entry.name + '/' if entry.is_dir() else entry.name
+    except OSError:
+        return entry.name
@@ -1,15 +1,15 @@
 """
 config.py - Configuration and environment management for the advanced Python shell.
 """
-import os
-import datetime
-import subprocess
 import importlib
+from prompt import PromptEngine
 
 class ShellConfig:
     """Loads and manages shell configuration and environment variables."""
     def __init__(self):
         self.config = {}
+        self.prompt_engine = PromptEngine()
+        self._themes = {}
     def load(self, path):
         """Load configuration from a file."""
         try:
@@ -26,22 +26,23 @@ class ShellConfig:
     def get(self, key, default=None):
         """Get a configuration value."""
         return self.config.get(key, default)
+    def theme(self, name):
+        """Import a prompt theme once; None if it cannot be loaded."""
+        if name not in self._themes:
+            try:
+                self._themes[name] = importlib.import_module(f'unix.themes.{name}')
+            except Exception:
+                self._themes[name] = None
+        return self._themes[name]
     def render_prompt(self):
-        theme_name = self.get('THEME', 'default')
-        try:
-            theme_mod = importlib.import_module(f'unix.themes.{theme_name}')
-            return theme_mod.get_prompt()
-        except Exception:
-            # Fallback to built-in prompt
-            prompt = self.get('PROMPT')
-            if not prompt:
-                prompt = 'myshell:{cwd}$ '
-            cwd = os.getcwd()
-            now = datetime.datetime.now().strftime('%H:%M:%S')
-            # Git branch detection
-            git = ''
+        theme_mod = self.theme(self.get('THEME', 'default'))
+        if theme_mod is not None:
             try:
-                git = subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+                return theme_mod.get_prompt()
             except Exception:
                 pass
-            return prompt.format(cwd=cwd, time=now, git=git) 
\ No newline at end of file
+        # Fallback to built-in prompt
+        prompt = self.get('PROMPT')
+        if not prompt:
+            prompt = 'myshell:{cwd}$ '
+        return self.prompt_engine.render(prompt)
@@ -0,0 +1,544 @@
+"""
+coreutils.py - In-process versions of hot utilities for the advanced Python shell.
+
+echo, printf, test/[, true, false, pwd and cat are run by the shell itself
+instead of forking the coreutils binaries, which dominates the cost of
+script loops. Each utility has a prepare(args) step that runs before
+anything is launched: it returns a callable, or None when the arguments use
+something not implemented here (an unsupported option, a malformed number, a
+syntax error that coreutils would report). None means the external binary
+runs instead, so behaviour and error messages stay exactly those of coreutils.
+
+A prepared utility is called with {0: fd, 1: fd, 2: fd} and returns its exit
+status. The executor runs it in a thread per pipeline stage (see InProcess).
+"""
+import os
+import re
+import sys
+import stat
+import time
+import signal
+import threading
+from pump import copy_fd, write_all
+from spawn import DEVNULL
+
+def _bytes(arg):
+    return os.fsencode(arg)
+
+# ----- echo / printf escapes -----
+
+_SIMPLE_ESCAPES = {ord('\\'): b'\\', ord('a'): b'\a', ord('b'): b'\b', ord('e'): b'\x1b',
+                   ord('f'): b'\f', ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('v'): b'\v'}
+_OCTAL = b'01234567'
+_HEX = b'0123456789abcdefABCDEF'
+
+class _Stop(Exception):
+    """\\c: produce no further output."""
+
+def _unescape(data, zero_prefix, quote=False):
+    """Expand backslash escapes in data (bytes).
+
+    zero_prefix: '\\0NNN' takes up to three more octal digits (echo -e, %b);
+    otherwise '\\NNN' is up to three octal digits in all (printf formats).
+    Raises _Stop with the output so far at '\\c'.
+    """
+    if b'\\' not in data:
+        return data
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        c = data[i]
+        if c != 0x5c or i + 1 >= n:
+            out.append(c)
+            i += 1
+            continue
+        e = data[i + 1]
+        i += 2
+        if e in _SIMPLE_ESCAPES:
+            out += _SIMPLE_ESCAPES[e]
+        elif quote and e == ord('"'):
+            out += b'"'
+        elif e == ord('c'):
+            raise _Stop(bytes(out))
+        elif e == ord('x') and i < n and data[i] in _HEX:
+            j = i
+            while j < n and j < i + 2 and data[j] in _HEX:
+                j += 1
+            out.append(int(data[i:j], 16))
+            i = j
+        elif e in _OCTAL:
+            if zero_prefix and e == ord('0'):
+                start, limit = i, i + 3
+            else:
+                start, limit = i - 1, i + 2
+            j = i
+            while j < n and j < limit and data[j] in _OCTAL:
+                j += 1
+            out.append(int(data[start:j] or b'0', 8) & 0xff)
+            i = j
+        else:
+            out += b'\\' + bytes([e])
+    return bytes(out)
+
+def _writer(out, status=0):
+    def run(fds):
+        write_all(fds[1], out)
+        return status
+    return run
+
+# ----- echo -----
+
+def prepare_echo(args):
+    words = args[1:]
+    if len(words) == 1 and words[0] in ('--help', '--version'):
+        return None
+    newline = True
+    escapes = False
+    while words and len(words[0]) > 1 and words[0][0] == '-' and all(c in 'neE' for c in words[0][1:]):
+        for c in words[0][1:]:
+            if c == 'n':
+                newline = False
+            else:
+                escapes = c == 'e'
+        words = words[1:]
+    out = b' '.join(_bytes(w) for w in words)
+    if escapes:
+        try:
+            out = _unescape(out, zero_prefix=True)
+        except _Stop as stop:
+            return _writer(stop.args[0])
+    return _writer(out + b'\n' if newline else out)
+
+# ----- printf -----
+
+_SPEC_RE = re.compile(rb'%([-+ #0\']*)(\*|\d+)?(?:\.(\*|\d*))?([a-zA-Z%])?')
+_INT_RE = re.compile(rb'\s*([+-]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9]\d*)\Z')
+_FLOAT_RE = re.compile(rb'\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\Z')
+
+class _Unsupported(Exception):
+    """Something the external printf has to handle."""
+
+def _int_arg(arg, unsigned):
+    if arg == b'':
+        return 0
+    if arg[:1] in (b'"', b"'"):
+        if len(arg) != 2:
+            raise _Unsupported()
+        return arg[1]
+    m = _INT_RE.match(arg)
+    if not m:
+        raise _Unsupported()
+    digits = m.group(2)
+    if digits[1:2] in (b'x', b'X'):
+        value = int(digits, 16)
+    else:
+        value = int(digits, 8 if digits.startswith(b'0') else 10)
+    if m.group(1) == b'-':
+        value = -value
+    if not -(1 << 63) <= value < (1 << 64) or value >= (1 << 63) and not unsigned:
+        raise _Unsupported()
+    if unsigned and value < 0:
+        value += 1 << 64
+    return value
+
+def _float_arg(arg):
+    if arg == b'':
+        return 0.0
+    m = _FLOAT_RE.match(arg)
+    # Beyond double precision the digits would differ from coreutils' long double
+    if not m or len(re.sub(rb'[^0-9]', b'', m.group(1)).lstrip(b'0')) > 15 or abs(float(arg)) >= 1e15:
+        raise _Unsupported()
+    return float(arg)
+
+def _printf_once(fmt, args):
+    """Format fmt once. Returns (output, number of args used)."""
+    out = bytearray()
+    used = 0
+    pos = 0
+    def next_arg():
+        nonlocal used
+        if used < len(args):
+            used += 1
+            return args[used - 1]
+        return None
+    while True:
+        i = fmt.find(b'%', pos)
+        literal = fmt[pos:] if i < 0 else fmt[pos:i]
+        try:
+            out += _unescape(literal, zero_prefix=False, quote=True)
+        except _Stop as stop:
+            raise _Stop(bytes(out) + stop.args[0])
+        if i < 0:
+            return bytes(out), used
+        m = _SPEC_RE.match(fmt, i)
+        flags, width, precision, conv = m.groups()
+        pos = m.end()
+        if conv == b'%':
+            if flags or width or precision is not None:
+                raise _Unsupported()
+            out += b'%'
+            continue
+        if conv is None or conv not in b'diouxXfFeEgGcsb' or b'#' in flags or b"'" in flags:
+            raise _Unsupported()
+        spec = b'%' + flags
+        if width == b'*':
+            width = b'%d' % _int_arg(next_arg() or b'', False)
+        if width:
+            spec += width
+        if precision is not None:
+            if precision == b'*':
+                precision = b'%d' % _int_arg(next_arg() or b'', False)
+                if precision.startswith(b'-'):
+                    precision = None
+            if precision is not None:
+                spec += b'.' + (precision or b'0')
+        arg = next_arg()
+        if conv in b'diouxX':
+            unsigned = conv in b'ouxX'
+            value = _int_arg(arg or b'', unsigned)
+            out += (spec + (b'd' if conv in b'iu' else conv)) % value
+        elif conv in b'fFeEgG':
+            if precision and int(precision) > 15:
+                raise _Unsupported()
+            out += (spec + conv) % _float_arg(arg or b'')
+        elif conv == b'c':
+            out += (spec + b's') % (arg or b'\0')[:1]
+        elif conv == b's':
+            out += (spec + b's') % (arg or b'')
+        else:
+            try:
+                text = _unescape(arg or b'', zero_prefix=True)
+            except _Stop as stop:
+                raise _Stop(bytes(out) + (spec + b's') % stop.args[0])
+            out += (spec + b's') % text
+
+def prepare_printf(args):
+    if len(args) < 2 or args[1] in ('--help', '--version'):
+        return None
+    fmt = _bytes(args[1])
+    rest = [_bytes(a) for a in args[2:]]
+    out = []
+    try:
+        while True:
+            text, used = _printf_once(fmt, rest)
+            out.append(text)
+            rest = rest[used:]
+            if not rest or not used:
+                break
+    except _Stop as stop:
+        out.append(stop.args[0])
+    except (_Unsupported, ValueError, TypeError, OverflowError):
+        return None
+    return _writer(b''.join(out))
+
+# ----- test / [ -----
+
+_UNARY = set('bcdefgGhkLnOprsStuwxz')
+_BINARY = {'=', '==', '!=', '-eq', '-ne', '-lt', '-le', '-gt', '-ge', '-nt', '-ot', '-ef'}
+_TEST_INT_RE = re.compile(r'[ \t\n\v\f\r]*[+-]?\d+[ \t\n\v\f\r]*\Z')
+
+class _TestSyntax(Exception):
+    """An error coreutils test would report (the external test prints it)."""
+
+class _Test:
+    """The coreutils test algorithm: POSIX rules for 1-4 arguments, else a full expression."""
+    def __init__(self, args, fds=None):
+        self.args = args
+        self.pos = 0
+        self.fds = fds      # None: only check the syntax (file tests are false)
+    def run(self):
+        n = len(self.args)
+        if n == 0:
+            return False
+        if n <= 4:
+            value = (self._one, self._two, self._three, self._four)[n - 1]()
+        else:
+            value = self._expr()
+        if self.pos != n:
+            raise _TestSyntax('extra argument')
+        return value
+    def _take(self, count=1):
+        self.pos += count
+        return self.args[self.pos - count:self.pos]
+    def _one(self):
+        return self._take()[0] != ''
+    def _two(self):
+        a = self.args[self.pos]
+        if a == '!':
+            self._take()
+            return not self._one()
+        if len(a) == 2 and a[0] == '-':
+            if a[1] not in _UNARY:
+                raise _TestSyntax('unary operator expected')
+            return self._unary()
+        raise _TestSyntax('extra argument')
+    def _three(self):
+        a, op, b = self.args[self.pos:self.pos + 3]
+        if op in _BINARY:
+            return self._binary()
+        if a == '!':
+            self._take()
+            return not self._two()
+        if a == '(' and b == ')':
+            self._take()
+            value = self._one()
+            self._take()
+            return value
+        if op in ('-a', '-o'):
+            return self._expr()
+        raise _TestSyntax('binary operator expected')
+    def _four(self):
+        a = self.args[self.pos]
+        if a == '!':
+            self._take()
+            return not self._three()
+        if a == '(' and self.args[self.pos + 3] == ')':
+            self._take()
+            value = self._two()
+            self._take()
+            return value
+        return self._expr()
+    def _expr(self):
+        value = self._and()
+        while self.pos < len(self.args) and self.args[self.pos] == '-o':
+            self._take()
+            value = self._and() or value
+        return value
+    def _and(self):
+        value = self._term()
+        while self.pos < len(self.args) and self.args[self.pos] == '-a':
+            self._take()
+            value = self._term() and value
+        return value
+    def _term(self):
+        args = self.args
+        if self.pos >= len(args):
+            raise _TestSyntax('argument expected')
+        a = args[self.pos]
+        if a == '!':
+            self._take()
+            return not self._term()
+        if a == '(':
+            self._take()
+            value = self._expr()
+            if self.pos >= len(args) or args[self.pos] != ')':
+                raise _TestSyntax("')' expected")
+            self._take()
+            return value
+        if self.pos + 2 < len(args) and args[self.pos + 1] in _BINARY:
+            return self._binary()
+        if len(a) == 2 and a[0] == '-' and a[1] in _UNARY and self.pos + 1 < len(args):
+            return self._unary()
+        self._take()
+        return a != ''
+    def _integer(self, text):
+        if not _TEST_INT_RE.match(text):
+            raise _TestSyntax('invalid integer')
+        return int(text)
+    def _binary(self):
+        a, op, b = self._take(3)
+        if op in ('=', '=='):
+            return a == b
+        if op == '!=':
+            return a != b
+        if op in ('-nt', '-ot', '-ef'):
+            if self.fds is None:
+                return False
+            sa, sb = _stat(a), _stat(b)
+            if op == '-ef':
+                return sa is not None and sb is not None and (sa.st_dev, sa.st_ino) == (sb.st_dev, sb.st_ino)
+            if op == '-ot':
+                sa, sb = sb, sa
+            return sa is not None and (sb is None or sa.st_mtime_ns > sb.st_mtime_ns)
+        x, y = self._integer(a), self._integer(b)
+        return {'-eq': x == y, '-ne': x != y, '-lt': x < y, '-le': x <= y, '-gt': x > y, '-ge': x >= y}[op]
+    def _unary(self):
+        op, arg = self._take(2)
+        op = op[1]
+        if op == 'z':
+            return arg == ''
+        if op == 'n':
+            return arg != ''
+        if op == 't':
+            fd = self._integer(arg)
+            if self.fds is None:
+                return False
+            return os.isatty(self.fds.get(fd, fd))
+        if self.fds is None:
+            return False
+        if op in 'rwx':
+            return os.access(arg, {'r': os.R_OK, 'w': os.W_OK, 'x': os.X_OK}[op])
+        if op in 'hL':
+            st = _stat(arg, follow=False)
+            return st is not None and stat.S_ISLNK(st.st_mode)
+        st = _stat(arg)
+        if st is None:
+            return False
+        mode = st.st_mode
+        return {
+            'e': True, 'f': stat.S_ISREG(mode), 'd': stat.S_ISDIR(mode), 'b': stat.S_ISBLK(mode),
+            'c': stat.S_ISCHR(mode), 'p': stat.S_ISFIFO(mode), 'S': stat.S_ISSOCK(mode),
+            's': st.st_size > 0, 'g': bool(mode & stat.S_ISGID), 'u': bool(mode & stat.S_ISUID),
+            'k': bool(mode & stat.S_ISVTX), 'O': st.st_uid == os.geteuid(), 'G': st.st_gid == os.getegid(),
+        }[op]
+
+def _stat(path, follow=True):
+    try:
+        return os.stat(path) if follow else os.lstat(path)
+    except (OSError, ValueError):
+        return None
+
+def prepare_test(args):
+    words = args[1:]
+    if args[0] == '[':
+        if words in (['--help'], ['--version']) or not words or words[-1] != ']':
+            return None
+        words = words[:-1]
+    try:
+        _Test(words).run()
+    except (_TestSyntax, IndexError):
+        return None
+    def run(fds):
+        return 0 if _Test(words, fds).run() else 1
+    return run
+
+# ----- true / false / pwd / cat -----
+
+def prepare_true(args):
+    if len(args) == 2 and args[1] in ('--help', '--version'):
+        return None
+    status = 0 if args[0] == 'true' else 1
+    return lambda fds: status
+
+def prepare_pwd(args):
+    logical = False
+    for arg in args[1:]:
+        if arg not in ('-L', '-P'):
+            return None
+        logical = arg == '-L'
+    def run(fds):
+        cwd = os.getcwd()
+        pwd = os.environ.get('PWD', '')
+        if logical and pwd.startswith('/') and '/./' not in pwd + '/' and '/../' not in pwd + '/':
+            a, b = _stat(pwd), _stat('.')
+            if a is not None and b is not None and (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino):
+                cwd = pwd
+        write_all(fds[1], _bytes(cwd) + b'\n')
+        return 0
+    return run
+
+def prepare_cat(args):
+    files = args[1:]
+    if any(f.startswith('-') and f != '-' for f in files):
+        return None
+    name = args[0]
+    def run(fds):
+        status = 0
+        out = fds[1]
+        try:
+            out_st = os.fstat(out)
+        except OSError:
+            out_st = None
+        for path in files or ['-']:
+            if path == '-':
+                copy_fd(fds[0], out)
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError as e:
+                write_all(fds[2], _bytes(f"{name}: {path}: {e.strerror}\n"))
+                status = 1
+                continue
+            try:
+                st = os.fstat(fd)
+                if out_st is not None and stat.S_ISREG(st.st_mode) and \
+                        (st.st_dev, st.st_ino) == (out_st.st_dev, out_st.st_ino) and st.st_size:
+                    write_all(fds[2], _bytes(f"{name}: {path}: input file is output file\n"))
+                    status = 1
+                    continue
+                copy_fd(fd, out)
+            except IsADirectoryError:
+                write_all(fds[2], _bytes(f"{name}: {path}: Is a directory\n"))
+                status = 1
+            finally:
+                os.close(fd)
+        return status
+    return run
+
+COMMANDS = {
+    'echo': prepare_echo,
+    'printf': prepare_printf,
+    'test': prepare_test,
+    '[': prepare_test,
+    'true': prepare_true,
+    'false': prepare_true,
+    'pwd': prepare_pwd,
+    'cat': prepare_cat,
+}
+
+def prepare(args):
+    """A callable running args in-process, or None to use the external binary."""
+    factory = COMMANDS.get(args[0]) if args else None
+    return factory(args) if factory is not None else None
+
+
+class InProcess:
+    """Popen-like handle for a utility run inside the shell (there is no pid).
+
+    The utility gets its own duplicates of the stage's fds and closes them
+    when it returns, so the next stage sees EOF exactly as with a process.
+    A lone foreground command runs inline; pipeline stages run in threads.
+    cpu and elapsed are the thread time and wall time it took (accounting.py).
+    """
+    pid = None
+    rusage = None
+    def __init__(self, func, fds, inline=False, args=None):
+        self.args = args
+        self.returncode = None
+        self.stdout = None
+        self.thread = None
+        self.cpu = 0.0
+        self.elapsed = None
+        own = {}
+        try:
+            for target in (0, 1, 2):
+                fd = fds.get(target)
+                if fd is None:
+                    fd = target
+                own[target] = os.open(os.devnull, os.O_RDWR) if fd == DEVNULL else os.dup(fd)
+        except OSError:
+            for fd in own.values():
+                os.close(fd)
+            raise
+        sys.stdout.flush()
+        if inline:
+            self._run(func, own)
+        else:
+            self.thread = threading.Thread(target=self._run, args=(func, own), daemon=True)
+            self.thread.start()
+    def _run(self, func, fds):
+        started, cpu = time.perf_counter(), time.thread_time()
+        try:
+            status = func(fds)
+        except BrokenPipeError:
+            # What the external command's SIGPIPE death would look like
+            status = 128 + signal.SIGPIPE
+        except OSError as e:
+            try:
+                write_all(fds[2], _bytes(f"{e}\n"))
+            except OSError:
+                pass
+            status = 1
+        finally:
+            for fd in fds.values():
+                os.close(fd)
+        self.cpu = time.thread_time() - cpu
+        self.elapsed = time.perf_counter() - started
+        self.returncode = status
+    def poll(self):
+        return self.returncode
+    def wait(self):
+        if self.thread is not None:
+            self.thread.join()
+        return self.returncode
@@ -0,0 +1,104 @@
+"""
+diskcache.py - Size-bounded on-disk key/value store used by the shell's caches.
+"""
+import os
+
+def cache_home():
+    """Base directory for the shell's caches ($XDG_CACHE_HOME/myshell)."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'myshell')
+
+class DiskCache:
+    """Stores one file per key under a private directory.
+
+    Reads refresh the entry's mtime, so when the total size goes over
+    max_bytes the least recently used entries are evicted first.
+    """
+    def __init__(self, directory, max_bytes=32 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.usable = None
+    def _ensure_dir(self):
+        if self.usable is None:
+            try:
+                os.makedirs(self.directory, mode=0o700, exist_ok=True)
+                # Never trust entries in a directory someone else controls
+                st = os.stat(self.directory)
+                self.usable = st.st_uid == os.getuid() and not st.st_mode & 0o022
+            except OSError:
+                self.usable = False
+        return self.usable
+    def path_for(self, key):
+        import hashlib
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+    def get(self, key):
+        """Return the stored bytes for key, or None."""
+        if not self._ensure_dir():
+            return None
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+    def put(self, key, data):
+        """Store bytes under key (atomically) and evict old entries if over budget."""
+        if not self._ensure_dir() or len(data) > self.max_bytes:
+            return False
+        import tempfile
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.path_for(key))
+        except OSError:
+            return False
+        self.evict()
+        return True
+    def delete(self, key):
+        try:
+            os.unlink(self.path_for(key))
+            return True
+        except OSError:
+            return False
+    def entries(self):
+        """[(mtime, size, path)] for every stored entry."""
+        result = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    result.append((st.st_mtime_ns, st.st_size, entry.path))
+        except OSError:
+            pass
+        return result
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            removed += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+        return removed
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
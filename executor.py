@@ -1,86 +1,320 @@
 """
 executor.py - Command execution engine for the advanced Python shell.
 """
-import subprocess
 import os
-import difflib
+import sys
+import time
+import signal
+import threading
+from pathcache import CommandHashTable
+from nodes import Subshell, Redirect, Command
+from pump import OutputStage
+from spawn import Process, spawn, HAVE_POSIX_SPAWN, DEVNULL
+import coreutils
+from tracing import TRACER
+from accounting import ResourceStats
+from heredoc import HEREDOC_OPS, input_fd
+from variables import VariableStore
+
+class RedirectionError(OSError):
+    """Raised when a redirection target cannot be opened."""
 
 class CommandExecutor:
     """Executes parsed shell commands and scripts."""
-    def execute(self, parsed_command, run_in_bg=False):
-        """Execute a parsed command structure. Returns (exit status, process)."""
-        # Advanced scripting constructs
-        if 'function_def' in parsed_command:
-            print(f"[executor] Function definition: {parsed_command['function_def']}")
-            # TODO: Store and allow calling functions
-            return 0, None
-        if 'block' in parsed_command:
-            print(f"[executor] Control flow block: {parsed_command['block']}")
-            # TODO: Parse and execute block
-            return 0, None
-        if 'heredoc' in parsed_command:
-            print(f"[executor] Here-document: {parsed_command['heredoc']}")
-            # TODO: Handle here-doc input and pass to command
-            return 0, None
+    def __init__(self, hashtable=None, backend=None):
+        self.hashtable = hashtable if hashtable is not None else CommandHashTable()
+        # 'posix_spawn' (default where available) or 'popen'; see spawn.py
+        self.backend = backend or ('posix_spawn' if HAVE_POSIX_SPAWN else 'popen')
+        # Callable that runs a subshell body in a forked child; set by the script interpreter
+        self.list_runner = None
+        # Callable that expands an unquoted here-document body; set by the script interpreter
+        self.heredoc_expander = None
+        # Utilities that must run as the external binary even though coreutils.py has them
+        self.external = set()
+        # Resource usage of every stage it waits for (see accounting.py); None turns it off
+        self.stats = ResourceStats()
+        # Shell variables (see variables.py); the script interpreter shares its own
+        self.variables = VariableStore()
+    def execute(self, parsed_command, run_in_bg=False, stdout=None, stderr=None, procs=None, stdin=None, messages=None):
+        """Execute a parsed command structure. Returns (exit status, process).
+
+        stdout is where the last stage writes when it is not redirected:
+        None for the shell's own stdout, an fd, or an OutputStage (from
+        pump.py) when the shell has to capture, tee or meter the output.
+        stderr is an fd for every stage's unredirected stderr and stdin an
+        fd for the first stage's stdin. If procs is given, each process is
+        appended to it as soon as it starts. Launch errors are printed to
+        messages, a text file (sys.stdout by default).
+        """
         # Pipeline/regular command execution
         pipeline = parsed_command.get('pipeline', [])
-        prev_proc = None
-        procs = []
-        opened_files = []
-        for i, cmd in enumerate(pipeline):
-            stdin = None
-            stdout = None
-            stderr = None
-            try:
-                # Input redirection
-                if cmd['stdin']:
-                    stdin = open(cmd['stdin'], 'r')
-                    opened_files.append(stdin)
-                elif prev_proc:
-                    stdin = prev_proc.stdout
-                # Output redirection
-                if cmd['stdout']:
-                    mode = 'a' if cmd.get('append') else 'w'
-                    stdout = open(cmd['stdout'], mode)
-                    opened_files.append(stdout)
-                # Stderr redirection
-                if cmd['stderr']:
-                    stderr = open(cmd['stderr'], 'w')
-                    opened_files.append(stderr)
-                # Launch process
-                proc = subprocess.Popen(cmd['args'], stdin=stdin, stdout=stdout or subprocess.PIPE, stderr=stderr, preexec_fn=os.setpgrp)
-                procs.append(proc)
-                if prev_proc and prev_proc.stdout:
-                    prev_proc.stdout.close()
-                prev_proc = proc
-            except FileNotFoundError:
-                print(f"Command not found: {cmd['args'][0]}")
+        procs = [] if procs is None else procs
+        opened_fds = []
+        prev_read = os.dup(stdin) if stdin is not None else None
+        output_read = None
+        # All stages share the first stage's process group, so job control
+        # can stop, continue or signal the whole pipeline at once
+        pgid = 0
+        started = time.perf_counter()
+        substituted = {}
+        try:
+            # Process substitutions start first, before the pipeline's pipes
+            # and threads exist, so their children hold none of those open
+            for i, cmd in enumerate(pipeline):
+                if isinstance(cmd, Command) and cmd.substitutions:
+                    substituted[i], pgid = self._substitute(cmd, stderr, procs, pgid, opened_fds)
+            for i, cmd in enumerate(pipeline):
+                fds = {0: prev_read, 1: None, 2: stderr}
+                if i in substituted:
+                    # The stage inherits its ends of the substitutions' pipes as /dev/fd/N
+                    cmd, inherited = substituted[i]
+                    fds.update((fd, fd) for fd in inherited)
+                write_end = None
+                if i < len(pipeline) - 1:
+                    next_read, write_end = os.pipe()
+                    fds[1] = write_end
+                elif isinstance(stdout, OutputStage):
+                    output_read, output_write = os.pipe()
+                    opened_fds.append(output_write)
+                    fds[1] = output_write
+                elif stdout is not None:
+                    fds[1] = stdout
+                try:
+                    self.apply_redirects(cmd, fds, opened_fds)
+                    if isinstance(cmd, Subshell):
+                        with TRACER.span('spawn', command='(subshell)'):
+                            proc = self._fork_subshell(cmd, fds, pgid)
+                    elif not cmd.args:
+                        # Redirections only (e.g. "> file"): files are created, nothing runs
+                        continue
+                    elif i not in substituted and (utility := self._in_process(cmd, run_in_bg)) is not None:
+                        # A lone foreground command needs no thread
+                        with TRACER.span('in-process', command=cmd.args[0]):
+                            proc = coreutils.InProcess(utility, fds, inline=len(pipeline) == 1
+                                                       and not isinstance(stdout, OutputStage), args=cmd.args)
+                    else:
+                        with TRACER.span('spawn', command=cmd.args[0]):
+                            # Resolve the command through the PATH hash table
+                            executable = self.hashtable.lookup(cmd.args[0])
+                            if executable is None:
+                                raise FileNotFoundError(cmd.args[0])
+                            # The cached environment block, with VAR=val prefixes laid over a copy
+                            env = self.variables.environ(cmd.assignments) if cmd.assignments else None
+                            # Launch process
+                            sys.stdout.flush()
+                            proc = spawn(executable, cmd.args, fds, env, self.backend, pgid)
+                    procs.append(proc)
+                    if proc.pid:
+                        pgid = pgid or proc.pid
+                finally:
+                    # The children hold their own copies of the pipe ends
+                    if prev_read is not None:
+                        os.close(prev_read)
+                        prev_read = None
+                    if write_end is not None:
+                        os.close(write_end)
+                        prev_read = next_read
+        except RedirectionError as e:
+            print(e, file=messages)
+            status = 1
+        except FileNotFoundError as e:
+            if isinstance(cmd, Command) and cmd.args:
+                print(f"Command not found: {cmd.args[0]}", file=messages)
                 # Suggest similar commands
-                all_cmds = set()
-                for p in ['/bin', '/usr/bin', '/usr/local/bin']:
-                    try:
-                        all_cmds.update(os.listdir(p))
-                    except Exception:
-                        pass
-                suggestions = difflib.get_close_matches(cmd['args'][0], all_cmds, n=3)
+                suggestions = self.hashtable.suggest(cmd.args[0], n=3)
                 if suggestions:
-                    print(f"Did you mean: {', '.join(suggestions)}?")
-                return 127, None
-            except PermissionError:
-                print(f"Permission denied: {cmd['args'][0]}")
-                return 126, None
-            except Exception as e:
-                print(f"Execution error: {e}")
-                return 1, None
+                    print(f"Did you mean: {', '.join(suggestions)}?", file=messages)
+            else:
+                # A subshell has no command name to look up
+                print(f"(subshell): {e}", file=messages)
+            status = 127
+        except PermissionError:
+            print(f"Permission denied: {cmd.args[0] if isinstance(cmd, Command) and cmd.args else '(subshell)'}",
+                  file=messages)
+            status = 126
+        except Exception as e:
+            print(f"Execution error: {e}", file=messages)
+            status = 1
+        else:
+            status = None
+        finally:
+            if prev_read is not None:
+                os.close(prev_read)
+            # Close any opened files
+            for fd in opened_fds:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        if status is not None:
+            # Launch failed: stop and reap the stages that did start
+            for proc in procs:
+                if proc.pid is None:
+                    continue
+                try:
+                    os.kill(proc.pid, signal.SIGTERM)
+                except OSError:
+                    pass
+            if output_read is not None:
+                self._drain(stdout, output_read)
+            for proc in procs:
+                proc.wait()
+            return status, None
+        if output_read is not None:
+            if run_in_bg:
+                threading.Thread(target=self._drain, args=(stdout, output_read), daemon=True).start()
+            else:
+                self._drain(stdout, output_read)
         # If background job, return immediately with process
         if run_in_bg and procs:
             return 0, procs[-1]
-        # Wait for last process in pipeline
-        status = procs[-1].wait() if procs else 0
-        # Close any opened files
-        for f in opened_files:
+        # Wait for the pipeline (every stage, for its rusage); its status is the last command's
+        status = 0
+        for proc in procs:
+            with TRACER.span('wait', pid=proc.pid) as span:
+                status = proc.wait()
+                span.set(status=status)
+            if self.stats is not None:
+                self.stats.add_process(proc, status, time.perf_counter() - started)
+        if status < 0:
+            # Popen reports death by signal N as -N
+            status = 128 - status
+        if getattr(parsed_command, 'negate', False):
+            status = int(status == 0)
+        return status, None
+    def _in_process(self, cmd, run_in_bg):
+        """The in-process version of cmd (see coreutils.py), or None to spawn it."""
+        name = cmd.args[0]
+        # Background jobs need a real process group for job control
+        if run_in_bg or cmd.assignments or name in self.external or name not in coreutils.COMMANDS:
+            return None
+        return coreutils.prepare(cmd.args)
+    def _drain(self, output, fd):
+        try:
+            output.drain(fd)
+        finally:
+            os.close(fd)
+    def apply_redirects(self, cmd, fds, opened_fds):
+        """Apply a command's redirections, left to right, onto the fds map (0/1/2)."""
+        for r in cmd.redirects:
+            if r.op in ('>&', '<&'):
+                if r.target == '-':
+                    fds[r.fd] = DEVNULL
+                    continue
+                if not r.target.isdigit():
+                    # ">&file" is the same as "&>file"
+                    fd = self._open(r.target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, opened_fds)
+                    fds[1] = fds[2] = fd
+                    continue
+                source = int(r.target)
+                if source not in fds:
+                    raise RedirectionError(f"{source}: bad file descriptor")
+                fds[r.fd] = fds[source] if fds[source] is not None else source
+                continue
+            if r.fd not in fds:
+                raise RedirectionError(f"{r.fd}: unsupported file descriptor")
+            if r.op == '<':
+                fds[r.fd] = self._open(r.target, os.O_RDONLY, opened_fds)
+            elif r.op == '<>':
+                fds[r.fd] = self._open(r.target, os.O_RDWR | os.O_CREAT, opened_fds)
+            elif r.op in ('>', '>>'):
+                flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if r.op == '>>' else os.O_TRUNC)
+                fds[r.fd] = self._open(r.target, flags, opened_fds)
+            elif r.op in ('&>', '&>>'):
+                flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if r.op == '&>>' else os.O_TRUNC)
+                fds[1] = fds[2] = self._open(r.target, flags, opened_fds)
+            elif r.op in HEREDOC_OPS:
+                if r.body is None:
+                    raise RedirectionError(f"{r.op}{r.target}: here-document without a body")
+                body = r.body
+                if isinstance(body, str):
+                    body = (self.heredoc_expander(body) if self.heredoc_expander else body).encode()
+                fds[r.fd] = self._input(body, opened_fds)
+            elif r.op == '<<<':
+                fds[r.fd] = self._input((r.target + '\n').encode(), opened_fds)
+            else:
+                raise RedirectionError(f"unsupported redirection '{r.op}'")
+    def _open(self, path, flags, opened_fds):
+        try:
+            fd = os.open(path, flags, 0o666)
+        except OSError as e:
+            raise RedirectionError(f"{path}: {e.strerror}") from None
+        opened_fds.append(fd)
+        return fd
+    def _input(self, data, opened_fds):
+        fd = input_fd(data)
+        opened_fds.append(fd)
+        return fd
+    def _substitute(self, cmd, stderr, procs, pgid, opened_fds):
+        """Start cmd's process substitutions. Returns ((cmd with /dev/fd/N in their place, [N...]), pgid).
+
+        Each list runs in a forked child on one end of a pipe. The shell
+        keeps the other end, fd N, open until the stage has started, and the
+        stage inherits it. The children join the pipeline's process group
+        and go at the front of procs, so the last stage's status stays the
+        pipeline's.
+        """
+        args = list(cmd.args)
+        redirects = list(cmd.redirects)
+        ours = []
+        for where, sub in cmd.substitutions:
+            read_end, write_end = os.pipe()
+            mine, theirs = (read_end, write_end) if sub.op == '<' else (write_end, read_end)
+            opened_fds.append(mine)
+            ours.append(mine)
+            try:
+                child_fds = {0: None, 1: theirs, 2: stderr} if sub.op == '<' else {0: theirs, 1: None, 2: stderr}
+                with TRACER.span('spawn', command=f'{sub.op}(...)'):
+                    # Other substitutions' ends stay with the shell, or a reader would never see EOF
+                    proc = self._fork_subshell(sub, child_fds, pgid, close=opened_fds)
+            finally:
+                os.close(theirs)
+            procs.insert(0, proc)
+            pgid = pgid or proc.pid
+            path = f'/dev/fd/{mine}'
+            if isinstance(where, int):
+                args[where] = path
+            else:
+                i = next(i for i, r in enumerate(redirects) if r is where)
+                redirects[i] = Redirect(where.fd, where.op, path)
+        return (Command(args, redirects, cmd.assignments), ours), pgid
+    def _fork_subshell(self, node, fds, pgid=0, close=()):
+        """Run node.body in a forked child on fds; close lists the shell's fds the child must not keep."""
+        if self.list_runner is None:
+            raise OSError("subshells are not supported here")
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
             try:
-                f.close()
-            except Exception:
+                os.setpgid(0, pgid)
+                for target, fd in fds.items():
+                    if fd == DEVNULL:
+                        fd = os.open(os.devnull, os.O_RDWR)
+                    if fd is not None and fd != target:
+                        os.dup2(fd, target)
+                for fd in close:
+                    if fd not in fds:
+                        os.close(fd)
+                # The host may have replaced sys.stdout or sys.stderr (an embedding program)
+                for fd, name in ((1, 'stdout'), (2, 'stderr')):
+                    try:
+                        attached = getattr(sys, name).fileno() == fd
+                    except (AttributeError, ValueError, OSError):
+                        attached = False
+                    if not attached:
+                        setattr(sys, name, open(fd, 'w', closefd=False))
+                status = self.list_runner(node.body)
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 0
+            except BaseException:
                 pass
-        return status, None 
\ No newline at end of file
+            finally:
+                sys.stdout.flush()
+                os._exit(status)
+        try:
+            # Also from the parent, so the group exists before the next stage joins it
+            os.setpgid(pid, pgid or pid)
+        except OSError:
+            pass
+        return Process(pid)
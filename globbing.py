@@ -0,0 +1,340 @@
+"""
+globbing.py - Brace expansion and pathname globbing of arguments for the advanced Python shell.
+
+    ls *.py src/?.c [a-c]*.txt [!.]*     wildcards, one path component at a time
+    cp file.{c,h} dir/  echo {1..10..2}   brace expansion, before globbing
+    grep TODO **/*.py                     ** matches any number of directories
+
+The parser records each argument with an unquoted *, ?, [ or { as a
+pattern (lexer.glob_pattern), in which quoted characters are escaped with a
+backslash; it is expanded each time the command runs, as the parsed tree
+is cached. The matches of a pattern are sorted: each directory's entries in
+order, its subdirectories depth first. A pattern with no match stays as it
+is, or is dropped (nullglob), or fails the command (failglob). Names that
+start with '.' only match a pattern that starts with '.' (unless dotglob).
+
+Directories are read with os.scandir, whose entries already tell files from
+directories, so no path is stat'ed. The listings are kept while one command
+is expanded: `cmd src/*.py src/*.pyi` reads src/ once. A ** walk is not
+kept: it reads each directory once, matches the rest of the pattern against
+the same listing, and yields paths as it goes.
+"""
+import os
+import re
+import sys
+import heapq
+
+GLOBSTAR = object()     # a ** path component
+OPTIONS = ('nullglob', 'failglob', 'dotglob')
+_SEQUENCE_RE = re.compile(r'(-?\d+)\.\.(-?\d+)(?:\.\.(-?\d+))?$|([A-Za-z])\.\.([A-Za-z])(?:\.\.(-?\d+))?$')
+_ESCAPE_RE = re.compile(r'\\(.)', re.S)
+
+class NoMatch(Exception):
+    """Raised (with failglob) for a pattern that matches nothing."""
+
+# ----- brace expansion -----
+def expand_braces(word):
+    """a{b,c}d -> [abd, acd]; {1..3} and {a..c} are sequences. Escaped braces and ${ are left alone."""
+    i = 0
+    n = len(word)
+    while i < n:
+        c = word[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '{' and (i == 0 or word[i-1] != '$'):
+            end, alternatives = _brace(word, i)
+            if alternatives is not None:
+                prefix = word[:i]
+                tails = expand_braces(word[end:])
+                return [prefix + a + t for alt in alternatives for a in expand_braces(alt) for t in tails]
+        i += 1
+    return [word]
+
+def _brace(word, i):
+    """(end, alternatives) of the brace at word[i], or (None, None) if it is not an expansion."""
+    depth = 0
+    start = i + 1
+    parts = []
+    j = i
+    n = len(word)
+    while j < n:
+        c = word[j]
+        if c == '\\':
+            j += 2
+            continue
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+            if depth == 0:
+                if parts:
+                    parts.append(word[start:j])
+                    return j + 1, parts
+                return j + 1, _sequence(word[i+1:j])
+        elif c == ',' and depth == 1:
+            parts.append(word[start:j])
+            start = j + 1
+        j += 1
+    return None, None
+
+def _sequence(text):
+    m = _SEQUENCE_RE.match(text)
+    if not m:
+        return None
+    first, last, step, cfirst, clast, cstep = m.groups()
+    if cfirst:
+        start, stop, step = ord(cfirst), ord(clast), cstep
+    else:
+        start, stop = int(first), int(last)
+    step = abs(int(step or 1)) or 1
+    values = range(start, stop + 1, step) if start <= stop else range(start, stop - 1, -step)
+    if cfirst:
+        return [chr(v) for v in values]
+    # {01..10}: as wide as the wider end
+    padded = any(len(end.lstrip('-')) > 1 and end.lstrip('-')[0] == '0' for end in (first, last))
+    width = max(len(first), len(last)) if padded else 0
+    return [str(v).zfill(width) if v >= 0 else '-' + str(-v).zfill(width - 1) for v in values]
+
+# ----- patterns -----
+def unescape(pattern):
+    return _ESCAPE_RE.sub(r'\1', pattern) if '\\' in pattern else pattern
+
+def translate(component):
+    """A compiled regex matching one path component of an escaped pattern, or None if it has no wildcard."""
+    out = []
+    magic = False
+    i = 0
+    n = len(component)
+    while i < n:
+        c = component[i]
+        i += 1
+        if c == '\\' and i < n:
+            out.append(re.escape(component[i]))
+            i += 1
+        elif c == '*':
+            magic = True
+            if not out or out[-1] != '.*':
+                out.append('.*')
+        elif c == '?':
+            magic = True
+            out.append('.')
+        elif c == '[':
+            end = _bracket_end(component, i)
+            if end < 0:
+                out.append(re.escape(c))
+                continue
+            magic = True
+            body = component[i:end]
+            negate = body[:1] in ('!', '^')
+            if negate:
+                body = body[1:]
+            chars = []
+            j = 0
+            while j < len(body):
+                ch = body[j]
+                if ch == '\\' and j + 1 < len(body):
+                    j += 1
+                    chars.append(re.escape(body[j]))
+                elif ch == '-':
+                    chars.append('-')
+                else:
+                    chars.append(re.escape(ch))
+                j += 1
+            out.append(('[^' if negate else '[') + ''.join(chars) + ']')
+            i = end + 1
+        else:
+            out.append(re.escape(c))
+    return re.compile(''.join(out) + r'\Z', re.S) if magic else None
+
+def _bracket_end(component, i):
+    """Index of the ']' closing the bracket expression that starts after component[i-1], or -1."""
+    n = len(component)
+    if i < n and component[i] in '!^':
+        i += 1
+    if i < n and component[i] == ']':
+        i += 1
+    while i < n and component[i] != ']':
+        i += 2 if component[i] == '\\' else 1
+    return i if i < n else -1
+
+def _split(pattern):
+    """Split an escaped pattern at its unescaped slashes."""
+    parts = []
+    start = 0
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '\\':
+            i += 2
+            continue
+        if c == '/':
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    parts.append(pattern[start:])
+    return parts
+
+class Globber:
+    """Expands the patterns of a command's arguments, with a directory-listing cache per command."""
+    def __init__(self):
+        self.nullglob = False
+        self.failglob = False
+        self.dotglob = False
+        self.noglob = False         # set -f
+        self.listings = {}          # directory -> sorted [(name, is_dir, is_symlink)] for the current command
+        self._compiled = {}         # pattern -> components (see compile)
+    def command(self, cmd):
+        """cmd with its patterns expanded: a new Command, or cmd itself if it has none."""
+        if not cmd.globs or self.noglob:
+            return cmd
+        globs = dict(cmd.globs)
+        args = []
+        where = {}
+        try:
+            for i, arg in enumerate(cmd.args):
+                where[i] = len(args)
+                if i in globs:
+                    args.extend(self.expand(globs[i]))
+                else:
+                    args.append(arg)
+        finally:
+            self.forget()
+        substitutions = [(where[w] if isinstance(w, int) else w, p) for w, p in cmd.substitutions]
+        return type(cmd)(args, cmd.redirects, cmd.assignments, substitutions)
+    def forget(self):
+        """Drop the directory listings read for the command just expanded."""
+        self.listings = {}
+    def expand(self, pattern):
+        """The words an argument pattern expands to. Raises NoMatch with failglob."""
+        words = []
+        for word in expand_braces(pattern):
+            if any(not isinstance(c, str) for c in self.compile(word)):
+                matches = list(self.iglob(word))
+                if matches:
+                    words.extend(matches)
+                    continue
+                if self.failglob:
+                    raise NoMatch(unescape(word))
+                if self.nullglob:
+                    continue
+            words.append(unescape(word))
+        return words
+    def iglob(self, pattern):
+        """Yield the paths matching an escaped pattern (no braces), sorted."""
+        components = self.compile(pattern)
+        if pattern.startswith('/'):
+            return self._match('/', components, 0)
+        return self._match('', components, 0)
+    def compile(self, pattern):
+        """Each path component as GLOBSTAR, its literal text, or (regex match, matches dot names)."""
+        components = self._compiled.get(pattern)
+        if components is None:
+            if len(self._compiled) >= 256:
+                self._compiled.clear()
+            components = []
+            for part in _split(pattern.lstrip('/')):
+                if part == '**':
+                    if not components or components[-1] is not GLOBSTAR:
+                        components.append(GLOBSTAR)
+                    continue
+                regex = translate(part)
+                if regex is None:
+                    components.append(unescape(part))
+                else:
+                    components.append((regex.match, part.startswith(('.', '\\.'))))
+            components = self._compiled[pattern] = tuple(components)
+        return components
+    # ----- matching -----
+    def _match(self, directory, components, i, entries=None):
+        """Yield the paths under directory that match components[i:], sorted; entries is its listing if known."""
+        component = components[i]
+        last = i == len(components) - 1
+        prefix = directory if not directory or directory.endswith('/') else directory + '/'
+        if component is GLOBSTAR:
+            yield from self._globstar(prefix, components, i, entries)
+            return
+        if isinstance(component, str):
+            path = prefix + component
+            if last:
+                if os.path.lexists(path):
+                    yield path
+            elif component:
+                yield from self._match(path, components, i + 1)
+            else:
+                # An empty component: a trailing slash, or a doubled one
+                yield from self._match(prefix, components, i + 1)
+            return
+        match, dot = component
+        dot = dot or self.dotglob
+        if entries is None:
+            entries = self.listing(prefix)
+        if last:
+            for name, is_dir, is_symlink in entries:
+                if (dot or name[0] != '.') and match(name):
+                    yield prefix + name
+            return
+        # 'a/...' sorts after 'a.b/...', as the whole paths do
+        subdirs = sorted(name + '/' for name, is_dir, is_symlink in entries
+                         if is_dir and (dot or name[0] != '.') and match(name))
+        for name in subdirs:
+            yield from self._match(prefix + name, components, i + 1)
+    def _globstar(self, prefix, components, i, entries):
+        """The matches of components[i+1:] in prefix and every directory below it, as one sorted stream.
+
+        Each directory is read once; its listing serves both the rest of
+        the pattern and the walk. Symbolic links to directories are not
+        followed, and hidden directories are skipped without dotglob.
+        """
+        if entries is None:
+            entries = self._scan(prefix)
+        dotglob = self.dotglob
+        if i == len(components) - 1:
+            # A trailing ** matches everything below, files and directories
+            here = (prefix + name for name, is_dir, is_symlink in entries if dotglob or name[0] != '.')
+        else:
+            here = self._match(prefix, components, i + 1, entries)
+        subdirs = sorted(name + '/' for name, is_dir, is_symlink in entries
+                         if is_dir and not is_symlink and (dotglob or name[0] != '.'))
+        if not subdirs:
+            return here
+        below = (path for name in subdirs for path in self._globstar(prefix + name, components, i, None))
+        return heapq.merge(here, below)
+    def listing(self, prefix):
+        """The sorted entries of a directory, read once per command."""
+        entries = self.listings.get(prefix)
+        if entries is None:
+            entries = self.listings[prefix] = self._scan(prefix)
+        return entries
+    def _scan(self, prefix):
+        try:
+            with os.scandir(prefix or '.') as it:
+                entries = []
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir()
+                        is_symlink = is_dir and entry.is_symlink()
+                    except OSError:
+                        is_dir = is_symlink = False
+                    entries.append((entry.name, is_dir, is_symlink))
+        except OSError:
+            return []
+        entries.sort()
+        return entries
+    # ----- shopt -----
+    def builtin(self, args):
+        """shopt [-s|-u] [nullglob|failglob|dotglob ...]: set, unset or show the globbing options."""
+        flag = args[0] if args[:1] in (['-s'], ['-u']) else None
+        names = args[1:] if flag else args
+        for name in names:
+            if name not in OPTIONS:
+                print(f"shopt: {name}: invalid shell option name", file=sys.stderr)
+                return 1
+        if flag:
+            for name in names:
+                setattr(self, name, flag == '-s')
+            return 0
+        for name in names or OPTIONS:
+            print(f"{name:<10}\t{'on' if getattr(self, name) else 'off'}")
+        return 0
@@ -0,0 +1,132 @@
+"""
+heredoc.py - Here-documents and here-strings for the advanced Python shell.
+
+    cat <<EOF        the lines up to one that is exactly EOF; $VAR is expanded
+    cat <<'EOF'      quoted delimiter: the body is taken literally
+    cat <<-EOF       leading tabs are stripped from the body and the delimiter
+    cat <<< "$x"     here-string: the word and a newline
+
+The command parser sees one line at a time, so the bodies are read after
+it: by the script parser from the lines that follow in the source, and by
+the interactive loop with a '> ' prompt. Each body is stored on its
+Redirect. A body under a quoted delimiter never changes, so it is encoded
+to bytes once, when it is read; an unquoted one stays text and is expanded
+each time the command runs.
+
+The executor hands the bytes to the command without a temporary file
+(input_fd): a body that fits in a pipe is written into one before the
+command starts, and a larger one into an anonymous memory file
+(os.memfd_create), rewound to the start, which the command can also stat
+and seek. Without memfd, a thread writes it into a pipe.
+"""
+import os
+import re
+import threading
+from lexer import tokenize, unquote, OP, WORD
+from nodes import Pipeline, ListNode, Subshell
+
+HEREDOC_OPS = ('<<', '<<-')
+PIPE_SIZE = 65536
+_HEREDOC_OP_RE = re.compile(r'\d*(<<-?)$')
+
+# ----- reading bodies -----
+def delimiters(line):
+    """(op, raw delimiter) for each here-document in a source line, in order."""
+    if '<<' not in line:
+        return []
+    try:
+        tokens = tokenize(line)
+    except ValueError:
+        return []
+    found = []
+    for tok, word in zip(tokens, tokens[1:]):
+        if tok.kind == OP and word.kind == WORD:
+            m = _HEREDOC_OP_RE.match(tok.value)
+            if m:
+                found.append((m.group(1), word.raw))
+    return found
+
+def read_body(op, raw, next_line):
+    """The body of a here-document, from next_line() (None at the end of input).
+
+    Returns bytes for a quoted delimiter, text to expand otherwise, or None
+    if the input ended before the delimiter.
+    """
+    word = unquote(raw)
+    lines = []
+    while True:
+        line = next_line()
+        if line is None:
+            return None
+        if op == '<<-':
+            line = line.lstrip('\t')
+        if line == word:
+            break
+        lines.append(line + '\n')
+    body = ''.join(lines)
+    return body.encode() if is_quoted(raw) else body
+
+def is_quoted(raw):
+    return any(c in raw for c in '\'"\\')
+
+def pending(parsed):
+    """The here-document Redirects of a parsed command line that have no body yet, in source order."""
+    found = []
+    _collect(parsed, found)
+    return found
+
+def _collect(node, found):
+    if isinstance(node, ListNode):
+        for item, _ in node.items:
+            _collect(item, found)
+    elif isinstance(node, Pipeline):
+        for cmd in node.commands:
+            if isinstance(cmd, Subshell):
+                _collect(cmd.body, found)
+            found.extend(r for r in cmd.redirects if r.op in HEREDOC_OPS and r.body is None)
+
+def attach(parsed, bodies):
+    """Store bodies (read with read_body) on the here-documents of parsed, in order."""
+    for redirect, body in zip(pending(parsed), bodies):
+        redirect.body = body
+
+# ----- feeding a body to a command -----
+def input_fd(data):
+    """A readable fd holding the bytes data, for a command's stdin (or another fd)."""
+    if len(data) <= PIPE_SIZE:
+        read_end, write_end = os.pipe()
+        try:
+            # Never block: if the pipe is smaller than usual, fall back below
+            os.set_blocking(write_end, False)
+            written = os.write(write_end, data) if data else 0
+        except BlockingIOError:
+            written = 0
+        finally:
+            os.close(write_end)
+        if written == len(data):
+            return read_end
+        os.close(read_end)
+    if hasattr(os, 'memfd_create'):
+        fd = os.memfd_create('heredoc', os.MFD_CLOEXEC)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.lseek(fd, 0, os.SEEK_SET)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+    read_end, write_end = os.pipe()
+    threading.Thread(target=_write_all, args=(write_end, data), daemon=True).start()
+    return read_end
+
+def _write_all(fd, data):
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    except OSError:
+        pass        # The reader exited early
+    finally:
+        os.close(fd)
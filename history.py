@@ -1,30 +1,248 @@
 """
 history.py - Command history and expansion for the advanced Python shell.
+
+History is shared between sessions through an append-only file: each new
+entry is written with one O_APPEND write under an exclusive flock(), and at
+startup only the tail of the file is read (through mmap, newest first) until
+max_entries distinct commands are found. Repeated commands are kept once, at
+their most recent position. A sorted array of the entries, searched with
+bisect, answers '!prefix' without scanning the whole history.
+
+Compaction writes a new file beside the old one and renames it into place,
+so a crash leaves one complete file or the other. A session whose file was
+replaced by another's compaction reopens it the next time it takes the lock.
 """
+import os
+import re
+import mmap
+import fcntl
+import bisect
+import tempfile
+
+_ESCAPE_RE = re.compile(r'\\(.)', re.S)
+READ_CHUNK = 1 << 20
+
+def _encode(line):
+    return (line.replace('\\', '\\\\').replace('\n', '\\n') + '\n').encode('utf-8', 'surrogateescape')
+
+def _decode(raw):
+    text = raw.decode('utf-8', 'surrogateescape')
+    if '\\' not in text:
+        return text
+    return _ESCAPE_RE.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), text)
 
 class HistoryManager:
     """Manages command history and history expansion (!, !!, etc.)."""
-    def __init__(self):
-        self.history = []
+    def __init__(self, path=None, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = {}       # command -> sequence number, oldest first
+        self.seq = 0
+        self._sorted = []       # distinct commands in sorted order ...
+        self._seqs = []         # ... and the sequence number of each
+        self._fd = None
+        if path:
+            self.load(path, max_entries)
+    @property
+    def history(self):
+        return list(self.entries)
+    def __len__(self):
+        return len(self.entries)
+    # ----- persistence -----
+    def load(self, path, max_entries=None):
+        """Read the newest max_entries distinct commands from path and append to it from now on."""
+        self.path = path
+        if max_entries is not None:
+            self.max_entries = max_entries
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        except OSError:
+            return False
+        self.close()
+        self._fd = fd
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            lines, unread = self._read_tail(fd)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        for line in lines:
+            if line in self.entries:
+                del self.entries[line]
+        self.entries.update(zip(lines, range(self.seq + 1, self.seq + 1 + len(lines))))
+        self.seq += len(lines)
+        self._trim()
+        if unread > os.fstat(fd).st_size // 2:
+            # Most of the file is shadowed duplicates or entries past the bound
+            self.compact()
+        return True
+    def _read_tail(self, fd):
+        """Newest distinct lines (oldest first) and the byte offset where reading stopped."""
+        size = os.fstat(fd).st_size
+        if size == 0:
+            return [], 0
+        found = {}
+        limit = self.max_entries
+        end = size
+        carry = b''
+        unread = 0
+        with mmap.mmap(fd, size, access=mmap.ACCESS_READ) as m:
+            while end > 0 and not unread:
+                start = max(0, end - READ_CHUNK)
+                lines = (m[start:end] + carry).split(b'\n')
+                # The first piece may continue a line from the previous chunk
+                carry = lines.pop(0) if start else b''
+                for i in range(len(lines) - 1, -1, -1):
+                    raw = lines[i]
+                    if raw and raw not in found:
+                        found[raw] = None
+                        if len(found) >= limit:
+                            unread = start + (len(carry) + 1 if start else 0) + sum(len(x) + 1 for x in lines[:i])
+                            break
+                end = start
+        lines = [_decode(raw) for raw in reversed(list(found))]
+        return lines, unread
+    def compact(self):
+        """Rewrite the file with just its newest distinct entries: a synced copy renamed over it, under the lock."""
+        if self._fd is None:
+            return False
+        try:
+            self._lock()
+        except OSError:
+            return False
+        fd = self._fd
+        tmp = None
+        try:
+            # Pick up what other sessions appended since we loaded
+            lines, _ = self._read_tail(fd)
+            directory = os.path.dirname(os.path.abspath(self.path))
+            tmp_fd, tmp = tempfile.mkstemp(prefix='.history-', dir=directory)
+            with os.fdopen(tmp_fd, 'wb') as f:
+                f.write(b''.join(_encode(line) for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            tmp = None
+            self._sync_directory(directory)
+            new_fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+        except OSError:
+            return False
+        finally:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        self._fd = new_fd
+        return True
+    def _lock(self):
+        """Take the exclusive lock, first moving to the file now at path if a compaction replaced ours."""
+        while True:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                current = os.stat(self.path)
+            except OSError:
+                return
+            held = os.fstat(self._fd)
+            if (current.st_dev, current.st_ino) == (held.st_dev, held.st_ino):
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+            os.close(self._fd)
+            self._fd = fd
+    def _sync_directory(self, directory):
+        # Make the rename itself durable; not every filesystem allows it
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    def install_readline(self):
+        """Seed readline's history (used by Up-arrow and Ctrl-R) with the loaded entries."""
+        try:
+            import readline
+        except ImportError:
+            return
+        readline.clear_history()
+        readline.set_history_length(self.max_entries)
+        for line in self.entries:
+            readline.add_history(line)
+    # ----- entries -----
     def add(self, line):
         """Add a command to history."""
-        self.history.append(line)
+        if not line.strip():
+            return
+        if self.entries and next(reversed(self.entries)) == line:
+            return
+        self._insert(line)
+        if self._fd is not None:
+            try:
+                self._lock()
+                try:
+                    os.write(self._fd, _encode(line))
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+            except OSError:
+                pass
+    def _insert(self, line):
+        self.seq += 1
+        i = bisect.bisect_left(self._sorted, line)
+        if line in self.entries:
+            # Move the repeated command to the end
+            del self.entries[line]
+            self._seqs[i] = self.seq
+        else:
+            self._sorted.insert(i, line)
+            self._seqs.insert(i, self.seq)
+        self.entries[line] = self.seq
+        if len(self.entries) > self.max_entries + max(16, self.max_entries // 4):
+            self._trim()
+    def _trim(self):
+        """Drop the oldest entries past max_entries and rebuild the sorted index."""
+        # Batched (see _insert) so that the bound costs O(1) amortized per add
+        if len(self.entries) > self.max_entries:
+            self.entries = dict(list(self.entries.items())[-self.max_entries:])
+        entries = self.entries
+        self._sorted = sorted(entries)
+        self._seqs = [entries[line] for line in self._sorted]
     def get(self, index):
         """Get a command from history by index."""
-        if 0 <= index < len(self.history):
-            return self.history[index]
+        if 0 <= index < len(self.entries):
+            return list(self.entries)[index]
         return None
+    def last(self):
+        return next(reversed(self.entries)) if self.entries else None
+    def find_prefix(self, prefix):
+        """Most recent command starting with prefix, or None."""
+        lo = bisect.bisect_left(self._sorted, prefix)
+        hi = bisect.bisect_left(self._sorted, prefix + '\U0010ffff')
+        if lo == hi:
+            return None
+        seqs = self._seqs[lo:hi]
+        return self._sorted[lo + seqs.index(max(seqs))]
+    def search(self, prefix, limit=10):
+        """Commands starting with prefix, most recent first."""
+        lo = bisect.bisect_left(self._sorted, prefix)
+        hi = bisect.bisect_left(self._sorted, prefix + '\U0010ffff')
+        matches = sorted(range(lo, hi), key=self._seqs.__getitem__, reverse=True)[:limit]
+        return [self._sorted[i] for i in matches]
     def expand(self, line):
         """Expand history references in a command line."""
         if line.strip() == '!!':
-            return self.history[-1] if self.history else ''
+            return self.last() or ''
         elif line.startswith('!') and line[1:].isdigit():
             idx = int(line[1:]) - 1
             return self.get(idx) or line
         elif line.startswith('!') and len(line) > 1:
-            prefix = line[1:]
-            for cmd in reversed(self.history):
-                if cmd.startswith(prefix):
-                    return cmd
-            return line
-        return line 
\ No newline at end of file
+            return self.find_prefix(line[1:]) or line
+        return line
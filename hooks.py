@@ -0,0 +1,234 @@
+"""
+hooks.py - Plugin hook dispatch with latency budgets for the advanced Python shell.
+
+Hooks (pre_exec_hooks, post_exec_hooks, on_error_hooks) run inline by
+default, so a pre-exec hook can still block the command it sees. A hook that
+only observes -- logging, auditing, metrics -- can declare itself async:
+
+    from hooks import async_hook
+
+    class Plugin(PluginBase):
+        @async_hook(budget=0.2)
+        def post_exec(self, cmd, status):
+            ...
+
+Async hooks (and 'async def' hooks) are queued to a small pool of worker
+threads and never delay the prompt; when the queue is full the call is
+dropped and counted. Every hook is timed. A hook that runs over its budget
+on STRIKES consecutive calls is disabled until 'hooks enable NAME'.
+'hooks stats' shows the timings.
+"""
+import time
+import queue
+import threading
+from tracing import TRACER
+
+KINDS = ('pre_exec_hooks', 'post_exec_hooks', 'on_error_hooks')
+_LABELS = {'pre_exec_hooks': 'pre-exec', 'post_exec_hooks': 'post-exec', 'on_error_hooks': 'on-error'}
+_CO_COROUTINE = 0x80
+STRIKES = 3
+
+def async_hook(func=None, budget=None):
+    """Mark a hook to run on the background workers (usable with or without arguments)."""
+    def mark(f):
+        f.hook_mode = 'async'
+        if budget is not None:
+            f.hook_budget = budget
+        return f
+    return mark(func) if func is not None else mark
+
+def sync_hook(func=None, budget=None):
+    """Mark a hook to run inline (the default) with its own budget."""
+    def mark(f):
+        f.hook_mode = 'sync'
+        if budget is not None:
+            f.hook_budget = budget
+        return f
+    return mark(func) if func is not None else mark
+
+def hook_name(hook):
+    func = getattr(hook, '__func__', hook)
+    module = getattr(func, '__module__', None) or ''
+    name = getattr(func, '__qualname__', None) or repr(hook)
+    return f"{module.rsplit('.', 1)[-1]}.{name}" if module else name
+
+class HookStats:
+    """Timing and state of one registered hook."""
+    def __init__(self, hook, kind, mode, budget):
+        self.hook = hook
+        self.kind = kind
+        self.name = hook_name(hook)
+        self.mode = mode
+        self.budget = budget
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.max_wait = 0.0     # async: longest time spent queued
+        self.errors = 0
+        self.dropped = 0
+        self.overruns = 0
+        self.strikes = 0
+        self.disabled = False
+
+class HookManager:
+    """Runs hooks inline or on a bounded worker queue, timing each against its budget."""
+    def __init__(self, budget=0.05, workers=1, queue_size=256, strikes=STRIKES):
+        self.budget = budget
+        self.workers = workers
+        self.strikes = strikes
+        self.lists = {kind: [] for kind in KINDS}
+        self.stats = {}             # hook -> HookStats
+        self.queue = queue.Queue(queue_size)
+        self.lock = threading.Lock()
+        self.notices = []
+        self._threads = []
+    def register(self, kind, hook):
+        self.lists[kind].append(hook)
+    def _stats_for(self, kind, hook):
+        stats = self.stats.get(hook)
+        if stats is None:
+            mode = getattr(hook, 'hook_mode', None)
+            code = getattr(getattr(hook, '__func__', hook), '__code__', None)
+            if mode is None:
+                mode = 'async' if code is not None and code.co_flags & _CO_COROUTINE else 'sync'
+            stats = self.stats[hook] = HookStats(hook, kind, mode, getattr(hook, 'hook_budget', self.budget))
+        return stats
+    # ----- dispatch -----
+    def fire(self, kind, *args):
+        """Run every enabled hook of kind with args: sync ones now, async ones queued."""
+        hooks = self.lists[kind]
+        if not hooks:
+            return
+        with TRACER.span('hooks', kind=kind):
+            self._fire(kind, hooks, args)
+    def _fire(self, kind, hooks, args):
+        for hook in list(hooks):
+            resolve = getattr(hook, 'resolve', None)
+            if resolve is not None:
+                # A plugin stub (see plugins.py): load the plugin, then use its real hooks
+                real = resolve()
+                if hook in hooks:
+                    i = hooks.index(hook)
+                    hooks[i:i + 1] = real
+                for h in real:
+                    self._dispatch(kind, h, args)
+            else:
+                self._dispatch(kind, hook, args)
+    def _dispatch(self, kind, hook, args):
+        stats = self._stats_for(kind, hook)
+        if stats.disabled:
+            return
+        if stats.mode != 'async':
+            self._call(stats, args, 0.0)
+            return
+        self._start_workers()
+        try:
+            self.queue.put_nowait((stats, args, time.perf_counter()))
+        except queue.Full:
+            with self.lock:
+                stats.dropped += 1
+    def _call(self, stats, args, waited):
+        start = time.perf_counter()
+        try:
+            with TRACER.span('hook', cat='hooks', hook=stats.name, mode=stats.mode):
+                result = stats.hook(*args)
+                if hasattr(result, '__await__'):
+                    import asyncio
+                    asyncio.run(result)
+        except Exception as e:
+            with self.lock:
+                stats.errors += 1
+            self._notice(f"[plugin {_LABELS[stats.kind]} error] {e}", immediate=stats.mode != 'async')
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            stats.calls += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+            stats.max_wait = max(stats.max_wait, waited)
+            if stats.budget and elapsed > stats.budget:
+                stats.overruns += 1
+                stats.strikes += 1
+                if stats.strikes >= self.strikes and not stats.disabled:
+                    stats.disabled = True
+                    message = (f"[hooks] disabled {stats.name}: over its {stats.budget * 1000:.0f} ms budget "
+                               f"{stats.strikes} times in a row (hooks enable {stats.name})")
+                else:
+                    message = None
+            else:
+                stats.strikes = 0
+                message = None
+        if message:
+            self._notice(message, immediate=stats.mode != 'async')
+    def _notice(self, message, immediate):
+        # Workers must not write over the prompt; their messages wait for notify()
+        if immediate:
+            print(message)
+        else:
+            with self.lock:
+                self.notices.append(message)
+    def notify(self):
+        """Print messages from the background workers (called before each prompt)."""
+        with self.lock:
+            notices, self.notices = self.notices, []
+        for message in notices:
+            print(message)
+    # ----- workers -----
+    def _start_workers(self):
+        if self._threads:
+            return
+        with self.lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, name='hooks', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    def _worker(self):
+        while True:
+            stats, args, queued = self.queue.get()
+            try:
+                if not stats.disabled:
+                    self._call(stats, args, time.perf_counter() - queued)
+            finally:
+                self.queue.task_done()
+    def drain(self, timeout=1.0):
+        """Wait up to timeout seconds for queued hooks to finish (at exit). True if all ran."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+    # ----- the hooks builtin -----
+    def find(self, name):
+        return [s for s in self.stats.values() if s.name == name or s.name.endswith('.' + name)]
+    def report(self):
+        lines = [f"{'hook':<36} {'kind':<9} {'mode':<5} {'calls':>6} {'mean ms':>8} {'max ms':>8} "
+                 f"{'budget':>7} {'over':>5} {'err':>4} {'drop':>5} {'wait ms':>8}  state"]
+        for s in sorted(self.stats.values(), key=lambda s: (KINDS.index(s.kind), s.name)):
+            mean = s.total / s.calls * 1000 if s.calls else 0.0
+            budget = f"{s.budget * 1000:.0f}" if s.budget else '-'
+            lines.append(f"{s.name:<36} {_LABELS[s.kind]:<9} {s.mode:<5} {s.calls:>6} {mean:>8.2f} "
+                         f"{s.max * 1000:>8.2f} {budget:>7} {s.overruns:>5} {s.errors:>4} {s.dropped:>5} "
+                         f"{s.max_wait * 1000 if s.mode == 'async' else 0:>8.2f}  "
+                         f"{'disabled' if s.disabled else 'on'}")
+        pending = self.queue.qsize()
+        if pending:
+            lines.append(f"{pending} queued")
+        return '\n'.join(lines)
+    def builtin(self, args):
+        """hooks [stats] | hooks enable NAME... | hooks disable NAME..."""
+        if not args or args == ['stats']:
+            print(self.report())
+            return 0
+        if args[0] in ('enable', 'disable') and len(args) > 1:
+            status = 0
+            for name in args[1:]:
+                matches = self.find(name)
+                if not matches:
+                    print(f"hooks: no hook named {name}")
+                    status = 1
+                for s in matches:
+                    s.disabled = args[0] == 'disable'
+                    s.strikes = 0
+            return status
+        print("Usage: hooks [stats] | hooks enable|disable NAME...")
+        return 2
@@ -2,46 +2,231 @@
 jobcontrol.py - Job and process management for the advanced Python shell.
 """
 import os
+import sys
+import time
 import signal
+import threading
+import contextlib
 
 class Job:
-    def __init__(self, pid, command, status='Running'):
-        self.pid = pid
+    """A background pipeline: every stage runs in process group pgid."""
+    def __init__(self, job_id, pids, pgid, command, status='Running'):
+        self.id = job_id
+        self.pids = list(pids)
+        self.pgid = pgid
         self.command = command
         self.status = status
+        self.remaining = set(self.pids)
+        self.exit_status = None     # the last stage's status, once it has been reaped
+        self.rusage = {'utime': 0.0, 'stime': 0.0, 'maxrss': 0}
+        self.stages = {}            # pid -> (args, start time) for resource accounting
+        self.notified = False
+        self.disowned = False
+    @property
+    def pid(self):
+        return self.pids[-1]
+    @property
+    def finished(self):
+        return not self.remaining
+    def describe(self):
+        if self.status != 'Done':
+            return self.status
+        return 'Done' if self.exit_status == 0 else f'Exit {self.exit_status}'
 
 class JobControl:
-    """Manages background and foreground jobs, process groups, and signals."""
+    """Manages background and foreground jobs, process groups, and signals.
+
+    Jobs are indexed by job id and by process group id. A SIGCHLD handler
+    reaps the tracked pids as soon as they exit (never waitpid(-1), so the
+    executor's own foreground waits are unaffected); notify() then reports
+    finished jobs before the next prompt and drops them from the table.
+    """
     def __init__(self):
-        self.jobs = []
-    def add_job(self, process, command):
-        job = Job(process.pid, command)
-        self.jobs.append(job)
+        self.jobs = {}          # job id -> Job
+        self.by_pgid = {}       # pgid -> Job
+        self.by_pid = {}        # pid of every unreaped stage -> Job
+        self.handler_installed = False
+        self._reaping = 0
+        self.stats = None       # a ResourceStats (accounting.py) that reaped stages are added to
+    def add_job(self, process, command, procs=None):
+        pids = [p.pid for p in procs] if procs else [process.pid]
+        try:
+            pgid = os.getpgid(pids[0])
+        except OSError:
+            pgid = pids[0]
+        job = Job(max(self.jobs, default=0) + 1, pids, pgid, command)
+        now = time.perf_counter()
+        for proc in procs or [process]:
+            job.stages[proc.pid] = (getattr(proc, 'args', None), getattr(proc, 'started', now))
+        with self._sigchld_blocked():
+            self.jobs[job.id] = job
+            self.by_pgid[pgid] = job
+            for pid in pids:
+                self.by_pid[pid] = job
+        self._install_handler()
+        # A short job may have exited before the handler was watching it
+        self.reap()
         return job
+    def find(self, spec=None):
+        """Look a job up by id ('1' or '%1') or by process group id; None is the newest job."""
+        if spec is None:
+            return self.jobs[max(self.jobs)] if self.jobs else None
+        try:
+            key = int(str(spec).lstrip('%'))
+        except ValueError:
+            return None
+        return self.jobs.get(key) or self.by_pgid.get(key)
+    # ----- reaping -----
+    def _install_handler(self):
+        if self.handler_installed or threading.current_thread() is not threading.main_thread():
+            return
+        signal.signal(signal.SIGCHLD, self._on_sigchld)
+        self.handler_installed = True
+    def _on_sigchld(self, signum, frame):
+        # The handler can still run inside a blocked section when another
+        # thread took the signal; the section in progress will see the child
+        if not self._reaping:
+            self.reap()
+    @contextlib.contextmanager
+    def _sigchld_blocked(self):
+        self._reaping += 1
+        previous = signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGCHLD])
+        try:
+            yield
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous)
+            self._reaping -= 1
+    def reap(self):
+        """Collect every tracked child that has exited or stopped (non-blocking)."""
+        with self._sigchld_blocked():
+            for pid in list(self.by_pid):
+                try:
+                    wpid, status, rusage = os.wait4(pid, os.WNOHANG | os.WUNTRACED)
+                except ChildProcessError:
+                    # Reaped by someone else; its status is gone
+                    self._record(pid, None, None)
+                    continue
+                if wpid:
+                    self._record(pid, status, rusage)
+    def _record(self, pid, status, rusage):
+        job = self.by_pid.get(pid)
+        if job is None:
+            return
+        if status is not None and os.WIFSTOPPED(status):
+            job.status = 'Stopped'
+            return
+        del self.by_pid[pid]
+        job.remaining.discard(pid)
+        code = os.waitstatus_to_exitcode(status) if status is not None else 0
+        code = 128 - code if code < 0 else code
+        if rusage is not None:
+            job.rusage['utime'] += rusage.ru_utime
+            job.rusage['stime'] += rusage.ru_stime
+            job.rusage['maxrss'] = max(job.rusage['maxrss'], rusage.ru_maxrss)
+            if self.stats is not None and pid in job.stages:
+                args, started = job.stages[pid]
+                self.stats.add(args, pid, code, time.perf_counter() - started, rusage)
+        if pid == job.pid:
+            job.exit_status = code
+        if job.finished:
+            job.status = 'Done'
+    def _wait_job(self, job):
+        """Block until every stage of job has exited or the job stops."""
+        with self._sigchld_blocked():
+            for pid in list(job.remaining):
+                if pid not in self.by_pid:
+                    continue
+                try:
+                    _, status, rusage = os.wait4(pid, os.WUNTRACED)
+                except ChildProcessError:
+                    status = rusage = None
+                self._record(pid, status, rusage)
+                if job.status == 'Stopped':
+                    return
+    def _remove(self, job):
+        self.jobs.pop(job.id, None)
+        if self.by_pgid.get(job.pgid) is job:
+            del self.by_pgid[job.pgid]
+    def notify(self):
+        """Print 'Done' lines for jobs that finished since the last prompt, and prune them."""
+        self.reap()
+        for job in list(self.jobs.values()):
+            if job.finished:
+                if not job.notified:
+                    print(f"[{job.id}]  {job.describe():<10} {job.command}")
+                    job.notified = True
+                self._remove(job)
+    # ----- builtins -----
     def list_jobs(self):
-        for i, job in enumerate(self.jobs):
-            try:
-                pid, status = os.waitpid(job.pid, os.WNOHANG)
-                if pid == 0:
-                    job.status = 'Running'
-                else:
-                    job.status = f'Exited'
-            except ChildProcessError:
-                job.status = 'Exited'
-            print(f'[{i+1}] {job.pid} {job.status} {job.command}')
+        self.reap()
+        for job in list(self.jobs.values()):
+            print(f'[{job.id}] {job.pgid} {job.describe()} {job.command}')
+            if job.finished:
+                job.notified = True
+                self._remove(job)
+    def _lookup(self, name, job_id):
+        job = self.find(job_id)
+        if job is None:
+            print(f"{name}: {job_id if job_id is not None else 'current'}: no such job")
+        return job
     def fg(self, job_id):
-        job = self.jobs[job_id-1]
+        """Continue a job in the foreground and wait for it. Returns its exit status."""
+        job = self._lookup('fg', job_id)
+        if job is None:
+            return 1
+        print(job.command)
+        sys.stdout.flush()
+        terminal = os.isatty(0)
+        if terminal:
+            _set_foreground(job.pgid)
         try:
-            os.tcsetpgrp(0, job.pid)
-        except Exception:
+            os.killpg(job.pgid, signal.SIGCONT)
+        except OSError:
             pass
-        os.kill(job.pid, signal.SIGCONT)
-        os.waitpid(job.pid, 0)
-        job.status = 'Exited'
+        job.status = 'Running'
+        try:
+            self._wait_job(job)
+        finally:
+            if terminal:
+                _set_foreground(os.getpgrp())
+        if job.status == 'Stopped':
+            print(f"\n[{job.id}]  Stopped    {job.command}")
+            return 128 + signal.SIGTSTP
+        self._remove(job)
+        return job.exit_status or 0
     def bg(self, job_id):
-        job = self.jobs[job_id-1]
-        os.kill(job.pid, signal.SIGCONT)
+        job = self._lookup('bg', job_id)
+        if job is None:
+            return 1
+        try:
+            os.killpg(job.pgid, signal.SIGCONT)
+        except OSError:
+            pass
         job.status = 'Running'
+        return 0
     def disown(self, job_id):
-        job = self.jobs[job_id-1]
-        self.jobs.remove(job) 
\ No newline at end of file
+        job = self._lookup('disown', job_id)
+        if job is None:
+            return 1
+        # Still reaped when it exits, but never reported
+        job.disowned = job.notified = True
+        self._remove(job)
+        return 0
+    def wait_all(self):
+        """Wait for every tracked job (the 'wait' builtin); finished jobs are not reported."""
+        for job in list(self.jobs.values()):
+            if job.status != 'Stopped':
+                self._wait_job(job)
+            if job.finished:
+                job.notified = True
+                self._remove(job)
+
+def _set_foreground(pgid):
+    # The shell gets SIGTTOU when it hands the terminal over from the background
+    previous = signal.signal(signal.SIGTTOU, signal.SIG_IGN)
+    try:
+        os.tcsetpgrp(0, pgid)
+    except OSError:
+        pass
+    finally:
+        signal.signal(signal.SIGTTOU, previous)
@@ -0,0 +1,265 @@
+"""
+lexer.py - Single-pass tokenizer for shell command lines.
+"""
+import re
+
+WORD = 'word'
+OP = 'op'
+NEWLINE = 'newline'
+PROCSUB = 'procsub'     # <(list) or >(list); value and raw are the text as written
+
+class Token:
+    __slots__ = ('kind', 'value', 'raw', 'quoted')
+    def __init__(self, kind, value, raw=None, quoted=False):
+        self.kind = kind
+        self.value = value      # unquoted text (words) or operator text
+        self.raw = raw          # source text as written
+        self.quoted = quoted    # True if any part of the word was quoted or escaped
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r})"
+
+class LexError(ValueError):
+    """Raised on unterminated quotes or substitutions."""
+
+# Operators, longest first. An fd number may prefix a redirection ("2>", "2>&1").
+OPERATOR_RE = re.compile(r'\d*(?:<<<|<<-|<<|>>|>&|<&|<>|>\||>|<)|&>>|&>|&&|\|\||;;|[|&;()\n]')
+# The plain run of a word: everything that is not blank, quote, escape, substitution or operator.
+# Only BLANK_RE's characters and newline separate words, as in sh; a form feed or NBSP is word text.
+PLAIN_RE = re.compile(r'[^ \t\r\n|&;()<>\'"\\`$]+')
+# A double-quoted string without escapes or substitutions
+DQ_SIMPLE_RE = re.compile(r'"([^"\\$`]*)"')
+BLANK_RE = re.compile(r'[ \t\r]+')
+DQ_ESCAPES = '$`"\\\n'
+
+def _skip_single(line, i):
+    end = line.find("'", i + 1)
+    if end < 0:
+        raise LexError("unterminated single quote")
+    return end + 1
+
+def _skip_double(line, i):
+    n = len(line)
+    i += 1
+    while i < n:
+        c = line[i]
+        if c == '"':
+            return i + 1
+        if c == '\\':
+            i += 2
+        elif c == '$' and line.startswith('$(', i):
+            i = _skip_paren(line, i + 1)
+        elif c == '`':
+            i = _skip_backtick(line, i)
+        else:
+            i += 1
+    raise LexError("unterminated double quote")
+
+def _skip_backtick(line, i):
+    n = len(line)
+    i += 1
+    while i < n:
+        c = line[i]
+        if c == '\\':
+            i += 2
+        elif c == '`':
+            return i + 1
+        else:
+            i += 1
+    raise LexError("unterminated backquote")
+
+def _skip_paren(line, i):
+    """Skip a balanced '(...)' starting at line[i] == '(' (quotes and nesting aware)."""
+    n = len(line)
+    depth = 0
+    while i < n:
+        c = line[i]
+        if c == '(':
+            depth += 1
+            i += 1
+        elif c == ')':
+            depth -= 1
+            i += 1
+            if depth == 0:
+                return i
+        elif c == "'":
+            i = _skip_single(line, i)
+        elif c == '"':
+            i = _skip_double(line, i)
+        elif c == '`':
+            i = _skip_backtick(line, i)
+        elif c == '\\':
+            i += 2
+        else:
+            i += 1
+    raise LexError("unterminated '$('")
+
+def substitution_end(text, i):
+    """The index just past the $(...) or `...` that starts at text[i]."""
+    return _skip_paren(text, i + 1) if text[i] == '$' else _skip_backtick(text, i)
+
+def unquote(raw):
+    """Remove quotes and escapes from a raw word (substitutions are kept verbatim)."""
+    out = []
+    i = 0
+    n = len(raw)
+    while i < n:
+        c = raw[i]
+        if c == "'":
+            end = raw.index("'", i + 1)
+            out.append(raw[i+1:end])
+            i = end + 1
+        elif c == '"':
+            i += 1
+            while raw[i] != '"':
+                c = raw[i]
+                if c == '\\' and i + 1 < n and raw[i+1] in DQ_ESCAPES:
+                    out.append(raw[i+1])
+                    i += 2
+                elif c == '$' and raw.startswith('$(', i):
+                    end = _skip_paren(raw, i + 1)
+                    out.append(raw[i:end])
+                    i = end
+                elif c == '`':
+                    end = _skip_backtick(raw, i)
+                    out.append(raw[i:end])
+                    i = end
+                else:
+                    out.append(c)
+                    i += 1
+            i += 1
+        elif c == '\\':
+            if i + 1 < n and raw[i+1] != '\n':
+                out.append(raw[i+1])
+            i += 2
+        elif c == '$' and raw.startswith('$(', i):
+            end = _skip_paren(raw, i + 1)
+            out.append(raw[i:end])
+            i = end
+        elif c == '`':
+            end = _skip_backtick(raw, i)
+            out.append(raw[i:end])
+            i = end
+        else:
+            out.append(c)
+            i += 1
+    return ''.join(out)
+
+GLOB_SPECIAL_RE = re.compile(r'([*?\[\]{},\\])')
+
+def glob_pattern(raw):
+    """A raw word as a glob pattern (globbing.py), or None if it has no unquoted *, ?, [ or {.
+
+    Quoted and escaped characters are backslash-escaped in the pattern, so
+    that only the unquoted ones are wildcards or braces.
+    """
+    out = []
+    magic = False
+    i = 0
+    n = len(raw)
+    while i < n:
+        c = raw[i]
+        if c == "'" or c == '"':
+            end = _skip_single(raw, i) if c == "'" else _skip_double(raw, i)
+            out.append(GLOB_SPECIAL_RE.sub(r'\\\1', unquote(raw[i:end])))
+            i = end
+        elif c == '\\':
+            if i + 1 < n and raw[i+1] != '\n':
+                out.append('\\' + raw[i+1])
+            i += 2
+        elif c == '$' and raw.startswith('$(', i) or c == '`':
+            end = substitution_end(raw, i)
+            out.append(GLOB_SPECIAL_RE.sub(r'\\\1', raw[i:end]))
+            i = end
+        else:
+            if c in '*?[{':
+                magic = True
+            out.append(c)
+            i += 1
+    return ''.join(out) if magic else None
+
+def tokenize(line):
+    """Split a command line into word and operator tokens in one left-to-right pass."""
+    tokens = []
+    append = tokens.append
+    n = len(line)
+    i = 0
+    plain_match = PLAIN_RE.match
+    blank_match = BLANK_RE.match
+    op_match = OPERATOR_RE.match
+    dq_simple_match = DQ_SIMPLE_RE.match
+    while i < n:
+        m = blank_match(line, i)
+        if m:
+            i = m.end()
+            if i >= n:
+                break
+        c = line[i]
+        if c == '#':
+            # Comment to end of line
+            end = line.find('\n', i)
+            if end < 0:
+                break
+            i = end
+            continue
+        if c in '<>' and line.startswith('(', i + 1):
+            # Process substitution, a word of its own
+            end = _skip_paren(line, i + 1)
+            append(Token(PROCSUB, line[i:end], line[i:end]))
+            i = end
+            continue
+        if c in '|&;()<>\n' or c.isdigit():
+            m = op_match(line, i)
+            if m:
+                op = m.group()
+                append(Token(NEWLINE if op == '\n' else OP, op, op))
+                i = m.end()
+                continue
+        # Word: a run of plain text, quoted strings, escapes and substitutions
+        start = i
+        quoted = False
+        pieces = []
+        while i < n:
+            m = plain_match(line, i)
+            if m:
+                pieces.append(m.group())
+                i = m.end()
+                if i >= n:
+                    break
+            c = line[i]
+            if c == "'":
+                end = _skip_single(line, i)
+                pieces.append(line[i+1:end-1])
+                i = end
+                quoted = True
+            elif c == '"':
+                m = dq_simple_match(line, i)
+                if m:
+                    pieces.append(m.group(1))
+                    i = m.end()
+                else:
+                    end = _skip_double(line, i)
+                    pieces.append(unquote(line[i:end]))
+                    i = end
+                quoted = True
+            elif c == '\\':
+                if i + 1 >= n:
+                    raise LexError("trailing backslash")
+                if line[i+1] != '\n':
+                    pieces.append(line[i+1])
+                i += 2
+                quoted = True
+            elif c == '$':
+                end = _skip_paren(line, i + 1) if line.startswith('$(', i) else i + 1
+                pieces.append(line[i:end])
+                i = end
+            elif c == '`':
+                end = _skip_backtick(line, i)
+                pieces.append(line[i:end])
+                i = end
+            else:
+                break
+        if i == start:
+            # Nothing above consumed line[i]: never loop on it
+            raise LexError(f"unexpected character {line[i]!r}")
+        append(Token(WORD, ''.join(pieces), line[start:i], quoted))
+    return tokens
@@ -5,6 +5,8 @@ Python Unix Shell
 A feature-rich Unix-like shell implemented in Python for learning and custom automation.
 See README.md for features and limitations.
 """
+import time
+_STARTED = time.perf_counter()      # for --profile-startup
 
 from parser import CommandParser
 from executor import CommandExecutor
@@ -13,82 +15,90 @@ from jobcontrol import JobControl
 from history import HistoryManager
 from completion import CompletionEngine
 from config import ShellConfig
-from utils import shell_print
+from pathcache import CommandHashTable
+from script import ScriptInterpreter, ScriptSyntaxError, IncompleteScript
+from globbing import NoMatch
+from resultcache import ResultCache
+from diskcache import DiskCache, cache_home
+import coreutils
+from nodes import Block, FunctionDef
+from utils import shell_print, StartupProfile
+from plugins import PluginManager
+from hooks import HookManager
+from tracing import TRACER
+import heredoc
 import os
-import shlex
-import subprocess
-import readline
-import glob
-import signal
-import re
-from plugins import load_plugins
-import time
-
-# Plugin system
-try:
-    from plugins import PluginBase
-except ImportError:
-    PluginBase = None
-
-# ========== Tab Completion Setup ==========
-def completer(text, state):
-    # Complete command names if first word, else files
-    buffer = readline.get_line_buffer()
-    line = shlex.split(buffer) if buffer else []
-    if len(line) == 0 or (len(line) == 1 and not buffer.endswith(' ')):
-        # Complete command names
-        cmds = [cmd for cmd in os.listdir('/bin') if cmd.startswith(text)]
-        cmds += [cmd for cmd in os.listdir('/usr/bin') if cmd.startswith(text)]
-        cmds = list(set(cmds))
-        try:
-            return cmds[state]
-        except IndexError:
-            return None
-    else:
-        # Complete file names
-        matches = glob.glob(text+'*')
-        try:
-            return matches[state]
-        except IndexError:
-            return None
-
-readline.set_completer(completer)
-readline.parse_and_bind('tab: complete')
-# ========== End Tab Completion Setup ==========
+import sys
 
 # ========== Main Shell Function ==========
-def main():
+def main(profile=None):
+    profile = profile or StartupProfile(_STARTED, enabled=False)
+    profile.mark('imports')
     # Initialize modules
     parser = CommandParser()
-    executor = CommandExecutor()
-    builtins = Builtins()
+    hashtable = CommandHashTable()
+    executor = CommandExecutor(hashtable=hashtable)
+    builtins = Builtins(hashtable=hashtable)
     jobcontrol = JobControl()
     history = HistoryManager()
-    completion = CompletionEngine()
+    completion = CompletionEngine(hashtable=hashtable)
     config = ShellConfig()
-    plugins = load_plugins(locals())
-    custom_commands = locals().get('custom_commands', {})
-    pre_exec_hooks = locals().get('pre_exec_hooks', [])
-    post_exec_hooks = locals().get('post_exec_hooks', [])
-    on_error_hooks = locals().get('on_error_hooks', [])
+    hooks = HookManager()
+    # The context plugins register their commands, completions and hooks in
+    shell = {
+        'parser': parser, 'executor': executor, 'builtins': builtins, 'jobcontrol': jobcontrol,
+        'history': history, 'completion': completion, 'config': config, 'custom_commands': {},
+        'hooks': hooks,
+    }
+    shell.update(hooks.lists)
+    custom_commands = shell['custom_commands']
+
+    interpreter = ScriptInterpreter(parser, executor, builtins, jobcontrol, custom_commands)
+    interpreter.hooks = hooks
+    profile.mark('setup')
 
     # Load config
     config.load(os.path.expanduser('~/.myshellrc'))
+    interpreter.result_cache = make_result_cache(config)
+    if config.get('SPAWN_BACKEND'):
+        executor.backend = config.get('SPAWN_BACKEND')
+    configure_utilities(executor, config)
+    configure_stats(executor, jobcontrol, config)
+    configure_capture(interpreter, config)
+    configure_hooks(hooks, config)
+    profile.mark('config')
+    try:
+        history_size = int(config.get('HISTSIZE', 10000))
+    except ValueError:
+        history_size = 10000
+    history.load(os.path.expanduser(config.get('HISTFILE', '~/.myshell_history')), history_size)
+    profile.mark('history')
 
-    # Set up tab completion
-    readline.set_completer(completion.complete)
-    readline.parse_and_bind('tab: complete')
+    # Plugins: stubs from the manifest, imported on first use
+    PluginManager(shell, store=plugin_manifest_store()).load()
+    profile.mark('plugins')
 
-    # Load plugins (TODO: dynamic discovery)
-    # Example: plugins.append(MyPlugin())
-    for plugin in plugins:
-        plugin.activate(locals())
+    # Line editing and tab completion (only useful on a terminal)
+    if sys.stdin.isatty():
+        import readline
+        history.install_readline()
+        readline.set_completer(completion.complete)
+        readline.parse_and_bind('tab: complete')
+    profile.mark('readline')
 
     # Main shell loop
     while True:
         try:
+            # Report background jobs that finished since the last prompt
+            jobcontrol.notify()
+            hooks.notify()
             prompt = config.render_prompt()
-            line = input(prompt)
+            if profile is not None:
+                profile.mark('first prompt')
+                profile.report()
+                profile = None
+            with TRACER.span('read line'):
+                line = input(prompt)
             if not line.strip():
                 continue
             # Detect background job (&)
@@ -96,54 +106,60 @@ def main():
             if line.strip().endswith('&'):
                 run_in_bg = True
                 line = line.strip()[:-1].strip()
-            # History
-            history.add(line)
-            # History expansion
-            line = history.expand(line)
-            # Parse command
-            parsed = parser.parse(line)
-            # Plugin custom commands
-            if isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list) and parsed['pipeline']:
-                cmd = parsed['pipeline'][0]['args']
-                if cmd and cmd[0] in custom_commands:
-                    custom_commands[cmd[0]](*cmd[1:])
-                    continue
-            # Built-in dispatch (pass jobcontrol for jobs, fg, bg, disown)
-            if isinstance(parsed, dict) and builtins.dispatch(parsed, custom_commands=custom_commands):
-                if 'pipeline' in parsed and isinstance(parsed['pipeline'], list) and parsed['pipeline']:
-                    cmd = parsed['pipeline'][0]['args']
-                    if cmd:
-                        if cmd[0] == 'jobs':
-                            jobcontrol.list_jobs()
-                        elif cmd[0] == 'fg' and len(cmd) > 1:
-                            jobcontrol.fg(int(cmd[1]))
-                        elif cmd[0] == 'bg' and len(cmd) > 1:
-                            jobcontrol.bg(int(cmd[1]))
-                        elif cmd[0] == 'disown' and len(cmd) > 1:
-                            jobcontrol.disown(int(cmd[1]))
+            # History expansion, then record the expanded line
+            with TRACER.span('history'):
+                line = history.expand(line)
+                history.add(line)
+            # Shell variable assignment
+            if interpreter.assign(line):
                 continue
-            # Parallel jobs
-            if isinstance(parsed, dict) and 'parallel_jobs' in parsed and isinstance(parsed['parallel_jobs'], list):
-                procs = []
-                for job in parsed['parallel_jobs']:
-                    status, process = executor.execute(job, run_in_bg=True)
-                    if process:
-                        procs.append(process)
+            # Parse command
+            try:
+                with TRACER.span('parse'):
+                    parsed = parser.parse(line)
+            except ValueError as e:
+                shell_print(f"Parse error: {e}")
                 continue
-            # Wait command
-            if isinstance(parsed, dict) and 'wait' in parsed and parsed['wait'] is True:
+            # Control flow blocks and functions (may continue on following lines)
+            if isinstance(parsed, (Block, FunctionDef)):
+                source = line
                 while True:
                     try:
-                        pid, _ = os.wait()
-                    except ChildProcessError:
+                        interpreter.run_source(source)
+                        break
+                    except IncompleteScript:
+                        source += '\n' + input('> ')
+                    except ScriptSyntaxError as e:
+                        shell_print(f"Syntax error: {e}")
                         break
                 continue
-            # Pre-exec hooks
-            for hook in pre_exec_hooks:
-                try:
-                    hook(line)
-                except Exception as e:
-                    shell_print(f"[plugin pre-exec error] {e}")
+            # Here-document bodies follow on the next lines
+            if '<<' in line and not read_heredocs(parsed):
+                continue
+            # Variables, substitutions and wildcards (a list's items are expanded as they run)
+            interpreter.substitution_status = 0
+            try:
+                parsed = interpreter.expand_words(parsed)
+            except NoMatch as e:
+                shell_print(f"myshell: no match: {e}")
+                interpreter.last_status = 1
+                continue
+            except ValueError as e:
+                shell_print(f"myshell: {e}")
+                interpreter.last_status = 2
+                continue
+            # Command lists, functions, plugin commands and builtins
+            try:
+                with TRACER.span('dispatch'):
+                    status = interpreter.dispatch(parsed)
+            except Exception as e:
+                shell_print(f"Shell error: {e}")
+                continue
+            if status is not None:
+                interpreter.last_status = status
+                continue
+            # Pre-exec hooks (sync ones run now; see hooks.py)
+            hooks.fire('pre_exec_hooks', line)
             # Command timing
             timing_threshold_str = config.get('TIMING_THRESHOLD')
             if timing_threshold_str is None:
@@ -152,94 +168,256 @@ def main():
                 timing_threshold = float(timing_threshold_str)
             except (TypeError, ValueError):
                 timing_threshold = 1.0
-            start_time = time.time()
+            start_time = time.perf_counter()
+            procs = []
             try:
-                status, process = executor.execute(parsed, run_in_bg=run_in_bg)
-                elapsed = time.time() - start_time
+                with TRACER.span('execute', command=line):
+                    status, process = executor.execute(parsed, run_in_bg=run_in_bg, procs=procs)
+                interpreter.last_status = status
+                elapsed = time.perf_counter() - start_time
                 # Post-exec hooks
-                for hook in post_exec_hooks:
-                    try:
-                        hook(line, status)
-                    except Exception as e:
-                        shell_print(f"[plugin post-exec error] {e}")
+                hooks.fire('post_exec_hooks', line, status)
                 if elapsed > timing_threshold:
                     shell_print(f"[timing] Command took {elapsed:.2f} seconds.")
             except Exception as e:
                 # On-error hooks
-                for hook in on_error_hooks:
-                    try:
-                        hook(line, e)
-                    except Exception as e2:
-                        shell_print(f"[plugin on-error error] {e2}")
+                hooks.fire('on_error_hooks', line, e)
                 shell_print(f"Shell error: {e}")
                 continue
             # Add to job control if background job
             if run_in_bg and process:
-                jobcontrol.add_job(process, line)
+                job = jobcontrol.add_job(process, line, procs)
+                shell_print(f"[{job.id}] {job.pgid}")
         except EOFError:
             shell_print("")
+            # Let queued async hooks (audit logs, ...) finish
+            hooks.drain()
+            hooks.notify()
             break
         except KeyboardInterrupt:
             shell_print("")
             continue
 
+def read_heredocs(parsed):
+    """Read the bodies of parsed's here-documents at a '> ' prompt. False if input ends first."""
+    for r in heredoc.pending(parsed):
+        body = heredoc.read_body(r.op, r.target, _continuation_line)
+        if body is None:
+            shell_print(f"\nmyshell: here-document ended before its delimiter '{r.target}'")
+            return False
+        r.body = body
+    return True
+
+def _continuation_line():
+    try:
+        return input('> ')
+    except EOFError:
+        return None
+
 # ========== Script Execution Mode ==========
+USAGE = ("usage: myshell.py [--no-script-cache] [--script-cache-stats] [--profile-startup] [--trace FILE]\n"
+         "                  [-c command [name [args...]] | script [args...]]\n"
+         "       myshell.py --server [--socket PATH]")
+
+def make_script_cache(config):
+    """Build the parsed-script cache from SCRIPT_CACHE* config keys (None when disabled)."""
+    if config.get('SCRIPT_CACHE', 'on').lower() in ('off', '0', 'no', 'false'):
+        return None
+    from scriptcache import ScriptCache
+    try:
+        max_bytes = int(config.get('SCRIPT_CACHE_SIZE', 32 * 1024 * 1024))
+    except ValueError:
+        max_bytes = 32 * 1024 * 1024
+    directory = config.get('SCRIPT_CACHE_DIR')
+    return ScriptCache(os.path.expanduser(directory) if directory else None, max_bytes)
+
+def make_result_cache(config):
+    """Build the command result cache from RESULT_CACHE_* and CACHE_COMMANDS config keys."""
+    try:
+        max_bytes = int(config.get('RESULT_CACHE_SIZE', 64 * 1024 * 1024))
+        ttl = float(config.get('RESULT_CACHE_TTL', 3600))
+    except ValueError:
+        max_bytes, ttl = 64 * 1024 * 1024, 3600
+    directory = config.get('RESULT_CACHE_DIR')
+    # e.g. CACHE_COMMANDS=git ls-files*, kubectl get *
+    patterns = [p.strip() for p in config.get('CACHE_COMMANDS', '').split(',') if p.strip()]
+    return ResultCache(os.path.expanduser(directory) if directory else None, max_bytes, ttl, patterns)
+
+def plugin_manifest_store():
+    return DiskCache(os.path.join(cache_home(), 'plugins'), 1024 * 1024)
+
+def configure_hooks(hooks, config):
+    """HOOK_BUDGET (seconds, 0 for none), HOOK_WORKERS and HOOK_QUEUE config keys."""
+    try:
+        hooks.budget = float(config.get('HOOK_BUDGET', hooks.budget))
+        hooks.workers = max(1, int(config.get('HOOK_WORKERS', hooks.workers)))
+        hooks.queue.maxsize = max(1, int(config.get('HOOK_QUEUE', hooks.queue.maxsize)))
+    except ValueError:
+        pass
+
+def configure_utilities(executor, config):
+    """INPROCESS_UTILS=off runs echo, test, cat, ... as external commands (see coreutils.py)."""
+    if config.get('INPROCESS_UTILS', 'on').strip().lower() in ('off', 'no', 'false', '0'):
+        executor.external.update(coreutils.COMMANDS)
+
+def configure_stats(executor, jobcontrol, config):
+    """STATS=off, STATS_SIZE (records kept) and STATS_FILE (spill file); see accounting.py."""
+    if config.get('STATS', 'on').strip().lower() in ('off', 'no', 'false', '0'):
+        executor.stats = None
+        return
+    try:
+        executor.stats.max_records = max(1, int(config.get('STATS_SIZE', executor.stats.max_records)))
+    except ValueError:
+        pass
+    spill_path = config.get('STATS_FILE')
+    if spill_path:
+        import atexit
+        executor.stats.spill_path = os.path.expanduser(spill_path)
+        atexit.register(executor.stats.close)
+    jobcontrol.stats = executor.stats
+
+def configure_capture(interpreter, config):
+    """CAPTURE_LIMIT: the most bytes of output a $(...) keeps; the rest is read and dropped."""
+    try:
+        limit = int(config.get('CAPTURE_LIMIT', 0))
+    except ValueError:
+        limit = 0
+    interpreter.capture_limit = limit if limit > 0 else None
+
+def make_interpreter(use_cache=True):
+    """A script interpreter set up from ~/.myshellrc, for script files and -c."""
+    config = ShellConfig()
+    config.load(os.path.expanduser('~/.myshellrc'))
+    hashtable = CommandHashTable()
+    executor = CommandExecutor(hashtable=hashtable, backend=config.get('SPAWN_BACKEND'))
+    configure_utilities(executor, config)
+    jobcontrol = JobControl()
+    configure_stats(executor, jobcontrol, config)
+    interpreter = ScriptInterpreter(CommandParser(), executor, Builtins(hashtable=hashtable), jobcontrol)
+    configure_capture(interpreter, config)
+    if use_cache:
+        interpreter.script_cache = make_script_cache(config)
+    interpreter.result_cache = make_result_cache(config)
+    return interpreter
+
+def run_script(script_path, args=(), use_cache=True, cache_stats=False, interpreter=None):
+    """Run a script file through the shell's own parser, builtins and executor."""
+    interpreter = interpreter or make_interpreter(use_cache)
+    try:
+        return interpreter.run_file(script_path, args)
+    except ScriptSyntaxError as e:
+        shell_print(f"{script_path}: {e}")
+        return 2
+    except OSError as e:
+        shell_print(f"{script_path}: {e.strerror}")
+        return 127
+    finally:
+        if cache_stats and interpreter.script_cache is not None:
+            sys.stdout.flush()
+            print(interpreter.script_cache.report(), file=sys.stderr)
+
+def run_command(source, args=(), profile=None, interpreter=None):
+    """myshell.py -c: run a command string (args are $0, $1, ...)."""
+    if profile is not None:
+        profile.mark('imports')
+    interpreter = interpreter or make_interpreter(use_cache=False)
+    interpreter.positional = list(args[1:])
+    if profile is not None:
+        profile.mark('setup')
+    try:
+        return interpreter.run_source(source)
+    except ScriptSyntaxError as e:
+        shell_print(f"-c: {e}")
+        return 2
+    finally:
+        if profile is not None:
+            sys.stdout.flush()
+            profile.mark('run')
+            profile.report()
+
+# ========== Server Mode ==========
+def warm_interpreter():
+    """The server's warm state: an interpreter with the config read and $PATH hashed."""
+    interpreter = make_interpreter()
+    interpreter.executor.hashtable.refresh()
+    return interpreter
+
+def run_job(interpreter, argv):
+    """Run one server job: the -c or script arguments myshell.py takes, or a script on stdin."""
+    if argv[:1] == ['-c'] and len(argv) > 1:
+        return run_command(argv[1], argv[2:], interpreter=interpreter)
+    if argv:
+        return run_script(argv[0], argv[1:], interpreter=interpreter)
+    try:
+        return interpreter.run_source(sys.stdin.read())
+    except ScriptSyntaxError as e:
+        shell_print(f"stdin: {e}")
+        return 2
+
+def run_server(path=None):
+    """myshell.py --server: serve jobs from shellclient.py (SERVER_WORKERS, SERVER_MAX_JOBS)."""
+    from server import ShellServer, default_socket_path
+    config = ShellConfig()
+    rc_path = os.path.expanduser('~/.myshellrc')
+    config.load(rc_path)
+    try:
+        workers = int(config.get('SERVER_WORKERS', 4))
+        max_jobs = int(config.get('SERVER_MAX_JOBS', 64))
+    except ValueError:
+        workers, max_jobs = 4, 64
+    server = ShellServer(path or default_socket_path(), warm_interpreter, run_job, workers, max_jobs, watch=[rc_path])
+    try:
+        return server.serve()
+    except OSError as e:
+        shell_print(f"myshell server: {e}")
+        return 1
+
 if __name__ == "__main__":
-    import sys
-    if len(sys.argv) > 1:
-        script_path = sys.argv[1]
-        with open(script_path) as f:
-            lines = [line.rstrip() for line in f if line.strip() and not line.strip().startswith('#')]
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            if line.startswith('if '):
-                cond_cmd = line[3:].strip()
-                if lines[i+1].strip() == 'then':
-                    block = []
-                    j = i+2
-                    while j < len(lines) and lines[j].strip() != 'fi':
-                        block.append(lines[j])
-                        j += 1
-                    print(f"myshell$ {cond_cmd}")
-                    cond_status = os.system(cond_cmd)
-                    if cond_status == 0:
-                        for bline in block:
-                            print(f"myshell$ {bline}")
-                            os.system(bline)
-                    i = j
-            elif line.startswith('for '):
-                for_parts = line[4:].split(' in ')
-                var = for_parts[0].strip()
-                values = for_parts[1].strip().rstrip(';').split()
-                if lines[i+1].strip() == 'do':
-                    block = []
-                    j = i+2
-                    while j < len(lines) and lines[j].strip() != 'done':
-                        block.append(lines[j])
-                        j += 1
-                    for val in values:
-                        os.environ[var] = val
-                        for bline in block:
-                            print(f"myshell$ {bline}")
-                            os.system(bline)
-                    i = j
-            elif line.startswith('while '):
-                cond_cmd = line[6:].strip().rstrip(';')
-                if lines[i+1].strip() == 'do':
-                    block = []
-                    j = i+2
-                    while j < len(lines) and lines[j].strip() != 'done':
-                        block.append(lines[j])
-                        j += 1
-                    while os.system(cond_cmd) == 0:
-                        for bline in block:
-                            print(f"myshell$ {bline}")
-                            os.system(bline)
-                    i = j
-            else:
-                print(f"myshell$ {line}")
-                os.system(line)
-            i += 1
+    argv = sys.argv[1:]
+    use_cache = True
+    cache_stats = False
+    command = None
+    profile = None
+    trace_path = os.environ.get('MYSHELL_TRACE')
+    server = False
+    socket_path = None
+    while argv and argv[0].startswith('-') and argv[0] != '-':
+        opt = argv.pop(0)
+        if opt == '--no-script-cache':
+            use_cache = False
+        elif opt == '--script-cache-stats':
+            cache_stats = True
+        elif opt == '--profile-startup':
+            profile = StartupProfile(_STARTED)
+        elif opt == '--trace' and argv:
+            trace_path = argv.pop(0)
+        elif opt == '--server':
+            server = True
+        elif opt == '--socket' and argv:
+            socket_path = argv.pop(0)
+        elif opt == '-c' and argv:
+            command = argv.pop(0)
+            break
+        elif opt == '--':
+            break
+        else:
+            print(f"myshell.py: unknown option {opt}\n{USAGE}", file=sys.stderr)
+            sys.exit(2)
+    if trace_path:
+        # Chrome trace-event JSON, written at exit (see tracing.py)
+        import atexit
+        TRACER.start(os.path.abspath(trace_path))
+        atexit.register(TRACER.stop)
+    if server:
+        sys.exit(run_server(socket_path))
+    if command is not None:
+        sys.exit(run_command(command, argv, profile))
+    if argv:
+        sys.exit(run_script(argv[0], argv[1:], use_cache=use_cache, cache_stats=cache_stats))
+    elif cache_stats:
+        config = ShellConfig()
+        config.load(os.path.expanduser('~/.myshellrc'))
+        cache = make_script_cache(config)
+        print(cache.report() if cache else "script cache: disabled")
     else:
-        main() 
\ No newline at end of file
+        main(profile)
@@ -0,0 +1,147 @@
+"""
+nodes.py - Command AST node types produced by CommandParser.
+
+Nodes are compact __slots__ classes. They also answer the dict-style lookups
+(``parsed['pipeline'][0]['args']``) that builtins and plugins have always used.
+"""
+
+class Node:
+    __slots__ = ()
+    _keys = {}      # legacy dict key -> attribute name
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._keys[key])
+        except KeyError:
+            raise KeyError(key) from None
+    def get(self, key, default=None):
+        attr = self._keys.get(key)
+        return getattr(self, attr) if attr else default
+    def __contains__(self, key):
+        return key in self._keys
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+
+class Redirect(Node):
+    """``[fd]op target`` such as ``>out``, ``2>>log``, ``<in``, ``2>&1``."""
+    __slots__ = ('fd', 'op', 'target', 'body')
+    def __init__(self, fd, op, target, body=None):
+        self.fd = fd
+        self.op = op            # '<', '>', '>>', '>&', '<&', '<>', '<<', '<<-', '<<<', '&>', '&>>'
+        self.target = target
+        self.body = body        # here-document body: bytes if final, text to expand (heredoc.py)
+
+
+class Assignment(Node):
+    """``NAME=value`` before a command (or on its own)."""
+    __slots__ = ('name', 'value')
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+class Command(Node):
+    """A simple command: assignments, argument words and redirections.
+
+    ``substitutions`` lists ``(where, ProcessSubstitution)`` for each
+    ``<(list)`` or ``>(list)`` word: where is the index of the argument, or
+    the Redirect whose target it is. The word itself stays in place as text.
+    ``globs`` lists ``(index, pattern)`` for each argument with unquoted
+    wildcards or braces, expanded when the command runs (globbing.py).
+    ``expansions`` lists ``(where, raw word)`` for each word with ``$`` or a
+    backquote, expanded just before the command runs: where is the index of
+    the argument, or the Assignment or Redirect the word is the value of.
+    """
+    __slots__ = ('args', 'redirects', 'assignments', 'substitutions', 'globs', 'expansions')
+    _keys = {'args': 'args', 'stdin': 'stdin', 'stdout': 'stdout', 'stderr': 'stderr', 'append': 'append'}
+    def __init__(self, args=None, redirects=None, assignments=None, substitutions=None, globs=None, expansions=None):
+        self.args = args if args is not None else []
+        self.redirects = redirects if redirects is not None else []
+        self.assignments = assignments if assignments is not None else []
+        self.substitutions = substitutions if substitutions is not None else []
+        self.globs = globs if globs is not None else []
+        self.expansions = expansions if expansions is not None else []
+    def _last(self, fd, ops):
+        for r in reversed(self.redirects):
+            if r.fd == fd and r.op in ops:
+                return r
+        return None
+    @property
+    def stdin(self):
+        r = self._last(0, ('<',))
+        return r.target if r else None
+    @property
+    def stdout(self):
+        r = self._last(1, ('>', '>>', '>|'))
+        return r.target if r else None
+    @property
+    def stderr(self):
+        r = self._last(2, ('>', '>>', '>|'))
+        return r.target if r else None
+    @property
+    def append(self):
+        r = self._last(1, ('>', '>>', '>|'))
+        return bool(r and r.op == '>>')
+
+
+class Subshell(Node):
+    """``( list )`` run in a child process. ``expansions`` is as for Command, for the redirections."""
+    __slots__ = ('body', 'redirects', 'expansions')
+    _keys = {'args': 'args', 'stdin': 'stdin', 'stdout': 'stdout', 'stderr': 'stderr', 'append': 'append'}
+    def __init__(self, body, redirects=None, expansions=None):
+        self.body = body
+        self.redirects = redirects if redirects is not None else []
+        self.expansions = expansions if expansions is not None else []
+    args = property(lambda self: [])
+    stdin = Command.stdin
+    stdout = Command.stdout
+    stderr = Command.stderr
+    append = Command.append
+    _last = Command._last
+
+
+class ProcessSubstitution(Node):
+    """``<(list)`` or ``>(list)``: list runs in a child reading or writing a pipe named /dev/fd/N."""
+    __slots__ = ('op', 'body')
+    def __init__(self, op, body):
+        self.op = op            # '<' (its output is read) or '>' (its input is written)
+        self.body = body
+
+
+class Pipeline(Node):
+    """``cmd | cmd | ...``, optionally negated with ``!``."""
+    __slots__ = ('commands', 'negate')
+    _keys = {'pipeline': 'commands'}
+    def __init__(self, commands, negate=False):
+        self.commands = commands
+        self.negate = negate
+
+
+class ListNode(Node):
+    """Pipelines joined by ``;``, ``&``, ``&&`` or ``||``.
+
+    ``items`` is a list of ``(pipeline, op)`` where op is the operator that
+    follows the pipeline (``None`` for the last one).
+    """
+    __slots__ = ('items',)
+    def __init__(self, items):
+        self.items = items
+
+
+class Block(Node):
+    """A compound command line (if/for/while/until/case) left for the script interpreter."""
+    __slots__ = ('text',)
+    _keys = {'block': 'text'}
+    def __init__(self, text):
+        self.text = text
+
+
+class FunctionDef(Node):
+    """A function definition line left for the script interpreter."""
+    __slots__ = ('text',)
+    _keys = {'function_def': 'text'}
+    def __init__(self, text):
+        self.text = text
@@ -0,0 +1,253 @@
+"""
+parallel.py - The parallel builtin for the advanced Python shell.
+
+    parallel [-j N] [-k] [--halt now|soon] command [{}] [::: arg...]
+
+Runs the command once per argument with at most N jobs in flight. Arguments
+come after ':::' or, one per line, from stdin (a redirection or the
+preceding pipeline stages). '{}' in the command is replaced by the quoted
+argument; without it the argument is appended. Each job's line is parsed
+and its words expanded ($VAR, $(...), globs) as the shell's own command
+lines are, before its job starts. Each job's stdout and stderr
+are buffered in anonymous temporary files and written out in one piece when
+the job finishes, so output from different jobs never interleaves.
+"""
+import os
+import sys
+import shlex
+import signal
+import threading
+from nodes import Pipeline, Subshell
+from pump import copy_fd
+from globbing import NoMatch
+from spawn import DEVNULL
+
+USAGE = "Usage: parallel [-j N] [-k] [--halt now|soon] command [{}] [::: arg...]"
+
+class ParallelUsage(ValueError):
+    """Raised for bad parallel options."""
+
+def parse_options(args):
+    """Split parallel's argv into (options dict, command template words, args or None)."""
+    options = {'jobs': os.cpu_count() or 1, 'keep_order': False, 'halt': None}
+    i = 0
+    while i < len(args) and args[i].startswith('-'):
+        arg = args[i]
+        if arg == '--':
+            i += 1
+            break
+        if arg in ('-j', '--jobs') or arg.startswith('-j') and arg[2:].isdigit():
+            value = arg[2:] if arg.startswith('-j') and len(arg) > 2 else None
+            if value is None:
+                i += 1
+                if i >= len(args):
+                    raise ParallelUsage(f"parallel: {arg} needs a number")
+                value = args[i]
+            if not value.isdigit() or int(value) < 1:
+                raise ParallelUsage(f"parallel: invalid job count '{value}'")
+            options['jobs'] = int(value)
+        elif arg in ('-k', '--keep-order'):
+            options['keep_order'] = True
+        elif arg == '--halt':
+            i += 1
+            # GNU style "now,fail=1" / "soon,fail=1" is accepted too
+            when = args[i].split(',')[0] if i < len(args) else ''
+            if when not in ('now', 'soon'):
+                raise ParallelUsage("parallel: --halt takes 'now' or 'soon'")
+            options['halt'] = when
+        else:
+            raise ParallelUsage(f"parallel: unknown option {arg}")
+        i += 1
+    words = args[i:]
+    arglist = None
+    if ':::' in words:
+        split = words.index(':::')
+        words, arglist = words[:split], words[split + 1:]
+    if not words:
+        raise ParallelUsage(USAGE)
+    return options, words, arglist
+
+def command_line(words, arg):
+    """Build one job's command line from the template words and its argument."""
+    quoted = shlex.quote(arg)
+    if any('{}' in w for w in words):
+        return ' '.join(w.replace('{}', quoted) for w in words)
+    return ' '.join(words + [quoted])
+
+def read_lines(fd):
+    """Yield arguments from fd, one per line, as they arrive."""
+    with os.fdopen(os.dup(fd), 'r', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                yield line
+
+
+class Job:
+    __slots__ = ('index', 'line', 'status', 'out', 'err', 'procs')
+    def __init__(self, index, line):
+        self.index = index
+        self.line = line
+        self.status = None
+        self.out = None
+        self.err = None
+        self.procs = []
+
+
+class Parallel:
+    """Runs jobs on a bounded thread pool; each thread waits on one executor pipeline."""
+    def __init__(self, executor, parser, jobs=1, keep_order=False, halt=None, expand=None):
+        self.executor = executor
+        self.parser = parser
+        # Expands a parsed pipeline's words (the interpreter's expand_words); runs on this thread only
+        self.expand = expand
+        self.jobs = jobs
+        self.keep_order = keep_order
+        self.halt = halt
+        self.lock = threading.Lock()
+        self.running = {}
+        self.ready = {}
+        self.next_output = 0
+        self.failures = 0
+        self.halted = None      # the job that triggered --halt
+    def run(self, words, args, stdout=1, stderr=2):
+        """Run one job per argument. Returns the exit status (see status())."""
+        self.stdout = stdout
+        self.stderr = stderr
+        # Imported here: concurrent.futures is slow to import and only parallel needs it
+        from concurrent.futures import ThreadPoolExecutor
+        slots = threading.BoundedSemaphore(self.jobs)
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for index, arg in enumerate(args):
+                # Arguments (possibly a stream) are only consumed as slots free up
+                slots.acquire()
+                if self.halted is not None:
+                    slots.release()
+                    break
+                job = Job(index, command_line(words, arg))
+                try:
+                    parsed = self._parse(job.line)
+                except NoMatch as e:
+                    print(f"parallel: {job.line}: no match: {e}")
+                    job.status = 1
+                except ValueError as e:
+                    print(f"parallel: {job.line}: parse error: {e}")
+                    job.status = 2
+                if job.status is not None:
+                    self._finished(job)
+                    slots.release()
+                    continue
+                with self.lock:
+                    self.running[index] = job
+                pool.submit(self._run_job, job, parsed, slots)
+        return self.status()
+    def _parse(self, line):
+        """A job's line parsed and expanded, as the shell's own command lines are."""
+        parsed = self.parser.parse(line)
+        if not isinstance(parsed, Pipeline):
+            # Lists such as "a && b" run in a forked subshell, which expands each item as it runs
+            return Pipeline([Subshell(parsed)])
+        if self.expand is not None:
+            parsed = self.expand(parsed)
+        return parsed
+    def status(self):
+        """The failing job's status after --halt, else the number of failed jobs (max 101)."""
+        if self.halted is not None:
+            return self.halted.status
+        return min(self.failures, 101)
+    def _run_job(self, job, parsed, slots):
+        import tempfile
+        try:
+            job.out = tempfile.TemporaryFile()
+            job.err = tempfile.TemporaryFile()
+            job.status, _ = self.executor.execute(parsed, stdout=job.out.fileno(),
+                                                  stderr=job.err.fileno(), procs=job.procs)
+        except Exception as e:
+            print(f"parallel: {job.line}: {e}")
+            job.status = 1
+        finally:
+            self._finished(job)
+            slots.release()
+    def _finished(self, job):
+        with self.lock:
+            self.running.pop(job.index, None)
+            if job.status != 0:
+                self.failures += 1
+                if self.halt and self.halted is None:
+                    self.halted = job
+                    if self.halt == 'now':
+                        self._kill_running()
+            if self.keep_order:
+                self.ready[job.index] = job
+                while self.next_output in self.ready:
+                    self._emit(self.ready.pop(self.next_output))
+                    self.next_output += 1
+            else:
+                self._emit(job)
+    def _kill_running(self):
+        for other in self.running.values():
+            # Every stage joins the first stage's process group: one signal stops the job
+            if not other.procs or not other.procs[0].pid:
+                continue
+            try:
+                os.killpg(other.procs[0].pid, signal.SIGTERM)
+            except OSError:
+                pass
+    def _emit(self, job):
+        sys.stdout.flush()
+        for buffer, dst in ((job.out, self.stdout), (job.err, self.stderr)):
+            if buffer is None:
+                continue
+            os.lseek(buffer.fileno(), 0, os.SEEK_SET)
+            try:
+                copy_fd(buffer.fileno(), dst)
+            except BrokenPipeError:
+                pass
+            buffer.close()
+
+def run_parallel(parsed, executor, parser, expand=None):
+    """Run a pipeline whose last stage is 'parallel'; earlier stages feed it arguments.
+
+    expand, if given, expands each job's parsed pipeline (see Parallel).
+    """
+    cmd = parsed.commands[-1]
+    try:
+        options, words, arglist = parse_options(cmd.args[1:])
+    except ParallelUsage as e:
+        print(e)
+        return 2
+    fds = {0: None, 1: None, 2: None}
+    opened_fds = []
+    producer = []
+    read_end = None
+    try:
+        executor.apply_redirects(cmd, fds, opened_fds)
+        for target, fd in fds.items():
+            if fd == DEVNULL:
+                fds[target] = os.open(os.devnull, os.O_RDWR)
+                opened_fds.append(fds[target])
+        if arglist is None and len(parsed.commands) > 1 and fds[0] is None:
+            read_end, write_end = os.pipe()
+            try:
+                status, _ = executor.execute(Pipeline(parsed.commands[:-1]), run_in_bg=True,
+                                             stdout=write_end, procs=producer)
+            finally:
+                os.close(write_end)
+            fds[0] = read_end
+        runner = Parallel(executor, parser, expand=expand, **options)
+        args = arglist if arglist is not None else read_lines(fds[0] if fds[0] is not None else 0)
+        status = runner.run(words, args,
+                            stdout=fds[1] if fds[1] is not None else 1,
+                            stderr=fds[2] if fds[2] is not None else 2)
+    except OSError as e:
+        print(f"parallel: {e}")
+        status = 1
+    finally:
+        # Closing the pipe stops a producer that is still writing (SIGPIPE)
+        if read_end is not None:
+            os.close(read_end)
+        for fd in opened_fds:
+            os.close(fd)
+        for proc in producer:
+            proc.wait()
+    return status
@@ -1,50 +1,171 @@
 """
 parser.py - Command and script parser for the advanced Python shell.
 """
-import shlex
+import re
+from lexer import tokenize, glob_pattern, WORD, OP, NEWLINE, PROCSUB
+from nodes import Redirect, Assignment, Command, Subshell, Pipeline, ListNode, Block, FunctionDef, ProcessSubstitution
+
+BLOCK_KEYWORDS = ('if', 'for', 'while', 'until', 'case')
+ASSIGNMENT_RE = re.compile(r'[A-Za-z_]\w*=')
+REDIRECT_RE = re.compile(r'(\d*)(.*)')
+LIST_OPS = (';', '&', '\n')
+GLOB_CHARS_RE = re.compile(r'[*?\[{]')
+# Words with parameters or command substitutions, expanded just before the command runs
+EXPANSION_RE = re.compile(r'[$`]')
+
+class ParseError(ValueError):
+    """Raised on a command line syntax error."""
 
 class CommandParser:
     """Parses shell commands and scripts into executable structures."""
     def parse(self, line):
-        """Parse a single command line or script line. Returns a parsed structure."""
-        # Parallel background jobs: split on '&' (not at end)
-        if '&' in line and not line.strip().endswith('&'):
-            jobs = [l.strip() for l in line.split('&') if l.strip()]
-            return {'parallel_jobs': [self.parse(job) for job in jobs]}
-        # Wait command
-        if line.strip() == 'wait':
-            return {'wait': True}
-        # TODO: Recognize nested blocks and function definitions
-        if line.strip().startswith('function ') or ('()' in line and '{' in line):
-            return {'function_def': line.strip()}
-        if line.strip().startswith(('if ', 'for ', 'while ', 'case ')):
-            return {'block': line.strip()}
-        if '<<' in line:
-            return {'heredoc': line.strip()}
-        # Fallback: pipeline parsing
-        pipe_parts = [p.strip() for p in line.split('|')]
-        commands = []
-        for part in pipe_parts:
-            tokens = shlex.split(part)
-            cmd = {'args': [], 'stdin': None, 'stdout': None, 'stderr': None, 'append': False}
-            i = 0
-            while i < len(tokens):
-                if tokens[i] == '>':
-                    cmd['stdout'] = tokens[i+1]
-                    cmd['append'] = False
-                    i += 2
-                elif tokens[i] == '>>':
-                    cmd['stdout'] = tokens[i+1]
-                    cmd['append'] = True
-                    i += 2
-                elif tokens[i] == '<':
-                    cmd['stdin'] = tokens[i+1]
-                    i += 2
-                elif tokens[i] == '2>':
-                    cmd['stderr'] = tokens[i+1]
-                    i += 2
+        """Parse a single command line or script line. Returns a parsed structure.
+
+        A lone pipeline is returned as a Pipeline node; anything joined with
+        ';', '&', '&&' or '||' becomes a ListNode. Compound commands and
+        function definitions are returned whole for the script interpreter.
+        """
+        tokens = tokenize(line)
+        if tokens and tokens[0].kind == WORD and not tokens[0].quoted:
+            first = tokens[0].value
+            if first in BLOCK_KEYWORDS:
+                return Block(line.strip())
+            if first == 'function' or (len(tokens) > 2 and tokens[1].value == '(' and tokens[2].value == ')'):
+                return FunctionDef(line.strip())
+        self.tokens = tokens
+        self.pos = 0
+        node = self._parse_list(())
+        if self.pos < len(tokens):
+            raise ParseError(f"syntax error near unexpected token '{tokens[self.pos].value}'")
+        return node
+    # list := and_or ((';' | '&' | newline) and_or)*
+    def _parse_list(self, stop):
+        tokens = self.tokens
+        items = []
+        while self.pos < len(tokens):
+            tok = tokens[self.pos]
+            if tok.kind != WORD and tok.value in stop:
+                break
+            if tok.kind == NEWLINE or (tok.kind == OP and tok.value == ';' and not items):
+                self.pos += 1
+                continue
+            items.extend(self._parse_and_or())
+            if self.pos < len(tokens) and tokens[self.pos].kind != WORD and tokens[self.pos].value in LIST_OPS:
+                op = tokens[self.pos].value
+                items[-1] = (items[-1][0], ';' if op == '\n' else op)
+                self.pos += 1
+        if len(items) == 1 and items[0][1] in (None, ';'):
+            return items[0][0]
+        if not items:
+            return Pipeline([])
+        return ListNode(items)
+    # and_or := pipeline (('&&' | '||') pipeline)*
+    def _parse_and_or(self):
+        tokens = self.tokens
+        items = [(self._parse_pipeline(), None)]
+        while self.pos < len(tokens) and tokens[self.pos].kind == OP and tokens[self.pos].value in ('&&', '||'):
+            op = tokens[self.pos].value
+            self.pos += 1
+            while self.pos < len(tokens) and tokens[self.pos].kind == NEWLINE:
+                self.pos += 1
+            items[-1] = (items[-1][0], op)
+            items.append((self._parse_pipeline(), None))
+        return items
+    # pipeline := ['!'] command ('|' command)*
+    def _parse_pipeline(self):
+        tokens = self.tokens
+        negate = False
+        if self.pos < len(tokens) and tokens[self.pos].kind == WORD and tokens[self.pos].raw == '!':
+            negate = True
+            self.pos += 1
+        commands = [self._parse_command()]
+        while self.pos < len(tokens) and tokens[self.pos].kind == OP and tokens[self.pos].value == '|':
+            self.pos += 1
+            while self.pos < len(tokens) and tokens[self.pos].kind == NEWLINE:
+                self.pos += 1
+            commands.append(self._parse_command())
+        return Pipeline(commands, negate)
+    # command := '(' list ')' redirect* | (assignment | word | redirect)+
+    def _parse_command(self):
+        tokens = self.tokens
+        if self.pos < len(tokens) and tokens[self.pos].kind == OP and tokens[self.pos].value == '(':
+            self.pos += 1
+            body = self._parse_list((')',))
+            if self.pos >= len(tokens) or tokens[self.pos].value != ')':
+                raise ParseError("syntax error: expected ')'")
+            self.pos += 1
+            node = Subshell(body)
+            while self.pos < len(tokens) and tokens[self.pos].kind == OP and self._is_redirect(tokens[self.pos].value):
+                r = self._parse_redirect()
+                if tokens[self.pos - 1].kind == PROCSUB:
+                    raise ParseError("syntax error: process substitution as a subshell's redirection")
+                self._note_target(node, r)
+                node.redirects.append(r)
+            return node
+        cmd = Command()
+        while self.pos < len(tokens):
+            tok = tokens[self.pos]
+            if tok.kind == WORD:
+                if not cmd.args and ASSIGNMENT_RE.match(tok.raw):
+                    name, raw = tok.raw.split('=', 1)
+                    a = Assignment(name, tok.value[len(name)+1:])
+                    if EXPANSION_RE.search(raw):
+                        cmd.expansions.append((a, raw))
+                    cmd.assignments.append(a)
+                else:
+                    if EXPANSION_RE.search(tok.raw):
+                        # Field splitting and globbing follow the expansion
+                        cmd.expansions.append((len(cmd.args), tok.raw))
+                    elif GLOB_CHARS_RE.search(tok.raw):
+                        pattern = glob_pattern(tok.raw)
+                        if pattern is not None:
+                            cmd.globs.append((len(cmd.args), pattern))
+                    cmd.args.append(tok.value)
+                self.pos += 1
+            elif tok.kind == PROCSUB:
+                cmd.substitutions.append((len(cmd.args), self._substitution(tok)))
+                cmd.args.append(tok.value)
+                self.pos += 1
+            elif self._is_redirect(tok.value):
+                r = self._parse_redirect()
+                if self.tokens[self.pos - 1].kind == PROCSUB:
+                    cmd.substitutions.append((r, self._substitution(self.tokens[self.pos - 1])))
                 else:
-                    cmd['args'].append(tokens[i])
-                    i += 1
-            commands.append(cmd)
-        return {'pipeline': commands} 
\ No newline at end of file
+                    self._note_target(cmd, r)
+                cmd.redirects.append(r)
+            else:
+                break
+        if not cmd.args and not cmd.redirects and not cmd.assignments:
+            if self.pos < len(tokens):
+                raise ParseError(f"syntax error near unexpected token '{tokens[self.pos].value}'")
+            raise ParseError("syntax error: unexpected end of line")
+        return cmd
+    def _note_target(self, node, r):
+        # The target just parsed, unless it is a here-document delimiter
+        raw = self.tokens[self.pos - 1].raw
+        if r.op not in ('<<', '<<-') and EXPANSION_RE.search(raw):
+            node.expansions.append((r, raw))
+    def _is_redirect(self, op):
+        # Every redirection operator contains '<' or '>'; no control operator does
+        return '<' in op or '>' in op
+    def _substitution(self, tok):
+        # A parser of its own: this one is in the middle of the outer line
+        return ProcessSubstitution(tok.value[0], type(self)().parse(tok.value[2:-1]))
+    def _parse_redirect(self):
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        digits, op = REDIRECT_RE.match(tok.value).groups()
+        if op == '>|':
+            op = '>'
+        if digits:
+            fd = int(digits)
+        else:
+            fd = 0 if op[0] == '<' else 1
+        if self.pos >= len(self.tokens) or self.tokens[self.pos].kind not in (WORD, PROCSUB):
+            raise ParseError(f"syntax error: missing target for '{tok.value}'")
+        target = self.tokens[self.pos]
+        self.pos += 1
+        if op in ('<<', '<<-'):
+            # Keep the delimiter as written; quoting disables expansion of the body
+            return Redirect(fd, op, target.raw)
+        return Redirect(fd, op, target.value)
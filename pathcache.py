@@ -0,0 +1,214 @@
+"""
+pathcache.py - $PATH command hash table and command suggestions for the advanced Python shell.
+"""
+import os
+
+
+def edit_distance(a, b, limit=None):
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions).
+
+    With a limit, it may stop early once the distance must exceed it, and return any value above limit.
+    """
+    if a == b:
+        return 0
+    if not a or not b:
+        return len(a) or len(b)
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        ca = a[i-1]
+        cur = [i]
+        for j in range(1, len(b) + 1):
+            cb = b[j-1]
+            d = min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (ca != cb))
+            if prev2 is not None and j > 1 and ca == b[j-2] and a[i-2] == cb:
+                d = min(d, prev2[j-2] + 1)
+            cur.append(d)
+        # Row minimums never decrease (a transposition adds one to a row that is at most one less)
+        if limit is not None and min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _bigrams(word):
+    padded = '^' + word + '$'
+    return {padded[i:i+2] for i in range(len(padded) - 1)}
+
+
+class NGramIndex:
+    """Character and bigram index over command names for fast approximate ("did you mean") lookups.
+
+    Each name is filed under its characters and the bigrams of '^name$'.
+    One edit costs a word at most one of its distinct characters and three
+    of its bigrams (a transposition; two for the others), so a name within
+    distance d of the query shares all but d of its characters and all but
+    3*d of its bigrams. Only names that pass those counts and the length
+    bound are compared with edit_distance. Building it is a few dict
+    appends per name.
+    """
+    def __init__(self, words=()):
+        self.chars = {}         # character -> [word, ...]
+        self.grams = {}         # bigram -> [word, ...]
+        self.lengths = {}       # length -> [word, ...]
+        for word in words:
+            self.add(word)
+    def add(self, word):
+        for c in set(word):
+            self.chars.setdefault(c, []).append(word)
+        for gram in _bigrams(word):
+            self.grams.setdefault(gram, []).append(word)
+        self.lengths.setdefault(len(word), []).append(word)
+    def search(self, word, tolerance):
+        """Return [(distance, word)] for every word within tolerance."""
+        lo, hi = len(word) - tolerance, len(word) + tolerance
+        chars = set(word)
+        need_chars = len(chars) - tolerance
+        if need_chars <= 0:
+            # Too short to filter on: every word of a close enough length
+            candidates = [w for n in range(max(lo, 0), hi + 1) for w in self.lengths.get(n, ())]
+        else:
+            candidates = self._sharing(self.chars, chars, need_chars, lo, hi)
+            grams = _bigrams(word)
+            need_grams = len(grams) - 3 * tolerance
+            if need_grams > 0:
+                candidates &= self._sharing(self.grams, grams, need_grams, lo, hi)
+        results = []
+        for candidate in candidates:
+            d = edit_distance(word, candidate, tolerance)
+            if d <= tolerance:
+                results.append((d, candidate))
+        return results
+    def _sharing(self, index, keys, need, lo, hi):
+        """The words of a length in [lo, hi] filed under at least need of keys."""
+        shared = {}
+        for key in keys:
+            for w in index.get(key, ()):
+                shared[w] = shared.get(w, 0) + 1
+        return {w for w, count in shared.items() if count >= need and lo <= len(w) <= hi}
+
+
+class CommandHashTable:
+    """Resolves command names against $PATH.
+
+    The directory listing is built once and only rebuilt when $PATH or the
+    mtime of one of its directories changes. Resolved commands are remembered
+    with a hit count, like bash's ``hash``; a remembered location is dropped
+    when $PATH differs from the one the table was built from, or when it is
+    no longer an executable file.
+    """
+    def __init__(self, path=None):
+        self._path_override = path
+        self._path = None           # the $PATH value the table was built from
+        self._mtimes = ()
+        self._table = {}
+        self._index = NGramIndex()
+        self._sorted = None
+        self.hashed = {}
+        self.hits = {}
+        self._pinned = set()
+    def _current_path(self):
+        if self._path_override is not None:
+            return self._path_override
+        return os.environ.get('PATH', os.defpath)
+    def _dir_mtimes(self, dirs):
+        mtimes = []
+        for d in dirs:
+            try:
+                mtimes.append(os.stat(d).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+    def refresh(self, force=False):
+        """Rebuild the command table if $PATH or a PATH directory changed."""
+        path = self._current_path()
+        dirs = [d or '.' for d in path.split(os.pathsep)]
+        mtimes = self._dir_mtimes(dirs)
+        if not force and path == self._path and mtimes == self._mtimes:
+            return False
+        table = {}
+        for d in dirs:
+            try:
+                entries = os.scandir(d)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name in table:
+                        continue
+                    try:
+                        if entry.is_dir():
+                            continue
+                    except OSError:
+                        continue
+                    table[entry.name] = os.path.join(d, entry.name)
+        path_changed = path != self._path
+        self._path = path
+        self._mtimes = mtimes
+        self._table = table
+        # Built with the table (a few ms), so the first typo only pays for the search
+        self._index = NGramIndex(table)
+        self._sorted = None
+        # Drop remembered locations: all of them for a new $PATH, else those
+        # that no longer exist (hash -p entries stay)
+        for name, location in list(self.hashed.items()):
+            if name not in self._pinned and (path_changed or not os.path.exists(location)):
+                self.forget(name)
+        return True
+    def lookup(self, name):
+        """Return the absolute path for a command name, or None if not found."""
+        if '/' in name:
+            return name
+        location = self.hashed.get(name)
+        if location is not None and name not in self._pinned:
+            if self._current_path() != self._path:
+                self.refresh()
+                location = self.hashed.get(name)
+            elif not os.access(location, os.X_OK):
+                # Removed or made non-executable since: resolve it again
+                self.forget(name)
+                location = None
+        if location is None:
+            self.refresh()
+            location = self._table.get(name)
+            if location is not None and not os.access(location, os.X_OK):
+                # The listing may be stale (a directory's mtime did not move): read $PATH again
+                self.refresh(force=True)
+                location = self._table.get(name)
+            if location is None or not os.access(location, os.X_OK):
+                return None
+            location = os.path.abspath(location)
+            self.hashed[name] = location
+        self.hits[name] = self.hits.get(name, 0) + 1
+        return location
+    def add(self, name, location):
+        """Remember a command at an explicit location (hash -p)."""
+        self.hashed[name] = location
+        self.hits.setdefault(name, 0)
+        self._pinned.add(name)
+    def forget(self, name):
+        """Forget a remembered command (hash -d). Returns False if not hashed."""
+        self.hits.pop(name, None)
+        self._pinned.discard(name)
+        return self.hashed.pop(name, None) is not None
+    def reset(self):
+        """Forget all remembered commands (hash -r)."""
+        self.hashed.clear()
+        self.hits.clear()
+        self._pinned.clear()
+    def commands(self):
+        """All command names found on $PATH."""
+        self.refresh()
+        return self._table.keys()
+    def sorted_commands(self):
+        """All command names found on $PATH, sorted (for prefix lookups)."""
+        self.refresh()
+        if self._sorted is None:
+            self._sorted = sorted(self._table)
+        return self._sorted
+    def suggest(self, name, n=3):
+        """Return up to n command names close to name, best first."""
+        self.refresh()
+        tolerance = 1 if len(name) <= 3 else 2
+        matches = sorted(self._index.search(name, tolerance))
+        return [word for _, word in matches[:n]]
@@ -1,9 +1,23 @@
 """
 plugins/__init__.py - Plugin system for the advanced Python shell.
+
+Importing every plugin at startup costs more than the rest of the shell, so
+plugins are loaded on first use. A manifest (kept in the shell's cache
+directory) records what each plugin file registers -- commands, completions
+and hooks -- together with the file's size and mtime. While it is current,
+startup only installs stubs under those names; the first call of a stub
+imports and activates the plugin. A new or changed plugin file is imported
+at startup once to refresh its manifest entry.
 """
 import os
+import json
 import importlib
 import importlib.util
+from completion import CompletionSource
+
+HOOK_KINDS = ('pre_exec_hooks', 'post_exec_hooks', 'on_error_hooks')
+MANIFEST_VERSION = 1
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 class PluginBase:
     """Base class for shell plugins."""
@@ -11,29 +25,201 @@ class PluginBase:
         """Activate the plugin with the shell context."""
         pass
 
-def load_plugins(shell, plugins_dir='unix/plugins'):
-    """Discover and load all plugins in the plugins directory."""
-    plugins = []
-    if not os.path.exists(plugins_dir):
-        os.makedirs(plugins_dir)
-    for fname in os.listdir(plugins_dir):
-        if fname.endswith('.py') and fname != '__init__.py':
-            try:
-                if plugins_dir == 'unix/plugins':
-                    modname = f'unix.plugins.{fname[:-3]}'
-                    mod = importlib.import_module(modname)
-                else:
-                    modname = fname[:-3]
-                    spec = importlib.util.spec_from_file_location(modname, os.path.join(plugins_dir, fname))
-                    if spec and spec.loader:
-                        mod = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(mod)
-                    else:
-                        raise ImportError(f"Could not load spec for {fname}")
-                if hasattr(mod, 'Plugin'):
-                    plugin = mod.Plugin()
-                    plugin.activate(shell)
-                    plugins.append(plugin)
-            except Exception as e:
-                print(f"Failed to load plugin {fname}: {e}")
-    return plugins 
\ No newline at end of file
+class _CompletionRecorder:
+    """Stands in for the completion engine while a plugin activates."""
+    def __init__(self, engine):
+        self.engine = engine
+        self.registered = {}
+    def register(self, command, func):
+        self.registered[command] = func
+    def register_source(self, command, candidates, ttl=None):
+        source = self.registered[command] = CompletionSource(candidates, ttl)
+        return source
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+class _LazyHook:
+    """A hook list entry that activates its plugin on the first call and then delegates."""
+    def __init__(self, manager, name, kind):
+        self.manager = manager
+        self.name = name
+        self.kind = kind
+    def resolve(self):
+        """The plugin's real hooks of this kind (HookManager swaps them in for the stub)."""
+        if not self.manager.activate(self.name):
+            return []
+        return list(self.manager.registrations[self.name]['hooks'].get(self.kind, ()))
+    def __call__(self, *args):
+        for hook in self.resolve():
+            hook(*args)
+
+class PluginManager:
+    """Discovers plugins, keeps their manifest and activates each one at most once.
+
+    shell is the context dict handed to Plugin.activate(); the manager fills
+    its 'custom_commands', 'completion' and hook list entries.
+    """
+    def __init__(self, shell, plugins_dir=None, store=None):
+        self.shell = shell
+        self.plugins_dir = os.path.abspath(plugins_dir or PACKAGE_DIR)
+        self.store = store          # DiskCache holding the manifest; None: always import
+        self.plugins = {}           # name -> activated Plugin instance
+        self.registrations = {}     # name -> what its activate() registered
+        self.manifest = {}
+        self.failed = set()
+        shell.setdefault('custom_commands', {})
+        for kind in HOOK_KINDS:
+            shell.setdefault(kind, [])
+    def discover(self):
+        """(name, stat key) of each plugin file; a missing directory has none."""
+        found = []
+        try:
+            entries = os.scandir(self.plugins_dir)
+        except OSError:
+            return found
+        with entries:
+            for entry in entries:
+                if entry.name.endswith('.py') and entry.name != '__init__.py':
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found.append((entry.name[:-3], [st.st_size, st.st_mtime_ns]))
+        return sorted(found)
+    def load(self):
+        """Install every plugin: stubs for those the manifest describes, the rest imported now."""
+        manifest = self._read_manifest()
+        changed = False
+        for name, stat_key in self.discover():
+            entry = manifest.get(name)
+            if entry is not None and entry.get('stat') == stat_key:
+                self.manifest[name] = entry
+                self._install_stubs(name, entry)
+                continue
+            changed = True
+            if self.activate(name):
+                recorded = self.registrations[name]
+                self.manifest[name] = {
+                    'stat': stat_key,
+                    'commands': sorted(recorded['commands']),
+                    'completions': sorted(recorded['completions']),
+                    'hooks': sorted(recorded['hooks']),
+                }
+        if changed or set(manifest) != set(self.manifest):
+            self._write_manifest()
+        return len(self.manifest)
+    def activate_all(self):
+        for name, _ in self.discover():
+            self.activate(name)
+        return list(self.plugins.values())
+    def activate(self, name):
+        """Import and activate plugin name once. Returns True when it is active."""
+        if name in self.plugins:
+            return True
+        if name in self.failed:
+            return False
+        try:
+            mod = self._import(name)
+            plugin = mod.Plugin() if hasattr(mod, 'Plugin') else None
+            recorded = {'commands': {}, 'completions': {}, 'hooks': {}}
+            if plugin is not None:
+                recorded = self._record(plugin)
+        except Exception as e:
+            print(f"Failed to load plugin {name}: {e}")
+            self.failed.add(name)
+            return False
+        self.plugins[name] = plugin
+        self.registrations[name] = recorded
+        self._apply(name, recorded)
+        return True
+    def _import(self, name):
+        if self.plugins_dir == PACKAGE_DIR:
+            return importlib.import_module(f'{__name__}.{name}')
+        spec = importlib.util.spec_from_file_location(name, os.path.join(self.plugins_dir, name + '.py'))
+        if not spec or not spec.loader:
+            raise ImportError(f"Could not load spec for {name}.py")
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+        return mod
+    def _record(self, plugin):
+        """Activate plugin against a copy of the shell context and collect what it registered."""
+        context = dict(self.shell)
+        context['custom_commands'] = {}
+        context['completion'] = _CompletionRecorder(self.shell.get('completion'))
+        for kind in HOOK_KINDS:
+            context[kind] = []
+        plugin.activate(context)
+        recorded = {
+            'commands': dict(context.pop('custom_commands')),
+            'completions': context.pop('completion').registered,
+            'hooks': {kind: context.pop(kind) for kind in HOOK_KINDS if context.get(kind)},
+        }
+        for kind in HOOK_KINDS:
+            context.pop(kind, None)
+        # Anything else the plugin added to the context is passed through
+        for key, value in context.items():
+            if key not in self.shell:
+                self.shell[key] = value
+        return recorded
+    def _apply(self, name, recorded):
+        self.shell['custom_commands'].update(recorded['commands'])
+        completion = self.shell.get('completion')
+        if completion is not None:
+            for command, func in recorded['completions'].items():
+                completion.register(command, func)
+        entry = self.manifest.get(name)
+        stubbed = set(entry['hooks']) if entry else set()
+        for kind, hooks in recorded['hooks'].items():
+            # A _LazyHook already in the list delegates to these
+            if kind not in stubbed:
+                self.shell[kind].extend(hooks)
+    def _install_stubs(self, name, entry):
+        commands = self.shell['custom_commands']
+        for command in entry['commands']:
+            commands[command] = self._command_stub(name, command)
+        completion = self.shell.get('completion')
+        if completion is not None:
+            for command in entry['completions']:
+                completion.register(command, self._completion_stub(name, command))
+        for kind in entry['hooks']:
+            if kind in HOOK_KINDS:
+                self.shell[kind].append(_LazyHook(self, name, kind))
+    def _command_stub(self, name, command):
+        def stub(*args):
+            if not self.activate(name):
+                return None
+            func = self.registrations[name]['commands'].get(command)
+            if func is None:
+                print(f"{command}: no longer provided by plugin {name}")
+                self.shell['custom_commands'].pop(command, None)
+                return None
+            return func(*args)
+        return stub
+    def _completion_stub(self, name, command):
+        def stub(text, state):
+            if not self.activate(name):
+                return None
+            func = self.registrations[name]['completions'].get(command)
+            return func(text, state) if func is not None else None
+        return stub
+    def _read_manifest(self):
+        if self.store is None:
+            return {}
+        data = self.store.get(self.plugins_dir)
+        if data is None:
+            return {}
+        try:
+            manifest = json.loads(data)
+        except ValueError:
+            return {}
+        if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest.get('plugins', {})
+    def _write_manifest(self):
+        if self.store is not None:
+            data = json.dumps({'version': MANIFEST_VERSION, 'plugins': self.manifest}, sort_keys=True)
+            self.store.put(self.plugins_dir, data.encode())
+
+def load_plugins(shell, plugins_dir=None):
+    """Discover, load and activate all plugins in the plugins directory (no manifest, no laziness)."""
+    return PluginManager(shell, plugins_dir).activate_all()
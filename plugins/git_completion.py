@@ -8,15 +8,8 @@ git_subcommands = [
     'mv', 'pull', 'push', 'rebase', 'reset', 'rm', 'show', 'status', 'tag'
 ]
 
-def git_completer(text, state):
-    matches = [cmd for cmd in git_subcommands if cmd.startswith(text)]
-    try:
-        return matches[state]
-    except IndexError:
-        return None
-
 class Plugin(PluginBase):
     def activate(self, shell):
-        print("[GitCompletion] Plugin activated!")
         if 'completion' in shell:
-            shell['completion'].register('git', git_completer) 
\ No newline at end of file
+            # Sorted once; each Tab is a bisect (see completion.py)
+            shell['completion'].register_source('git', git_subcommands)
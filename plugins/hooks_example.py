@@ -5,7 +5,6 @@ from . import PluginBase
 
 class Plugin(PluginBase):
     def activate(self, shell):
-        print("[HooksExample] Plugin activated!")
         shell['pre_exec_hooks'] = shell.get('pre_exec_hooks', [])
         shell['post_exec_hooks'] = shell.get('post_exec_hooks', [])
         shell['on_error_hooks'] = shell.get('on_error_hooks', [])
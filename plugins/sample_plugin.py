@@ -5,7 +5,6 @@ from . import PluginBase
 
 class Plugin(PluginBase):
     def activate(self, shell):
-        print("[SamplePlugin] Plugin activated!")
         # Example: add a custom command to the shell context
         shell['custom_commands'] = shell.get('custom_commands', {})
         shell['custom_commands']['hello'] = self.hello
@@ -0,0 +1,172 @@
+"""
+prompt.py - Cached prompt rendering and git branch detection for the advanced Python shell.
+"""
+import os
+import string
+import threading
+
+_git_dirs = {}
+_git_heads = {}
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def find_git_dir(cwd=None):
+    """Return the .git directory for cwd (walking up), or None.
+
+    Cached per cwd with the mtime of every directory the walk looked in:
+    creating or removing a .git in one of them (git init ..) changes its
+    mtime, so one stat per level tells whether the answer still holds.
+    """
+    cwd = cwd or os.getcwd()
+    cached = _git_dirs.get(cwd)
+    if cached and [_mtime(d) for d in cached[0]] == cached[1]:
+        return cached[2]
+    path = cwd
+    git_dir = None
+    dirs = []
+    mtimes = []
+    while True:
+        # Before looking, so a change made during the walk shows up next time
+        mtime = _mtime(path)
+        if mtime is None:
+            return None
+        dirs.append(path)
+        mtimes.append(mtime)
+        candidate = os.path.join(path, '.git')
+        if os.path.isdir(candidate):
+            git_dir = candidate
+            break
+        if os.path.isfile(candidate):
+            # Worktrees and submodules: ".git" is a file pointing at the real git dir
+            try:
+                with open(candidate) as f:
+                    content = f.read().strip()
+            except OSError:
+                content = ''
+            if content.startswith('gitdir:'):
+                git_dir = os.path.join(path, content[7:].strip())
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    _git_dirs[cwd] = (dirs, mtimes, git_dir)
+    return git_dir
+
+def git_branch(cwd=None):
+    """Current branch name read from .git/HEAD (short sha when detached), '' outside a repo."""
+    git_dir = find_git_dir(cwd)
+    if not git_dir:
+        return ''
+    head = os.path.join(git_dir, 'HEAD')
+    try:
+        mtime = os.stat(head).st_mtime_ns
+    except OSError:
+        return ''
+    cached = _git_heads.get(head)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(head) as f:
+            content = f.read().strip()
+    except OSError:
+        return ''
+    if content.startswith('ref:'):
+        ref = content[4:].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+    else:
+        branch = content[:7]
+    _git_heads[head] = (mtime, branch)
+    return branch
+
+
+def clock(cwd=None):
+    import datetime
+    return datetime.datetime.now().strftime('%H:%M:%S')
+
+class PromptTemplate:
+    """A PROMPT format string parsed once into literals and segment fields."""
+    def __init__(self, template):
+        self.template = template
+        self.parts = []
+        self.fields = set()
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            if literal:
+                self.parts.append((literal, None, None))
+            if field is not None:
+                self.parts.append((None, field, spec or ''))
+                self.fields.add(field)
+    def render(self, values):
+        out = []
+        for literal, field, spec in self.parts:
+            if field is None:
+                out.append(literal)
+            else:
+                out.append(format(values.get(field, ''), spec))
+        return ''.join(out)
+
+
+class PromptEngine:
+    """Renders prompts from precompiled templates.
+
+    Segments marked expensive are computed on a background thread; the prompt
+    waits at most ``budget`` seconds for them and otherwise shows the last
+    value known for the current directory.
+    """
+    def __init__(self, budget=0.01):
+        self.budget = budget
+        self.segments = {}
+        self._templates = {}
+        self._last = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = None
+        self.register('cwd', lambda cwd: cwd)
+        self.register('time', clock)
+        self.register('git', git_branch, expensive=True)
+    def register(self, name, func, expensive=False):
+        """Register a prompt segment; func(cwd) returns its text."""
+        self.segments[name] = (func, expensive)
+    def compile(self, template):
+        compiled = self._templates.get(template)
+        if compiled is None:
+            compiled = self._templates[template] = PromptTemplate(template)
+        return compiled
+    def segment(self, name, cwd=None):
+        cwd = cwd or os.getcwd()
+        func, expensive = self.segments[name]
+        if not expensive:
+            return func(cwd)
+        key = (name, cwd)
+        # Deferred: concurrent.futures costs more to import than the rest of the prompt
+        from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prompt')
+                future = self._pending[key] = self._pool.submit(func, cwd)
+        try:
+            value = future.result(timeout=self.budget)
+        except FutureTimeout:
+            # Still running: show the last known value, pick up the result next time
+            return self._last.get(key, '')
+        except Exception:
+            value = self._last.get(key, '')
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+        self._last[key] = value
+        return value
+    def render(self, template):
+        compiled = self.compile(template)
+        cwd = os.getcwd()
+        values = {}
+        for name in compiled.fields:
+            if name in self.segments:
+                values[name] = self.segment(name, cwd)
+        return compiled.render(values)
@@ -0,0 +1,142 @@
+"""
+pump.py - Moving pipeline output through the shell with as few copies as possible.
+
+When the last stage of a pipeline writes to the terminal or a file, the child
+gets that fd directly and the shell is not in the data path at all. The
+output stages here are for the cases where the shell has to see the bytes:
+capturing, tee-ing to several destinations, or counting them on the way.
+"""
+import os
+import stat
+import errno
+from abc import ABC, abstractmethod
+
+CHUNK = 1 << 20     # 1 MiB per splice/sendfile/read call
+
+def _is_pipe(fd):
+    try:
+        return stat.S_ISFIFO(os.fstat(fd).st_mode)
+    except OSError:
+        return False
+
+def _is_regular(fd):
+    try:
+        return stat.S_ISREG(os.fstat(fd).st_mode)
+    except OSError:
+        return False
+
+def write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+def copy_fd(src, dst):
+    """Copy src to dst until EOF. Returns the number of bytes copied.
+
+    Uses splice(2) when either side is a pipe, sendfile(2) from regular
+    files, and 1 MiB read/write otherwise.
+    """
+    total = 0
+    if hasattr(os, 'splice') and (_is_pipe(src) or _is_pipe(dst)):
+        try:
+            while True:
+                n = os.splice(src, dst, CHUNK)
+                if n == 0:
+                    return total
+                total += n
+        except OSError as e:
+            # EINVAL: this pair of files cannot be spliced (e.g. a tty); nothing was lost
+            if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+    if hasattr(os, 'sendfile') and _is_regular(src):
+        try:
+            while True:
+                n = os.sendfile(dst, src, None, CHUNK)
+                if n == 0:
+                    return total
+                total += n
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+    while True:
+        data = os.read(src, CHUNK)
+        if not data:
+            return total
+        write_all(dst, data)
+        total += len(data)
+
+def read_all(fd, limit=None):
+    """Read fd to EOF. Returns (data, truncated); past limit bytes the rest is discarded."""
+    chunks = []
+    size = 0
+    truncated = False
+    while True:
+        data = os.read(fd, CHUNK)
+        if not data:
+            break
+        if limit is not None and size + len(data) > limit:
+            data = data[:max(0, limit - size)]
+            truncated = True
+        if data:
+            chunks.append(data)
+            size += len(data)
+    return b''.join(chunks), truncated
+
+
+class OutputStage(ABC):
+    """Receives the final pipeline stage's output; drain() runs until EOF."""
+    @abstractmethod
+    def drain(self, fd):
+        """Consume fd until EOF."""
+
+
+class Capture(OutputStage):
+    """Collects output in memory (optionally capped at limit bytes)."""
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.data = b''
+        self.truncated = False
+    def drain(self, fd):
+        self.data, self.truncated = read_all(fd, self.limit)
+    def text(self, encoding='utf-8'):
+        return self.data.decode(encoding, errors='replace')
+
+
+class Meter(OutputStage):
+    """Passes output through to dst while counting the bytes."""
+    def __init__(self, dst=1):
+        self.dst = dst
+        self.bytes = 0
+    def drain(self, fd):
+        self.bytes += copy_fd(fd, self.dst)
+
+
+class Tee(OutputStage):
+    """Copies output to several destination fds (and optionally captures it)."""
+    def __init__(self, *dsts, capture=False):
+        self.dsts = list(dsts)
+        self.capture = capture
+        self.bytes = 0
+        self.data = b''
+    def drain(self, fd):
+        if len(self.dsts) == 1 and not self.capture:
+            self.bytes += copy_fd(fd, self.dsts[0])
+            return
+        chunks = []
+        dsts = list(self.dsts)
+        while True:
+            data = os.read(fd, CHUNK)
+            if not data:
+                break
+            self.bytes += len(data)
+            if self.capture:
+                chunks.append(data)
+            for dst in list(dsts):
+                try:
+                    write_all(dst, data)
+                except BrokenPipeError:
+                    # A reader went away; keep feeding the others
+                    dsts.remove(dst)
+        if self.capture:
+            self.data = b''.join(chunks)
@@ -0,0 +1,191 @@
+"""
+resultcache.py - Opt-in cache of command results for the advanced Python shell.
+
+    cache [--ttl SECONDS] [--input PATH]... [--env NAME]... [--all] [--refresh] -- command args...
+    cache --stats | --clear
+
+The command's stdout, stderr and exit status are stored on disk, keyed by
+its argv, the working directory, the named environment variables and the
+size/mtime of each declared input file or directory. A repeated call with
+the same key is answered from the store without spawning anything.
+Commands matching a CACHE_COMMANDS pattern in ~/.myshellrc are cached
+without the prefix. Only successful runs are kept unless --all is given.
+"""
+import os
+import sys
+import time
+import fnmatch
+from diskcache import DiskCache, cache_home
+from nodes import Command, Pipeline
+from pump import write_all
+from spawn import DEVNULL
+from utils import SHELL_VERSION
+
+USAGE = ("Usage: cache [--ttl SECONDS] [--input PATH]... [--env NAME]... [--all] [--refresh] -- command [args...]\n"
+         "       cache --stats | --clear")
+
+class CacheUsage(ValueError):
+    """Raised for bad cache options."""
+
+def parse_options(args):
+    """Split the cache builtin's argv into (options dict, command argv)."""
+    options = {'ttl': None, 'inputs': [], 'env': [], 'all': False, 'refresh': False,
+               'stats': False, 'clear': False}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--':
+            i += 1
+            break
+        if not arg.startswith('-'):
+            break
+        if arg in ('--ttl', '--input', '--env'):
+            i += 1
+            if i >= len(args):
+                raise CacheUsage(f"cache: {arg} needs a value")
+            value = args[i]
+            if arg == '--ttl':
+                try:
+                    options['ttl'] = float(value)
+                except ValueError:
+                    raise CacheUsage(f"cache: invalid ttl '{value}'") from None
+            else:
+                options['inputs' if arg == '--input' else 'env'].append(value)
+        elif arg in ('--all', '--refresh', '--stats', '--clear'):
+            options[arg[2:]] = True
+        else:
+            raise CacheUsage(f"cache: unknown option {arg}")
+        i += 1
+    return options, args[i:]
+
+def _input_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size, st.st_ino)
+
+class ResultCache:
+    """Stores command results in a DiskCache (LRU by access time, size-capped, with TTLs)."""
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024, ttl=3600, patterns=()):
+        self.store = DiskCache(directory or os.path.join(cache_home(), 'results'), max_bytes)
+        self.ttl = ttl
+        self.patterns = list(patterns)
+        self.hits = 0
+        self.misses = 0
+    def key(self, argv, inputs=(), env=()):
+        import hashlib
+        parts = [SHELL_VERSION, os.getcwd(), repr(list(argv)),
+                 repr(sorted((name, os.environ.get(name)) for name in env)),
+                 repr([_input_state(path) for path in inputs])]
+        return hashlib.sha256('\0'.join(parts).encode('utf-8', 'surrogateescape')).hexdigest()
+    def matches(self, argv):
+        """True if a CACHE_COMMANDS pattern covers this command line."""
+        if not self.patterns:
+            return False
+        line = ' '.join(argv)
+        return any(fnmatch.fnmatchcase(line, pattern) for pattern in self.patterns)
+    def get(self, key):
+        """The cached (status, stdout, stderr), or None if missing or expired."""
+        data = self.store.get(key)
+        if data is None:
+            return None
+        import pickle
+        try:
+            entry = pickle.loads(data)
+        except Exception:
+            self.store.delete(key)
+            return None
+        if entry['expires'] is not None and entry['expires'] < time.time():
+            self.store.delete(key)
+            return None
+        return entry['status'], entry['stdout'], entry['stderr']
+    def put(self, key, status, stdout, stderr, ttl=None):
+        import pickle
+        ttl = self.ttl if ttl is None else ttl
+        entry = {'status': status, 'stdout': stdout, 'stderr': stderr,
+                 'expires': time.time() + ttl if ttl > 0 else None}
+        return self.store.put(key, pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+    def run(self, argv, executor, stdout=1, stderr=2, ttl=None, inputs=(), env=(),
+            cache_failures=False, refresh=False):
+        """Replay argv's result from the cache, or run it and store the result. Returns the status."""
+        key = self.key(argv, inputs, env)
+        cached = None if refresh else self.get(key)
+        sys.stdout.flush()
+        if cached is not None:
+            self.hits += 1
+            status, out, err = cached
+            _replay(out, stdout)
+            _replay(err, stderr)
+            return status
+        self.misses += 1
+        import tempfile
+        # stdin is not part of the key, so the command gets none
+        with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err, \
+                open(os.devnull, 'rb') as devnull:
+            status, _ = executor.execute(Pipeline([Command(list(argv))]), stdout=out.fileno(),
+                                         stderr=err.fileno(), stdin=devnull.fileno())
+            out.seek(0)
+            err.seek(0)
+            out_data = out.read()
+            err_data = err.read()
+        _replay(out_data, stdout)
+        _replay(err_data, stderr)
+        if status == 0 or cache_failures:
+            self.put(key, status, out_data, err_data, ttl)
+        return status
+    def report(self):
+        entries = self.store.entries()
+        size = sum(s for _, s, _ in entries)
+        return (f"result cache: {self.hits} hits, {self.misses} misses; "
+                f"{len(entries)} entries, {size} bytes in {self.store.directory}")
+
+def _replay(data, fd):
+    if data:
+        try:
+            write_all(fd, data)
+        except BrokenPipeError:
+            pass
+
+def run_cache_builtin(cmd, executor, cache):
+    """The cache builtin: cmd is its parsed Command (redirections apply to the cached output)."""
+    try:
+        options, argv = parse_options(cmd.args[1:])
+    except CacheUsage as e:
+        print(e)
+        return 2
+    if options['stats']:
+        print(cache.report())
+        return 0
+    if options['clear']:
+        cache.store.clear()
+        return 0
+    if not argv:
+        print(USAGE)
+        return 2
+    return _run_redirected(cmd, argv, executor, cache, options)
+
+def run_matching(cmd, executor, cache):
+    """Run a command matched by a CACHE_COMMANDS pattern through the cache."""
+    return _run_redirected(cmd, cmd.args, executor, cache, parse_options([])[0])
+
+def _run_redirected(cmd, argv, executor, cache, options):
+    fds = {0: None, 1: None, 2: None}
+    opened_fds = []
+    try:
+        executor.apply_redirects(cmd, fds, opened_fds)
+        for target, fd in fds.items():
+            if fd == DEVNULL:
+                fds[target] = os.open(os.devnull, os.O_RDWR)
+                opened_fds.append(fds[target])
+        return cache.run(argv, executor,
+                         stdout=fds[1] if fds[1] is not None else 1,
+                         stderr=fds[2] if fds[2] is not None else 2,
+                         ttl=options['ttl'], inputs=options['inputs'], env=options['env'],
+                         cache_failures=options['all'], refresh=options['refresh'])
+    except OSError as e:
+        print(f"cache: {e}")
+        return 1
+    finally:
+        for fd in opened_fds:
+            os.close(fd)
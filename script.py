@@ -0,0 +1,903 @@
+"""
+script.py - Script parser and in-process interpreter for the advanced Python shell.
+"""
+import os
+import re
+import sys
+import shlex
+import fnmatch
+import threading
+from parser import CommandParser, GLOB_CHARS_RE
+from lexer import unquote, tokenize, substitution_end, glob_pattern, WORD
+from executor import CommandExecutor
+from shell_builtins import Builtins, exit_status
+from nodes import Command as SimpleCommand, Pipeline, ListNode, Block, FunctionDef, Subshell, Assignment, Redirect
+from parallel import run_parallel
+from resultcache import ResultCache, run_cache_builtin, run_matching
+import coreutils
+from tracing import TRACER
+from accounting import Timer
+from pump import Capture
+from variables import VariableStore
+from globbing import Globber, NoMatch
+import heredoc
+
+
+class ScriptSyntaxError(Exception):
+    """Raised when a script cannot be parsed."""
+
+class IncompleteScript(ScriptSyntaxError):
+    """Raised when the input ends inside an unfinished block (more lines needed)."""
+
+
+# ========== Script AST ==========
+class Command:
+    __slots__ = ('line', 'parsed', 'heredocs')
+    def __init__(self, line, parsed=None, heredocs=None):
+        self.line = line
+        self.parsed = parsed            # parsed form, None if it has a syntax error
+        self.heredocs = heredocs        # bodies of its here-documents, in order (see heredoc.py)
+
+class If:
+    __slots__ = ('clauses', 'else_body')
+    def __init__(self, clauses, else_body):
+        self.clauses = clauses          # [(condition nodes, body nodes), ...]
+        self.else_body = else_body
+
+class For:
+    __slots__ = ('var', 'words', 'body')
+    def __init__(self, var, words, body):
+        self.var = var
+        self.words = words              # unexpanded word list text, or None for "$@"
+        self.body = body
+
+class While:
+    __slots__ = ('condition', 'body', 'until')
+    def __init__(self, condition, body, until=False):
+        self.condition = condition
+        self.body = body
+        self.until = until
+
+class Case:
+    __slots__ = ('word', 'items')
+    def __init__(self, word, items):
+        self.word = word
+        self.items = items              # [(patterns, body nodes), ...]
+
+class Function:
+    __slots__ = ('name', 'body')
+    def __init__(self, name, body):
+        self.name = name
+        self.body = body
+
+
+# ========== Script Parser ==========
+FUNC_RE = re.compile(r'^(?:function\s+([A-Za-z_][\w.-]*)\s*(?:\(\s*\))?|([A-Za-z_][\w.-]*)\s*\(\s*\))\s*(\{)?(.*)$', re.S)
+CASE_RE = re.compile(r'^case\s+(\S+)\s+in\b(.*)$', re.S)
+OPENERS = ('if', 'elif', 'while', 'until', 'then', 'do', 'else', '{')
+CLOSERS = ('fi', 'done', 'esac', '}')
+
+def split_statements(line):
+    """Split a source line on unquoted ';' outside parentheses (keeping ';;') and drop comments."""
+    parts = []
+    buf = []
+    quote = None
+    depth = 0
+    i = 0
+    n = len(line)
+    while i < n:
+        c = line[i]
+        if quote:
+            buf.append(c)
+            if c == '\\' and quote == '"' and i + 1 < n:
+                buf.append(line[i+1])
+                i += 1
+            elif c == quote:
+                quote = None
+        elif c == '\\' and i + 1 < n:
+            buf.append(line[i:i+2])
+            i += 1
+        elif c in '"\'':
+            quote = c
+            buf.append(c)
+        elif c == '#' and (not buf or buf[-1] in ' \t'):
+            break
+        elif c in '()':
+            # Subshells, $(...) and <(...) keep their ';'; a case pattern's lone ')' is not a close
+            depth = depth + 1 if c == '(' else max(0, depth - 1)
+            buf.append(c)
+        elif c == ';' and depth == 0:
+            parts.append(''.join(buf).strip())
+            buf = []
+            if line.startswith(';;', i):
+                parts.append(';;')
+                i += 1
+        else:
+            buf.append(c)
+        i += 1
+    parts.append(''.join(buf).strip())
+    return [p for p in parts if p]
+
+def first_word(text):
+    return text.split(None, 1)[0] if text.strip() else ''
+
+
+class ScriptParser:
+    """Parses shell script source into a tree of script nodes."""
+    def __init__(self, command_parser=None):
+        self.command_parser = command_parser or CommandParser()
+    def _command(self, line, heredocs=None):
+        """A Command node, parsed once, here; its words are expanded each time it runs."""
+        try:
+            parsed = self.command_parser.parse(line)
+        except ValueError:
+            # Reported when the line runs
+            return Command(line, None, heredocs)
+        if heredocs:
+            heredoc.attach(parsed, heredocs)
+        return Command(line, parsed, heredocs)
+    def parse(self, source):
+        self.tokens = []
+        self.heredocs = {}      # token index -> here-document bodies of that command
+        lines = iter(source.splitlines())
+        next_line = lambda: next(lines, None)
+        for line in lines:
+            for stmt in split_statements(line):
+                # Here-document bodies follow the line, in the order of their operators
+                self._bodies = [self._read_body(op, raw, next_line) for op, raw in heredoc.delimiters(stmt)]
+                self._classify(stmt)
+        self.pos = 0
+        nodes, _ = self._parse_block(())
+        return nodes
+    def _classify(self, stmt):
+        m = FUNC_RE.match(stmt)
+        if m:
+            self.tokens.append(('func', m.group(1) or m.group(2)))
+            if m.group(3):
+                self.tokens.append(('kw', '{'))
+            if m.group(4).strip():
+                self._classify(m.group(4).strip())
+            return
+        word = first_word(stmt)
+        if word in OPENERS:
+            self.tokens.append(('kw', word))
+            rest = stmt[len(word):].strip()
+            if rest:
+                self._classify(rest)
+        elif word in CLOSERS and stmt == word:
+            self.tokens.append(('kw', word))
+        elif stmt == ';;':
+            self.tokens.append(('kw', ';;'))
+        elif word == 'case':
+            # Items may follow "case WORD in" on the same line
+            m = CASE_RE.match(stmt)
+            if not m:
+                raise ScriptSyntaxError(f"syntax error in '{stmt}': expected 'case WORD in'")
+            self.tokens.append(('case', m.group(1)))
+            if m.group(2).strip():
+                self._classify(m.group(2).strip())
+        elif word == 'for':
+            self.tokens.append(('for', stmt))
+        else:
+            if self._bodies:
+                self.heredocs[len(self.tokens)] = self._bodies
+                self._bodies = None
+            self.tokens.append(('cmd', stmt))
+    def _read_body(self, op, raw, next_line):
+        body = heredoc.read_body(op, raw, next_line)
+        if body is None:
+            raise IncompleteScript(f"unexpected end of script: expected '{unquote(raw)}'")
+        return body
+    def _next(self, what):
+        if self.pos >= len(self.tokens):
+            raise IncompleteScript(f"unexpected end of script: expected '{what}'")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+    def _expect(self, keyword):
+        kind, text = self._next(keyword)
+        if kind != 'kw' or text != keyword:
+            raise ScriptSyntaxError(f"syntax error near '{text}': expected '{keyword}'")
+    def _parse_block(self, terminators):
+        """Parse nodes until one of the terminator keywords; returns (nodes, terminator)."""
+        nodes = []
+        while True:
+            if self.pos >= len(self.tokens):
+                if terminators:
+                    raise IncompleteScript(f"unexpected end of script: expected '{terminators[0]}'")
+                return nodes, None
+            kind, text = self.tokens[self.pos]
+            self.pos += 1
+            if kind == 'kw' and text in terminators:
+                return nodes, text
+            if kind == 'cmd':
+                nodes.append(self._command(text, self.heredocs.get(self.pos - 1)))
+            elif kind == 'kw' and text == 'if':
+                nodes.append(self._parse_if())
+            elif kind == 'kw' and text in ('while', 'until'):
+                condition, _ = self._parse_block(('do',))
+                body, _ = self._parse_block(('done',))
+                nodes.append(While(condition, body, until=(text == 'until')))
+            elif kind == 'for':
+                nodes.append(self._parse_for(text))
+            elif kind == 'case':
+                nodes.append(self._parse_case(text))
+            elif kind == 'func':
+                self._expect('{')
+                body, _ = self._parse_block(('}',))
+                nodes.append(Function(text, body))
+            else:
+                raise ScriptSyntaxError(f"syntax error near unexpected token '{text}'")
+    def _parse_if(self):
+        clauses = []
+        else_body = []
+        while True:
+            condition, _ = self._parse_block(('then',))
+            body, term = self._parse_block(('fi', 'elif', 'else'))
+            clauses.append((condition, body))
+            if term == 'else':
+                else_body, _ = self._parse_block(('fi',))
+                break
+            if term == 'fi':
+                break
+        return If(clauses, else_body)
+    def _parse_for(self, text):
+        words = text.split(None, 3)
+        if len(words) < 2:
+            raise ScriptSyntaxError(f"syntax error in '{text}'")
+        var = words[1]
+        values = None
+        if len(words) > 2:
+            if words[2] != 'in':
+                raise ScriptSyntaxError(f"syntax error in '{text}': expected 'in'")
+            values = words[3] if len(words) > 3 else ''
+        self._expect('do')
+        body, _ = self._parse_block(('done',))
+        return For(var, values, body)
+    def _parse_case(self, word):
+        items = []
+        while True:
+            kind, stmt = self._next('esac')
+            if kind == 'kw' and stmt == 'esac':
+                break
+            if kind != 'cmd' or ')' not in stmt:
+                raise ScriptSyntaxError(f"syntax error in case item '{stmt}'")
+            pattern, rest = stmt.split(')', 1)
+            patterns = [p.strip() for p in pattern.strip().lstrip('(').split('|')]
+            if rest.strip():
+                self.pos -= 1
+                self.tokens[self.pos] = ('cmd', rest.strip())
+            body, term = self._parse_block((';;', 'esac'))
+            items.append((patterns, body))
+            if term == 'esac':
+                break
+        return Case(word, items)
+
+
+# ========== Script Interpreter ==========
+class BreakLoop(Exception):
+    pass
+
+class ContinueLoop(Exception):
+    pass
+
+class ReturnFromFunction(Exception):
+    def __init__(self, status):
+        self.status = status
+
+# $NAME, or ${NAME}, ${#NAME} (its length) and ${NAME:-word}, ${NAME:=word}, ${NAME:+word} (also without ':')
+VAR_RE = re.compile(r'\$(?:\{(#?)([A-Za-z_]\w*|[0-9]+|[?#@])(?:(:?[-=+])([^}]*))?\}|([A-Za-z_]\w*|[0-9?#@]))')
+# In an unquoted here-document: \$, \`, \\, a backslash-newline, a substitution, or a $ (VAR_RE decides)
+HEREDOC_RE = re.compile(r'\\([$`\\])|\\\n|\$\((?!\()|`|\$')
+# Backslashes that quote \, ` and $ inside `...`
+BACKTICK_ESCAPE_RE = re.compile(r'\\([\\`$])')
+ASSIGN_RE = re.compile(r'^([A-Za-z_]\w*)=(.*)$', re.S)
+
+class ScriptInterpreter:
+    """Runs parsed scripts in-process through the shell's parser, builtins and executor."""
+    def __init__(self, parser=None, executor=None, builtins=None, jobcontrol=None, custom_commands=None):
+        self.parser = parser or CommandParser()
+        self.executor = executor or CommandExecutor()
+        self.builtins = builtins or Builtins()
+        self.jobcontrol = jobcontrol
+        self.custom_commands = custom_commands if custom_commands is not None else {}
+        self.script_parser = ScriptParser(self.parser)
+        self.script_cache = None
+        self.result_cache = None    # created on first use of the cache builtin
+        self.hooks = None           # the interactive shell's HookManager
+        self.capture_limit = None   # most bytes a command substitution keeps (CAPTURE_LIMIT)
+        self.variables = VariableStore()
+        self.globber = Globber()
+        self.functions = {}
+        self.positional = []
+        self.last_status = 0
+        self.substitution_status = 0    # of the last $(...) in the words being expanded
+        self._parse_cache = {}
+        self.executor.list_runner = self.run_in_child
+        self.executor.heredoc_expander = self.expand_heredoc
+        # One store: export, unset and local change it, and the executor spawns with its environment
+        self.builtins.variables = self.executor.variables = self.variables
+    # ----- entry points -----
+    def run_file(self, path, args=()):
+        if self.script_cache is not None:
+            with TRACER.span('parse', script=path):
+                nodes = self.script_cache.load(path, self.script_parser)
+        else:
+            with open(path) as f, TRACER.span('parse', script=path):
+                nodes = self.script_parser.parse(f.read())
+        self.positional = list(args)
+        return self.run_nodes(nodes)
+    def run_source(self, source):
+        with TRACER.span('parse'):
+            nodes = self.script_parser.parse(source)
+        return self.run_nodes(nodes)
+    def run_nodes(self, nodes):
+        """Run top-level script nodes (break/continue/return outside their scope just stop)."""
+        try:
+            return self.run(nodes)
+        except (BreakLoop, ContinueLoop):
+            return self.last_status
+        except ReturnFromFunction as r:
+            self.last_status = r.status
+            return r.status
+    def run(self, nodes):
+        status = self.last_status
+        for node in nodes:
+            status = self.execute_node(node)
+        return status
+    # ----- nodes -----
+    def execute_node(self, node):
+        if isinstance(node, Command):
+            if node.parsed is not None:
+                status = self.run_parsed(node.parsed)
+            else:
+                status = self.run_line(node.line, node.heredocs)
+        elif isinstance(node, If):
+            status = 0
+            for condition, body in node.clauses:
+                if self.run(condition) == 0:
+                    status = self.run(body)
+                    break
+            else:
+                status = self.run(node.else_body)
+        elif isinstance(node, For):
+            status = 0
+            if node.words is None:
+                values = list(self.positional)
+            else:
+                try:
+                    values = self.split_words(self.expand(node.words))
+                except NoMatch as e:
+                    print(f"myshell: no match: {e}", file=sys.stderr)
+                    values = []
+                    status = 1
+                except ValueError as e:
+                    print(f"myshell: syntax error in 'for {node.var} in {node.words}': {e}", file=sys.stderr)
+                    values = []
+                    status = 2
+            for value in values:
+                self.variables.set(node.var, value)
+                try:
+                    status = self.run(node.body)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        elif isinstance(node, While):
+            status = 0
+            while (self.run(node.condition) == 0) != node.until:
+                try:
+                    status = self.run(node.body)
+                except BreakLoop:
+                    break
+                except ContinueLoop:
+                    continue
+        elif isinstance(node, Case):
+            status = 0
+            try:
+                word = ' '.join(self.fields(node.word))
+                matched = next((body for patterns, body in node.items
+                                if any(fnmatch.fnmatchcase(word, ' '.join(self.fields(p))) for p in patterns)), None)
+            except ValueError as e:
+                print(f"myshell: syntax error in 'case {node.word}': {e}", file=sys.stderr)
+                status = 2
+            else:
+                if matched is not None:
+                    status = self.run(matched)
+        elif isinstance(node, Function):
+            self.functions[node.name] = node
+            status = 0
+        else:
+            raise ScriptSyntaxError(f"unknown node {node!r}")
+        self.last_status = status
+        return status
+    def call_function(self, func, args):
+        saved = self.positional
+        self.positional = list(args)
+        self.variables.push_scope()
+        try:
+            status = self.run(func.body)
+        except ReturnFromFunction as r:
+            status = r.status
+        finally:
+            self.variables.pop_scope()
+            self.positional = saved
+        return status
+    # ----- variables -----
+    def lookup(self, name):
+        if name == '?':
+            return str(self.last_status)
+        if name == '#':
+            return str(len(self.positional))
+        if name == '@':
+            return ' '.join(self.positional)
+        if name.isdigit():
+            idx = int(name)
+            if idx == 0:
+                return 'myshell'
+            return self.positional[idx-1] if idx <= len(self.positional) else ''
+        return self.variables.get(name, '')
+    def is_set(self, name):
+        if name.isdigit():
+            return 0 < int(name) <= len(self.positional) or name == '0'
+        return name in '?#@' or name in self.variables
+    def parameter(self, m):
+        """The value of a VAR_RE match."""
+        length, name, op, word, bare = m.groups()
+        if bare:
+            return self.lookup(bare)
+        value = self.lookup(name)
+        if length:
+            return str(len(value))
+        if not op:
+            return value
+        # Without ':' only an unset NAME counts as missing; with it an empty one does too
+        missing = not value if op[0] == ':' else not self.is_set(name)
+        if op[-1] == '+':
+            return '' if missing else self.expand_word(word)
+        if not missing:
+            return value
+        value = self.expand_word(word)
+        if op[-1] == '=' and not name.isdigit() and name not in '?#@':
+            self.variables.set(name, value)
+        return value
+    def expand_word(self, word):
+        """The word of ${NAME:-word}: expanded and unquoted."""
+        word = self.expand(word)
+        try:
+            return ' '.join(shlex.split(word))
+        except ValueError:
+            return word
+    def expand(self, text, split=True):
+        """Expand $VAR, ${VAR}, $?, $#, $@, $N, $(...) and `...` outside single quotes.
+
+        Unquoted values are split into fields unless split is False (an
+        assignment value), where they are kept whole, as if double-quoted.
+        """
+        if '$' not in text and '`' not in text:
+            return text
+        out = []
+        quote = None
+        i = 0
+        n = len(text)
+        while i < n:
+            c = text[i]
+            if c == '\\' and quote != "'" and i + 1 < n:
+                out.append(text[i:i+2])
+                i += 2
+                continue
+            if c == "'" and quote != '"':
+                quote = None if quote == "'" else "'"
+            elif c == '"' and quote != "'":
+                quote = None if quote == '"' else '"'
+            elif c in '$`' and quote != "'":
+                if c == '`' or text.startswith('$(', i) and not text.startswith('$((', i):
+                    found = self._substitution(text, i)
+                    if found is not None:
+                        i, value = found
+                        out.append(self._quote(value, quote, split))
+                        continue
+                else:
+                    m = VAR_RE.match(text, i)
+                    if m:
+                        out.append(self._quote(self.parameter(m), quote, split))
+                        i = m.end()
+                        continue
+            out.append(c)
+            i += 1
+        return ''.join(out)
+    def _quote(self, value, quote, split=True):
+        """value as text that parses back to it: escaped inside double quotes, else one quoted word per field."""
+        if quote == '"':
+            return re.sub(r'(["\\\\$`])', r'\\\1', value)
+        if not split:
+            return shlex.quote(value)
+        return ' '.join(shlex.quote(w) for w in value.split())
+    def _substitution(self, text, i):
+        """Run the $(...) or `...` at text[i]. Returns (its end, its output), or None if it is unterminated."""
+        try:
+            end = substitution_end(text, i)
+        except ValueError:
+            return None
+        if text[i] == '$':
+            body = text[i+2:end-1]
+        else:
+            body = BACKTICK_ESCAPE_RE.sub(r'\1', text[i+1:end-1])
+        return end, self.command_substitution(body)
+    def command_substitution(self, body):
+        """Run body as $(body) does; returns its output without trailing newlines.
+
+        It runs in this process with fd 1 on a pipe, which a thread drains
+        in 1 MiB reads, so builtins and functions need no fork and external
+        commands write straight into the pipe. Variables, functions, the
+        environment and the working directory are put back afterwards, as
+        if it had been a subshell. Past capture_limit bytes the output is
+        read and dropped.
+        """
+        capture = Capture(self.capture_limit)
+        read_end, write_end = os.pipe()
+        reader = threading.Thread(target=capture.drain, args=(read_end,), daemon=True)
+        reader.start()
+        saved = self._save_state()
+        sys.stdout.flush()
+        stdout = os.dup(1)
+        os.dup2(write_end, 1)
+        os.close(write_end)
+        status = 1
+        try:
+            with TRACER.span('substitution'):
+                status = self.run_source(body)
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        except ScriptSyntaxError as e:
+            print(f"Syntax error: {e}", file=sys.stderr)
+            status = 2
+        finally:
+            sys.stdout.flush()
+            os.dup2(stdout, 1)
+            os.close(stdout)
+            self._restore_state(saved)
+            # Waits for background jobs the body started, as they hold the pipe too
+            reader.join()
+            os.close(read_end)
+        if capture.truncated:
+            print(f"myshell: command substitution: output cut at {self.capture_limit} bytes", file=sys.stderr)
+        self.last_status = self.substitution_status = status
+        return os.fsdecode(capture.data).rstrip('\n')
+    def _save_state(self):
+        try:
+            cwd = os.getcwd()
+        except OSError:
+            cwd = None
+        return self.variables.snapshot(), dict(self.functions), self.positional, cwd
+    def _restore_state(self, saved):
+        variables, self.functions, self.positional, cwd = saved
+        self.variables.restore(variables)
+        if cwd is not None:
+            try:
+                if os.getcwd() != cwd:
+                    os.chdir(cwd)
+            except OSError:
+                os.chdir(cwd)
+    def fields(self, text):
+        """text expanded and split into unquoted words, without globbing. Raises ValueError on bad quoting."""
+        return [tok.value for tok in tokenize(self.expand(text))]
+    def split_words(self, text):
+        """Split expanded text into unquoted words, with the patterns among them expanded (see globbing.py)."""
+        if self.globber.noglob or not GLOB_CHARS_RE.search(text):
+            return [tok.value for tok in tokenize(text)]
+        words = []
+        for tok in tokenize(text):
+            pattern = glob_pattern(tok.raw) if tok.kind == WORD else None
+            if pattern is None:
+                words.append(tok.value)
+            else:
+                words.extend(self.globber.expand(pattern))
+        return words
+    def expand_heredoc(self, text):
+        """Expand an unquoted here-document body: variables and substitutions, with a backslash quoting $, `, \\ and newline."""
+        if '$' not in text and '\\' not in text and '`' not in text:
+            return text
+        out = []
+        pos = 0
+        for m in HEREDOC_RE.finditer(text):
+            if m.start() < pos:
+                continue    # inside a substitution already run
+            out.append(text[pos:m.start()])
+            pos = m.end()
+            if m.group(0) in ('$(', '`'):
+                found = self._substitution(text, m.start())
+                if found is not None:
+                    pos, value = found
+                    out.append(value)
+                else:
+                    out.append(m.group(0))
+            elif m.group(1) is not None:
+                out.append(m.group(1))
+            elif m.group(0) == '$':
+                var = VAR_RE.match(text, m.start())
+                if var:
+                    out.append(self.parameter(var))
+                    pos = var.end()
+                else:
+                    out.append('$')
+        out.append(text[pos:])
+        return ''.join(out)
+    # ----- commands -----
+    def parse(self, line):
+        parsed = self._parse_cache.get(line)
+        if parsed is None:
+            if len(self._parse_cache) >= 1024:
+                self._parse_cache.clear()
+            parsed = self._parse_cache[line] = self.parser.parse(line)
+        return parsed
+    def assign(self, line):
+        """Handle a NAME=value line as a shell variable assignment. Returns True if it was one."""
+        m = ASSIGN_RE.match(line.strip())
+        if not m:
+            return False
+        try:
+            if len(tokenize(m.group(2))) > 1:
+                return False
+            # $? is 0, or the status of the last command substitution in the value
+            self.substitution_status = 0
+            self.variables.set(m.group(1), self.expand_value(m.group(2)))
+        except ValueError:
+            return False
+        self.last_status = self.substitution_status
+        return True
+    def run_line(self, line, heredocs=None):
+        """Parse and run one command line (with the bodies of its here-documents). Returns its exit status.
+
+        Words are expanded pipeline by pipeline as they run (expand_words),
+        so `x=5 && echo $x` sees the new x, and a skipped item's $(...) never runs.
+        """
+        if not heredocs and self.assign(line):
+            return self.last_status
+        try:
+            with TRACER.span('parse'):
+                if heredocs:
+                    # A fresh tree: the cached one may belong to another command's bodies
+                    parsed = self.parser.parse(line)
+                    heredoc.attach(parsed, heredocs)
+                else:
+                    parsed = self.parse(line)
+        except ValueError as e:
+            print(f"Parse error: {e}")
+            self.last_status = 2
+            return 2
+        return self.run_parsed(parsed)
+    def run_parsed(self, parsed, run_in_bg=False):
+        """Run a parsed command line in-process if possible, else through the executor."""
+        self.substitution_status = 0
+        try:
+            parsed = self.expand_words(parsed)
+        except NoMatch as e:
+            print(f"myshell: no match: {e}", file=sys.stderr)
+            self.last_status = 1
+            return 1
+        except ValueError as e:
+            print(f"myshell: {e}", file=sys.stderr)
+            self.last_status = 2
+            return 2
+        if run_in_bg:
+            status = None
+            if TRACER.xtrace and isinstance(parsed, Pipeline):
+                TRACER.xtrace_pipeline(parsed)
+        else:
+            with TRACER.span('dispatch'):
+                status = self.dispatch(parsed)
+        if status is None:
+            procs = []
+            with TRACER.span('execute', command=getattr(parsed, 'text', '') or None):
+                status, process = self.executor.execute(parsed, run_in_bg=run_in_bg, procs=procs)
+            if run_in_bg and process is not None and self.jobcontrol is not None:
+                self.jobcontrol.add_job(process, getattr(parsed, 'text', '') or ' '.join(parsed['pipeline'][0]['args']), procs)
+        self.last_status = status
+        return status
+    def expand_words(self, parsed):
+        """A Pipeline about to run, with its words expanded: parameters, substitutions, fields and patterns.
+
+        The parsed tree is cached and shared, so the expanded commands are
+        new nodes. Raises NoMatch (failglob) or ValueError (bad quoting).
+        """
+        if not isinstance(parsed, Pipeline) or not any(cmd.expansions or getattr(cmd, 'globs', None)
+                                                       for cmd in parsed.commands):
+            return parsed
+        with TRACER.span('expand'):
+            commands = [self.expand_command(cmd) for cmd in parsed.commands]
+        return Pipeline(commands, parsed.negate)
+    def expand_command(self, cmd):
+        if isinstance(cmd, Subshell):
+            if not cmd.expansions:
+                return cmd
+            return Subshell(cmd.body, self._expand_redirects(cmd, {id(r): raw for r, raw in cmd.expansions}))
+        if not cmd.expansions:
+            return self.globber.command(cmd)
+        expansions = {where if isinstance(where, int) else id(where): raw for where, raw in cmd.expansions}
+        globs = {} if self.globber.noglob else dict(cmd.globs)
+        args = []
+        where = {}
+        try:
+            for i, arg in enumerate(cmd.args):
+                where[i] = len(args)
+                raw = expansions.get(i)
+                if raw is not None:
+                    args.extend(self.split_words(self.expand(raw)))
+                elif i in globs:
+                    args.extend(self.globber.expand(globs[i]))
+                else:
+                    args.append(arg)
+        finally:
+            self.globber.forget()
+        assignments = [a if id(a) not in expansions else Assignment(a.name, self.expand_value(expansions[id(a)]))
+                       for a in cmd.assignments]
+        substitutions = [(where[w] if isinstance(w, int) else w, p) for w, p in cmd.substitutions]
+        return SimpleCommand(args, self._expand_redirects(cmd, expansions), assignments, substitutions)
+    def _expand_redirects(self, node, expansions):
+        return [r if id(r) not in expansions else Redirect(r.fd, r.op, self.expand_value(expansions[id(r)]), r.body)
+                for r in node.redirects]
+    def expand_value(self, raw):
+        """An assignment value or redirection target: expanded and unquoted, as one word, without field splitting."""
+        return unquote(self.expand(raw, split=False))
+    def run_list(self, node):
+        """Run a ListNode, honouring ';', '&', '&&' and '||'."""
+        status = self.last_status
+        skip = False
+        for item, op in node.items:
+            if not skip:
+                status = self.run_parsed(item, run_in_bg=(op == '&'))
+            # Decide whether the next item runs
+            if op == '&&':
+                skip = status != 0
+            elif op == '||':
+                skip = status == 0
+            else:
+                skip = False
+        return status
+    def run_in_child(self, body):
+        """Run a subshell body; called by the executor inside the forked child."""
+        if isinstance(body, (Block, FunctionDef)):
+            return self.run_source(body.text)
+        return self.run_parsed(body)
+    def dispatch(self, parsed):
+        """Run lists, script control words, functions, plugin commands and builtins in-process.
+
+        Returns the exit status, or None when the command should go to the executor.
+        """
+        if isinstance(parsed, ListNode):
+            return self.run_list(parsed)
+        if isinstance(parsed, Pipeline) and parsed.commands:
+            first = parsed.commands[0]
+            if isinstance(first, SimpleCommand) and first.args[:1] == ['time']:
+                return self.time_pipeline(parsed)
+        if TRACER.xtrace and isinstance(parsed, Pipeline):
+            TRACER.xtrace_pipeline(parsed)
+        if isinstance(parsed, Pipeline) and parsed.commands and not parsed.negate:
+            last = parsed.commands[-1]
+            if isinstance(last, SimpleCommand) and last.args and last.args[0] == 'parallel':
+                return run_parallel(parsed, self.executor, self.parser, self.expand_words)
+        if not isinstance(parsed, Pipeline) or len(parsed.commands) != 1:
+            return None
+        cmd = parsed.commands[0]
+        if not isinstance(cmd, SimpleCommand) or not cmd.args:
+            if isinstance(cmd, SimpleCommand) and cmd.assignments and not cmd.redirects:
+                for a in cmd.assignments:
+                    self.variables.set(a.name, a.value)
+                # $? is 0, or the status of the last command substitution in the values
+                return self.substitution_status
+            return None
+        args = cmd.args
+        name = args[0]
+        if name == 'break':
+            raise BreakLoop()
+        if name == 'continue':
+            raise ContinueLoop()
+        if name == 'return':
+            raise ReturnFromFunction(exit_status('return', args[1:], self.last_status))
+        if name == 'exit':
+            # A bare exit uses $?; SystemExit becomes the process's exit code
+            raise SystemExit(exit_status('exit', args[1:], self.last_status))
+        if name == 'wait':
+            self.wait_all()
+            return 0
+        if name in self.functions:
+            return self.call_function(self.functions[name], args[1:])
+        # Plugin custom commands
+        if name in self.custom_commands:
+            self.custom_commands[name](*args[1:])
+            return 0
+        if name == 'cache':
+            if self.result_cache is None:
+                self.result_cache = ResultCache()
+            return run_cache_builtin(cmd, self.executor, self.result_cache)
+        if name == 'set':
+            return self.set_options(args[1:])
+        if name == 'shopt':
+            return self.globber.builtin(args[1:])
+        if name == 'trace':
+            return TRACER.builtin(args[1:])
+        if name == 'stats':
+            if self.executor.stats is None:
+                print("stats: resource accounting is off (STATS=off)")
+                return 1
+            return self.executor.stats.builtin(args[1:])
+        if name == 'hooks' and self.hooks is not None:
+            return self.hooks.builtin(args[1:])
+        if name == 'enable':
+            return self.enable(args[1:])
+        # Job control builtins ("fg", "fg 2", "fg %2"; no argument means the newest job)
+        if self.jobcontrol is not None and name in ('jobs', 'fg', 'bg', 'disown'):
+            if name == 'jobs':
+                self.jobcontrol.list_jobs()
+                return 0
+            return getattr(self.jobcontrol, name)(args[1] if len(args) > 1 else None)
+        # Built-in dispatch
+        status = self.builtins.dispatch(parsed, custom_commands=self.custom_commands)
+        if status is not None:
+            return status
+        # Commands the configuration marks as cacheable (CACHE_COMMANDS)
+        if self.result_cache is not None and not cmd.assignments and self.result_cache.matches(args):
+            return run_matching(cmd, self.executor, self.result_cache)
+        return None
+    def time_pipeline(self, parsed):
+        """time [-p] pipeline: run it, then report its real, user and sys time on stderr."""
+        first = parsed.commands[0]
+        args = first.args[1:]
+        posix = args[:1] == ['-p']
+        if posix:
+            args = args[1:]
+        commands = [SimpleCommand(args, first.redirects, first.assignments)] + parsed.commands[1:]
+        timer = Timer()
+        status = 0
+        if args or len(commands) > 1:
+            status = self.run_parsed(Pipeline(commands, parsed.negate))
+        sys.stdout.flush()
+        sys.stderr.write(timer.report(posix))
+        sys.stderr.flush()
+        return status
+    def set_options(self, args):
+        """set -x / +x (or -o / +o xtrace) and -f / +f (or -o / +o noglob); other shell options are not supported yet."""
+        i = 0
+        while i < len(args):
+            arg = args[i]
+            option = args[i + 1] if arg in ('-o', '+o') and i + 1 < len(args) else None
+            if option in ('xtrace', 'noglob'):
+                i += 1
+            elif arg not in ('-x', '+x', '-f', '+f'):
+                print(f"set: unsupported option {arg}")
+                return 2
+            if option == 'noglob' or arg[1:] == 'f':
+                self.globber.noglob = arg[0] == '-'
+            else:
+                TRACER.xtrace = arg[0] == '-'
+            i += 1
+        return 0
+    def enable(self, args):
+        """enable [-n] [name...]: choose between the in-process and external echo, test, cat, ..."""
+        external = self.executor.external
+        disable = bool(args) and args[0] == '-n'
+        names = args[1:] if disable else args
+        if not names:
+            for name in sorted(coreutils.COMMANDS):
+                print(f"enable {'-n ' if name in external else ''}{name}")
+            return 0
+        status = 0
+        for name in names:
+            if name not in coreutils.COMMANDS:
+                print(f"enable: {name}: not an in-process utility")
+                status = 1
+            elif disable:
+                external.add(name)
+            else:
+                external.discard(name)
+        return status
+    def wait_all(self):
+        if self.jobcontrol is not None:
+            self.jobcontrol.wait_all()
+            return
+        while True:
+            try:
+                os.wait()
+            except ChildProcessError:
+                break
@@ -0,0 +1,48 @@
+"""
+scriptcache.py - On-disk cache of parsed scripts for the advanced Python shell.
+"""
+import os
+import sys
+import pickle
+from diskcache import DiskCache, cache_home
+from utils import SHELL_VERSION
+
+# Bump when the pickled node classes change, so older entries are misses
+FORMAT = '5'
+
+class ScriptCache:
+    """Caches the parsed form of script files, like .pyc files for Python.
+
+    Entries are keyed by the script's absolute path, mtime, size, the shell
+    version and FORMAT, so an edited script or an upgraded shell is a miss.
+    """
+    def __init__(self, directory=None, max_bytes=32 * 1024 * 1024):
+        self.store = DiskCache(directory or os.path.join(cache_home(), 'scripts'), max_bytes)
+        self.hits = 0
+        self.misses = 0
+    def key(self, path, st):
+        return '\0'.join([os.path.abspath(path), str(st.st_mtime_ns), str(st.st_size),
+                          SHELL_VERSION, FORMAT, '%d.%d' % sys.version_info[:2]])
+    def load(self, path, script_parser):
+        """Return the parsed nodes for a script file, parsing it only on a cache miss."""
+        with open(path) as f:
+            st = os.fstat(f.fileno())
+            key = self.key(path, st)
+            data = self.store.get(key)
+            if data is not None:
+                try:
+                    nodes = pickle.loads(data)
+                    self.hits += 1
+                    return nodes
+                except Exception:
+                    # Unreadable entry (e.g. written by an older shell): reparse
+                    self.store.delete(key)
+            self.misses += 1
+            nodes = script_parser.parse(f.read())
+        self.store.put(key, pickle.dumps(nodes, pickle.HIGHEST_PROTOCOL))
+        return nodes
+    def report(self):
+        entries = self.store.entries()
+        size = sum(s for _, s, _ in entries)
+        return (f"script cache: {self.hits} hits, {self.misses} misses; "
+                f"{len(entries)} entries, {size} bytes in {self.store.directory}")
@@ -0,0 +1,245 @@
+"""
+server.py - Pre-forked shell server and its client protocol for the advanced Python shell.
+
+'myshell.py --server' imports the shell, reads ~/.myshellrc and fills the
+$PATH hash table once. It then keeps a pool of forked workers waiting on a
+Unix domain socket. A worker takes one job and exits after it; the master
+forks a replacement as soon as a job is accepted. So every job starts in a
+clean copy of the warm process, and no fork happens while a client waits.
+
+The client (shellclient.py, which also defines the request encoding) sends
+one request:
+
+- its cwd, its argv (-c command [args] or script [args]) and its
+  environment
+- its stdin, stdout and stderr, passed as file descriptors with
+  SCM_RIGHTS
+
+The job runs directly on those descriptors, so output is never copied
+through the server. The worker answers 'pid N' when it starts and
+'exit N' when it is done.
+"""
+import os
+import sys
+import select
+import socket
+import signal
+from shellclient import PROTOCOL, default_socket_path
+
+MAX_FRAME = 16 * 1024 * 1024
+
+# ----- protocol -----
+def decode_request(payload):
+    """(cwd, argv, env) from a request payload; ValueError if it is malformed."""
+    fields = payload.split(b'\0')
+    if len(fields) < 3 or fields[0] != PROTOCOL:
+        raise ValueError("unsupported request")
+    argc = int(fields[2])
+    if len(fields) < 3 + argc:
+        raise ValueError("truncated request")
+    argv = [os.fsdecode(arg) for arg in fields[3:3 + argc]]
+    env = {}
+    for item in fields[3 + argc:]:
+        name, sep, value = item.partition(b'=')
+        if sep:
+            env[os.fsdecode(name)] = os.fsdecode(value)
+    return os.fsdecode(fields[1]), argv, env
+
+def recv_request(sock):
+    """(cwd, argv, env, fds) from a client connection."""
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+    try:
+        if len(data) < 4:
+            raise ValueError("short request")
+        size = int.from_bytes(data[:4], 'big')
+        if size > MAX_FRAME:
+            raise ValueError("request too large")
+        payload = bytearray(data[4:])
+        while len(payload) < size:
+            chunk = sock.recv(size - len(payload))
+            if not chunk:
+                raise ValueError("truncated request")
+            payload += chunk
+        if len(fds) != 3:
+            raise ValueError("expected stdin, stdout and stderr")
+        return decode_request(bytes(payload)) + (fds,)
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+# ----- server -----
+class ShellServer:
+    """Keeps `workers` pre-forked processes accepting jobs on a Unix socket.
+
+    setup() builds the warm state (run again when a watched file changes) and
+    run(state, argv) runs one job in a worker and returns its exit status.
+    At most max_jobs jobs run at once; more clients wait in the listen queue.
+    """
+    def __init__(self, path, setup, run, workers=4, max_jobs=64, watch=()):
+        self.path = path
+        self.setup = setup
+        self.run = run
+        self.workers = max(1, workers)
+        self.max_jobs = max(self.workers, max_jobs)
+        self.watch = list(watch)
+        self.state = None
+        self.listener = None
+        self.idle = set()           # workers waiting for a job
+        self.busy = set()           # workers running one
+        self._mtimes = None
+        self._accepted = None       # pipe on which workers report taking a job
+        self._notify = None
+    def serve(self):
+        previous = {sig: signal.signal(sig, self._on_signal) for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)}
+        try:
+            self._listen()
+            self._reload()
+            self._accepted, self._notify = os.pipe()
+            print(f"myshell server: listening on {self.path} ({self.workers} workers)", file=sys.stderr)
+            while True:
+                self._reap()
+                if len(self.idle) < self.workers:
+                    # New workers start from the current config; idle ones keep theirs
+                    self._reload()
+                while len(self.idle) < self.workers and len(self.idle) + len(self.busy) < self.max_jobs:
+                    self._fork_worker()
+                self._wait_for_event()
+        except _Stop:
+            return 0
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            self._shutdown()
+    def _listen(self):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            pass
+        else:
+            raise OSError(f"{self.path}: a server is already listening")
+        finally:
+            probe.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.listener.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.listener.listen(128)
+    def _reload(self):
+        """Run setup() the first time and whenever a watched file's mtime changes."""
+        mtimes = []
+        for path in self.watch:
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        if self.state is None or mtimes != self._mtimes:
+            self.state = self.setup()
+            self._mtimes = mtimes
+    def _fork_worker(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                status = self._worker()
+            finally:
+                os._exit(status)
+        self.idle.add(pid)
+    def _wait_for_event(self):
+        try:
+            readable, _, _ = select.select([self._accepted], [], [], 1.0)
+        except InterruptedError:
+            return
+        if readable:
+            data = os.read(self._accepted, 4096)
+            for i in range(0, len(data) - 3, 4):
+                pid = int.from_bytes(data[i:i + 4], 'big')
+                if pid in self.idle:
+                    self.idle.discard(pid)
+                    self.busy.add(pid)
+    def _reap(self):
+        while self.idle or self.busy:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.idle.clear()
+                self.busy.clear()
+                return
+            if not pid:
+                return
+            self.idle.discard(pid)
+            self.busy.discard(pid)
+    def _on_signal(self, signum, frame):
+        raise _Stop()
+    def _shutdown(self):
+        for pid in self.idle | self.busy:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        for pid in self.idle | self.busy:
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
+        if self.listener is not None:
+            self.listener.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+    # ----- in a worker -----
+    def _worker(self):
+        for sig in (signal.SIGTERM, signal.SIGHUP):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        os.close(self._accepted)
+        conn, _ = self.listener.accept()
+        self.listener.close()
+        os.write(self._notify, os.getpid().to_bytes(4, 'big'))
+        os.close(self._notify)
+        with conn:
+            try:
+                cwd, argv, env, fds = recv_request(conn)
+            except (OSError, ValueError) as e:
+                print(f"myshell server: bad request: {e}", file=sys.stderr)
+                return 1
+            conn.sendall(f"pid {os.getpid()}\n".encode())
+            for target, fd in enumerate(fds):
+                os.dup2(fd, target)
+                os.close(fd)
+            os.environ.clear()
+            os.environ.update(env)
+            status = self._run_job(cwd, argv)
+            try:
+                conn.sendall(f"exit {status}\n".encode())
+            except OSError:
+                pass
+        return status
+    def _run_job(self, cwd, argv):
+        try:
+            os.chdir(cwd)
+            status = self.run(self.state, argv)
+        except OSError as e:
+            print(f"myshell: {cwd}: {e.strerror}", file=sys.stderr)
+            status = 1
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        except KeyboardInterrupt:
+            status = 128 + signal.SIGINT
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        return status if isinstance(status, int) else 0 if status is None else 1
+
+class _Stop(Exception):
+    """Raised by the master's signal handler to shut the server down."""
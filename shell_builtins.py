@@ -2,31 +2,60 @@
 builtins.py - Built-in shell commands for the advanced Python shell.
 """
 import os
+import re
+from pathcache import CommandHashTable
+from variables import VariableStore
+
+NAME_RE = re.compile(r'[A-Za-z_]\w*$')
+
+def exit_status(name, args, default):
+    """The status argument of exit or return (default when there is none), as a byte."""
+    if not args:
+        return default
+    try:
+        return int(args[0]) & 0xFF
+    except ValueError:
+        print(f"{name}: {args[0]}: numeric argument required")
+        return 2
 
 class Builtins:
     """Handles built-in shell commands (cd, alias, export, etc.)."""
-    def __init__(self):
+    def __init__(self, hashtable=None, variables=None):
         self.aliases = {}
+        self.hashtable = hashtable if hashtable is not None else CommandHashTable()
+        self.variables = variables if variables is not None else VariableStore()
         self.builtin_help = {
             'cd': 'Change the current directory',
             'exit': 'Exit the shell',
             'alias': 'Create or list command aliases',
             'unalias': 'Remove an alias',
-            'export': 'Set an environment variable',
-            'unset': 'Unset an environment variable',
+            'export': 'Export variables to commands (export NAME[=value]...; no args: list them)',
+            'unset': 'Unset a variable',
+            'local': 'Make a variable local to the running function (local NAME[=value]...)',
             'jobs': 'List background jobs',
             'fg': 'Bring a job to the foreground',
             'bg': 'Resume a job in the background',
             'disown': 'Disown a job',
+            'hash': 'Remember or display command locations',
+            'parallel': 'Run a command over many arguments, N jobs at a time',
+            'cache': 'Run a command through the result cache',
+            'hooks': 'Show plugin hook timings (hooks stats, hooks enable NAME)',
+            'enable': 'Run echo, printf, test, cat, ... in-process (-n: external)',
+            'stats': 'Top commands by CPU, memory or wall time (stats cpu|mem|wall [N], stats recent)',
+            'time': 'Report real, user and sys time of a pipeline (time [-p] cmd | cmd)',
+            'set': 'Set shell options (set -x: print commands before running them, set -f: no globbing)',
+            'shopt': 'Globbing options (shopt -s|-u nullglob|failglob|dotglob)',
+            'trace': 'Record stage timings (trace start [FILE], stop, dump FILE, summary)',
             'help': 'Show this help message',
         }
     def dispatch(self, parsed, custom_commands=None):
+        """Run a builtin. Returns its exit status, or None if the command is not a builtin."""
         # Only handle simple commands (not pipelines)
         if not parsed or 'pipeline' not in parsed or not parsed['pipeline']:
-            return False
+            return None
         cmd = parsed['pipeline'][0]['args']
         if not cmd:
-            return False
+            return None
         name = cmd[0]
         # help
         if name == 'help':
@@ -38,7 +67,7 @@ class Builtins:
                 for k in custom_commands:
                     print(f"  {k:<8} - (plugin/custom command)")
             print()
-            return True
+            return 0
         # cd
         if name == 'cd':
             try:
@@ -51,10 +80,14 @@ class Builtins:
                 print(f"cd: permission denied: {cmd[1]}")
             except Exception as e:
                 print(f"cd: error: {e}")
-            return True
-        # exit
+            else:
+                self.variables.set('OLDPWD', self.variables.get('PWD', ''))
+                self.variables.set('PWD', os.getcwd())
+                return 0
+            return 1
+        # exit [N]
         if name == 'exit':
-            exit(0)
+            raise SystemExit(exit_status('exit', cmd[1:], 0))
         # alias
         if name == 'alias':
             if len(cmd) == 1:
@@ -66,41 +99,98 @@ class Builtins:
                 self.aliases[k] = v
             else:
                 print("Usage: alias name='command'")
-            return True
+                return 2
+            return 0
         # unalias
         if name == 'unalias':
-            if len(cmd) == 2:
-                if cmd[1] in self.aliases:
-                    self.aliases.pop(cmd[1])
-                else:
-                    print(f"unalias: {cmd[1]}: not found")
-            else:
+            if len(cmd) != 2:
                 print("Usage: unalias name")
-            return True
-        # export
-        if name == 'export':
-            if len(cmd) == 2 and '=' in cmd[1]:
-                k, v = cmd[1].split('=', 1)
-                os.environ[k] = v
-            else:
-                print("Usage: export VAR=value")
-            return True
-        # unset
-        if name == 'unset':
-            if len(cmd) == 2:
-                if cmd[1] in os.environ:
-                    os.environ.pop(cmd[1])
-                else:
-                    print(f"unset: {cmd[1]}: not found")
-            else:
-                print("Usage: unset VAR")
-            return True
+                return 2
+            if cmd[1] not in self.aliases:
+                print(f"unalias: {cmd[1]}: not found")
+                return 1
+            self.aliases.pop(cmd[1])
+            return 0
+        # export, unset, local
+        if name in ('export', 'unset', 'local'):
+            return self.set_variables(name, cmd[1:])
+        # hash
+        if name == 'hash':
+            return self.hash(cmd[1:])
         # jobs (stub)
         if name == 'jobs':
             print("[jobs] (job control not yet implemented)")
-            return True
+            return 0
         # feedback
         if name == 'feedback':
             print("We value your feedback! Please open an issue at: https://github.com/YOUR_GITHUB_USERNAME/YOUR_REPO_NAME/issues")
-            return True
-        return False 
\ No newline at end of file
+            return 0
+        return None
+    def set_variables(self, name, args):
+        """export, unset and local: NAME or NAME=value arguments. Returns the exit status."""
+        store = self.variables
+        if not args:
+            if name == 'export':
+                for k in sorted(os.environ):
+                    print(f"export {k}=\"{os.environ[k]}\"")
+            else:
+                print(f"Usage: {name} NAME{'' if name == 'unset' else '[=value]'}...")
+                return 2
+            return 0
+        status = 0
+        for arg in args:
+            k, eq, v = arg.partition('=')
+            if not NAME_RE.match(k) or (eq and name == 'unset'):
+                print(f"{name}: {arg}: not a valid identifier")
+                status = 1
+            elif name == 'export':
+                store.export(k, v if eq else None)
+            elif name == 'local':
+                if not store.local(k, v):
+                    print("local: can only be used in a function")
+                    return 1
+            elif not store.unset(k):
+                print(f"unset: {k}: not found")
+                status = 1
+        return status
+    def hash(self, args):
+        """hash [-r] [-d name] [-t name...] [-p path name] [name...]. Returns the exit status."""
+        table = self.hashtable
+        if not args:
+            if not table.hashed:
+                print("hash: hash table empty")
+                return 0
+            print("hits\tcommand")
+            for k, v in sorted(table.hashed.items()):
+                print(f"{table.hits.get(k, 0):4}\t{v}")
+            return 0
+        status = 0
+        if args[0] == '-r':
+            table.reset()
+            table.refresh(force=True)
+        elif args[0] == '-p':
+            if len(args) != 3:
+                print("Usage: hash -p path name")
+                return 2
+            table.add(args[2], args[1])
+        elif args[0] == '-d':
+            for k in args[1:]:
+                if not table.forget(k):
+                    print(f"hash: {k}: not found")
+                    status = 1
+        elif args[0] == '-t':
+            for k in args[1:]:
+                location = table.hashed.get(k) or table.lookup(k)
+                if location:
+                    print(location if len(args) == 2 else f"{k}\t{location}")
+                else:
+                    print(f"hash: {k}: not found")
+                    status = 1
+        else:
+            for k in args:
+                if table.lookup(k) is None:
+                    print(f"hash: {k}: not found")
+                    status = 1
+                else:
+                    table.hits[k] = 0
+        return status
@@ -0,0 +1,97 @@
+"""
+shellclient.py - Thin client for the shell server (myshell.py --server).
+
+    shellclient.py -c 'command' [name [args...]]
+    shellclient.py script.sh [args...]
+    shellclient.py < script.sh
+
+Runs the job in a pre-forked worker of the server on $MYSHELL_SOCKET (see
+server.py), with this process's stdin, stdout, stderr, cwd and environment,
+and exits with the job's status. SIGINT, SIGTERM and SIGHUP are passed on
+to the worker.
+
+Every invocation pays the Python startup, so this module only imports
+C-level modules: _socket and _signal, not socket and signal, which would
+pull in enum and selectors. Run it as 'python3 -S shellclient.py' to skip
+site as well.
+
+Request frame: a 4-byte big-endian length, then NUL-separated fields:
+version, cwd, argc, argv..., NAME=value... The three descriptors are sent
+with SCM_RIGHTS on the first bytes.
+"""
+import os
+import sys
+import _socket
+import _signal
+
+PROTOCOL = b'1'
+FORWARDED_SIGNALS = (_signal.SIGINT, _signal.SIGTERM, _signal.SIGHUP)
+
+def default_socket_path():
+    """$MYSHELL_SOCKET, else myshell.sock in $XDG_RUNTIME_DIR or a private directory in /tmp."""
+    path = os.environ.get('MYSHELL_SOCKET')
+    if path:
+        return path
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if not runtime:
+        runtime = os.path.join('/tmp', f'myshell-{os.getuid()}')
+        os.makedirs(runtime, mode=0o700, exist_ok=True)
+    return os.path.join(runtime, 'myshell.sock')
+
+def encode_request(cwd, argv, env):
+    fields = [PROTOCOL, os.fsencode(cwd), str(len(argv)).encode()]
+    fields += [os.fsencode(arg) for arg in argv]
+    fields += [os.fsencode(k) + b'=' + os.fsencode(v) for k, v in env.items()]
+    payload = b'\0'.join(fields)
+    return len(payload).to_bytes(4, 'big') + payload
+
+def send_request(sock, cwd, argv, env, fds=(0, 1, 2)):
+    frame = encode_request(cwd, argv, env)
+    rights = b''.join(fd.to_bytes(4, sys.byteorder, signed=True) for fd in fds)
+    sent = sock.sendmsg([frame[:4096]], [(_socket.SOL_SOCKET, _socket.SCM_RIGHTS, rights)])
+    if sent < len(frame):
+        sock.sendall(frame[sent:])
+
+def run_client(argv, path=None):
+    """Run argv on the server, passing this process's stdio, cwd and environment. Returns the exit status."""
+    path = path or default_socket_path()
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError as e:
+        sock.close()
+        print(f"myshell client: {path}: {e.strerror} (start it with 'myshell.py --server')", file=sys.stderr)
+        return 127
+    worker = []
+    def forward(signum, frame):
+        if worker:
+            try:
+                os.kill(worker[0], signum)
+            except OSError:
+                pass
+    for sig in FORWARDED_SIGNALS:
+        _signal.signal(sig, forward)
+    try:
+        send_request(sock, os.getcwd(), argv, os.environ)
+        buffer = b''
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk:
+                print("myshell client: the server closed the connection", file=sys.stderr)
+                return 1
+            buffer += chunk
+            while b'\n' in buffer:
+                line, _, buffer = buffer.partition(b'\n')
+                word, _, value = line.partition(b' ')
+                if word == b'pid':
+                    worker.append(int(value))
+                elif word == b'exit':
+                    return int(value)
+    except OSError as e:
+        print(f"myshell client: {e.strerror}", file=sys.stderr)
+        return 1
+    finally:
+        sock.close()
+
+if __name__ == "__main__":
+    sys.exit(run_client(sys.argv[1:]))
@@ -0,0 +1,139 @@
+"""
+spawn.py - Process launch backends for the advanced Python shell.
+
+posix_spawn() lets the C library use vfork/CLONE_VM, so a spawn does not copy
+the shell's page tables and no Python code runs in the child. Redirections
+and pipes become spawn file actions and the new process group is set with
+setpgroup. subprocess.Popen stays available as a fallback.
+"""
+import os
+import sys
+import time
+import signal
+
+HAVE_POSIX_SPAWN = hasattr(os, 'posix_spawn')
+# Python 3.11+ sets the process group without running Python code in the child
+_HAVE_PROCESS_GROUP = sys.version_info >= (3, 11)
+# subprocess.DEVNULL's value: the executor's "/dev/null" marker in an fds map.
+# subprocess itself (and its selectors import) is only loaded by popen().
+DEVNULL = -3
+
+class Process:
+    """Minimal Popen-like handle for a child started by pid (posix_spawn or fork).
+
+    It is reaped with wait4(), so once it has exited rusage holds its
+    resource usage and elapsed its wall time (see accounting.py).
+    """
+    def __init__(self, pid, args=None):
+        self.pid = pid
+        self.args = args
+        self.returncode = None
+        self.stdout = None
+        self.rusage = None
+        self.started = time.perf_counter()
+        self.elapsed = None
+    def _set_status(self, status, rusage):
+        code = os.waitstatus_to_exitcode(status)
+        # Shell convention: killed by signal N -> 128 + N
+        self.returncode = 128 - code if code < 0 else code
+        self.rusage = rusage
+        self.elapsed = time.perf_counter() - self.started
+    def poll(self):
+        if self.returncode is None:
+            try:
+                pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+            except ChildProcessError:
+                self.returncode = 0
+                return self.returncode
+            if pid:
+                self._set_status(status, rusage)
+        return self.returncode
+    def wait(self):
+        if self.returncode is None:
+            try:
+                _, status, rusage = os.wait4(self.pid, 0)
+            except ChildProcessError:
+                # Already reaped elsewhere; the status is gone
+                self.returncode = 0
+                return self.returncode
+            self._set_status(status, rusage)
+        return self.returncode
+
+_environ_snapshot = None
+
+def current_environ():
+    """os.environ as a plain bytes dict, re-copied only when the environment changes.
+
+    posix_spawn needs an explicit env; converting os.environ key by key on
+    every launch costs about as much as the spawn saves.
+    """
+    global _environ_snapshot
+    data = getattr(os.environ, '_data', None)
+    if data is None:
+        return os.environ
+    if _environ_snapshot != data:
+        _environ_snapshot = dict(data)
+    return _environ_snapshot
+
+def _file_actions(fds, temporaries):
+    """posix_spawn file actions placing fds[0..2] on the child's stdin/stdout/stderr.
+
+    Any other key N (always with fds[N] == N) is an fd the child inherits as
+    is, such as a process substitution's /dev/fd/N. dup2() of an fd onto
+    itself clears its close-on-exec flag in posix_spawn (glibc 2.29+).
+    """
+    actions = []
+    for target in (0, 1, 2):
+        source = fds.get(target)
+        if source is None or source == target:
+            continue
+        if source == DEVNULL:
+            actions.append((os.POSIX_SPAWN_OPEN, target, os.devnull, os.O_RDWR, 0))
+            continue
+        if source in (0, 1, 2):
+            # "2>&1 >file" means the shell's fd 1 as it is now, before the
+            # child's own fd 1 is replaced: duplicate it out of the way first.
+            source = os.dup(source)
+            temporaries.append(source)
+        actions.append((os.POSIX_SPAWN_DUP2, source, target))
+    actions.extend((os.POSIX_SPAWN_DUP2, fd, fd) for fd in fds if fd > 2)
+    return actions
+
+# Python ignores SIGPIPE (and SIGXFSZ); the child must get the default
+# action back, as Popen's restore_signals does, or "yes | head" ends in EPIPE errors
+_DEFAULT_SIGNALS = [getattr(signal, name) for name in ('SIGPIPE', 'SIGXFSZ') if hasattr(signal, name)]
+
+def posix_spawn(executable, argv, fds, env=None, pgroup=0):
+    """Start argv with fds[0..2] as stdio. Returns a Process.
+
+    pgroup 0 makes the child the leader of a new process group; otherwise it
+    joins process group pgroup (the later stages of a pipeline).
+    """
+    temporaries = []
+    try:
+        actions = _file_actions(fds, temporaries)
+        pid = os.posix_spawn(executable, argv, current_environ() if env is None else env,
+                             file_actions=actions, setpgroup=pgroup, setsigdef=_DEFAULT_SIGNALS)
+    finally:
+        for fd in temporaries:
+            os.close(fd)
+    return Process(pid, argv)
+
+def popen(executable, argv, fds, env=None, pgroup=0):
+    """The same launch through subprocess.Popen (fork+exec)."""
+    import subprocess
+    if _HAVE_PROCESS_GROUP:
+        group = {'process_group': pgroup}
+    else:
+        group = {'preexec_fn': lambda: os.setpgid(0, pgroup)}
+    return subprocess.Popen(argv, executable=executable, stdin=fds.get(0), stdout=fds.get(1),
+                            stderr=fds.get(2), env=env, pass_fds=[fd for fd in fds if fd > 2], **group)
+
+def spawn(executable, argv, fds, env=None, backend='posix_spawn', pgroup=0):
+    """Launch a command with the requested backend ('posix_spawn' or 'popen').
+
+    Falls back to Popen where this platform has no posix_spawn.
+    """
+    if backend == 'posix_spawn' and HAVE_POSIX_SPAWN:
+        return posix_spawn(executable, argv, fds, env, pgroup)
+    return popen(executable, argv, fds, env, pgroup)
@@ -0,0 +1,76 @@
+"""
+test_accounting.py - Tests for per-stage resource accounting and the time and stats builtins.
+"""
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+from accounting import ResourceStats
+from executor import CommandExecutor
+from parser import CommandParser
+
+class TestResourceStats(unittest.TestCase):
+    def test_bounded_with_spill(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stats.tsv')
+            stats = ResourceStats(max_records=8, spill_path=path)
+            for i in range(20):
+                stats.add(['cmd', str(i)], 1000 + i, 0, 0.5, cpu=0.25)
+            self.assertLessEqual(len(stats.records), 8)
+            self.assertEqual(stats.records[-1][2], 'cmd 19')
+            # Totals still cover every record
+            self.assertEqual(stats.totals['cmd'][:3], [20, 10.0, 5.0])
+            stats.close()
+            with open(path) as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(lines[0].split('\t')[2:5], ['cmd 0', '1000', '0'])
+
+    def test_top_and_builtin(self):
+        stats = ResourceStats()
+        stats.add(['/usr/bin/sort'], 1, 0, 2.0, cpu=1.5)
+        stats.add(['grep', 'x'], 2, 1, 0.1, cpu=0.01)
+        stats.add(['grep', 'y'], 3, -9, 0.1, cpu=0.01)
+        self.assertEqual([name for name, _ in stats.top('cpu')], ['sort', 'grep'])
+        self.assertEqual([name for name, _ in stats.top('count')], ['grep', 'sort'])
+        # Popen's -N for a signal becomes 128 + N
+        self.assertEqual(stats.records[-1][4], 137)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(stats.builtin(['wall', '1']), 0)
+            self.assertEqual(stats.builtin(['recent']), 0)
+            self.assertEqual(stats.builtin(['clear']), 0)
+            self.assertEqual(stats.builtin(['bogus']), 2)
+        self.assertIn('sort', out.getvalue())
+        self.assertIn('grep y', out.getvalue())
+        self.assertEqual(out.getvalue().count("starts at the shell's own size"), 2)
+        self.assertEqual((stats.records, stats.totals), ([], {}))
+
+class TestExecutorAccounting(unittest.TestCase):
+    def test_every_stage_recorded(self):
+        executor = CommandExecutor()
+        parsed = CommandParser().parse("sh -c 'i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done' | cat")
+        with open(os.devnull, 'w') as devnull:
+            status, _ = executor.execute(parsed, stdout=devnull.fileno())
+        self.assertEqual(status, 0)
+        records = executor.stats.records
+        self.assertEqual([r[1] for r in records], ['sh', 'cat'])
+        sh = records[0]
+        self.assertIsNotNone(sh[3])
+        self.assertGreater(sh[5], 0)            # wall
+        self.assertGreater(sh[6] + sh[7], 0)    # user + sys from wait4
+        self.assertGreater(sh[8], 0)            # max rss
+
+    def test_time_builtin(self):
+        from script import ScriptInterpreter
+        interp = ScriptInterpreter()
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            self.assertEqual(interp.run_source('time -p /bin/sh -c "exit 3"\n'), 3)
+        lines = err.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['real', 'user', 'sys'])
+        self.assertEqual(interp.executor.stats.records[-1][4], 3)
+
+if __name__ == '__main__':
+    unittest.main()
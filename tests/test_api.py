@@ -0,0 +1,101 @@
+"""
+test_api.py - Tests for the embeddable pipeline API.
+"""
+import os
+import sys
+import time
+import asyncio
+import unittest
+import threading
+from api import Shell, PipelineError, PipelineTimeout
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.shell = Shell(max_concurrency=50, kill_grace=0.2)
+
+    def test_capture_and_input(self):
+        result = self.shell.run_sync('tr a-z A-Z | sort', capture=True, input='b\na\n')
+        self.assertEqual((result.status, result.stdout), (0, b'A\nB\n'))
+        result = self.shell.run_sync("sh -c 'echo oops >&2; exit 3'", capture=True)
+        self.assertEqual((result.status, result.stderr), (3, b'oops\n'))
+        result = self.shell.run_sync('no-such-command-xyz', capture=True)
+        self.assertEqual(result.status, 127)
+        self.assertIn(b'Command not found', result.stderr)
+        self.assertRaises(PipelineError, self.shell.run_sync, 'false', check=True)
+
+    def test_lists_run_in_subshell(self):
+        result = self.shell.run_sync('cd / && pwd; false || echo fallback', capture=True)
+        self.assertEqual(result.stdout, b'/\nfallback\n')
+
+    def test_builtins_run_in_subshell(self):
+        cwd = os.getcwd()
+        result = self.shell.run_sync('cd /', capture=True)
+        self.assertEqual((result.status, result.stdout), (0, b''))
+        self.assertEqual(os.getcwd(), cwd)
+        result = self.shell.run_sync('cd /no/such/dir', capture=True)
+        self.assertEqual(result.status, 1)
+        self.assertIn(b'no such file or directory', result.stdout)
+
+    def test_launch_errors_from_threads(self):
+        stdout = sys.stdout
+        results = {}
+        def run(i):
+            results[i] = self.shell.run_sync(f'no-such-command-{i}', capture=True)
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertIs(sys.stdout, stdout)
+        for i, result in results.items():
+            self.assertEqual(result.status, 127)
+            self.assertIn(f'Command not found: no-such-command-{i}\n'.encode(), result.stderr)
+
+    def test_many_concurrent_pipelines(self):
+        async def main():
+            start = time.monotonic()
+            results = await asyncio.gather(*[
+                self.shell.run(f'sleep 0.2 | echo {i}', capture=True) for i in range(100)])
+            return time.monotonic() - start, results
+        elapsed, results = asyncio.run(main())
+        self.assertEqual([r.stdout for r in results], [f'{i}\n'.encode() for i in range(100)])
+        # 50 at a time: two waves, not one hundred sequential sleeps
+        self.assertLess(elapsed, 2.0)
+
+    def test_timeout_kills_pipeline(self):
+        start = time.monotonic()
+        with self.assertRaises(PipelineTimeout):
+            self.shell.run_sync('sleep 10 | sleep 10', timeout=0.2)
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_substitution_does_not_block_the_loop(self):
+        async def main():
+            ticks = 0
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.05)
+                    ticks += 1
+            task = asyncio.ensure_future(ticker())
+            try:
+                result = await self.shell.run('echo $(sleep 1; echo late) `echo tick`', capture=True)
+            finally:
+                task.cancel()
+            return result, ticks
+        result, ticks = asyncio.run(main())
+        self.assertEqual(result.stdout, b'late tick\n')
+        # The ticker ran throughout the second the substitution took
+        self.assertGreater(ticks, 10)
+
+    def test_stream(self):
+        async def main():
+            lines = [line async for line in self.shell.stream('seq 3; echo done')]
+            first = None
+            async for line in self.shell.stream('yes'):
+                first = line
+                break
+            return lines, first
+        self.assertEqual(asyncio.run(main()), (['1', '2', '3', 'done'], 'y'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+test_completion.py - Tests for command, file and plugin-source completion.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+import completion
+from completion import CompletionEngine, prefix_matches
+from pathcache import CommandHashTable
+
+class TestCompletion(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = self.tmp.name
+        bindir = os.path.join(self.root, 'bin')
+        os.mkdir(bindir)
+        for name in ('gitk', 'git', 'grep', 'ls'):
+            open(os.path.join(bindir, name), 'w').close()
+        self.engine = CompletionEngine(hashtable=CommandHashTable(path=bindir))
+
+    def test_prefix_matches(self):
+        words = ['a', 'ab', 'abc', 'abd', 'b']
+        self.assertEqual(prefix_matches(words, 'ab'), ['ab', 'abc', 'abd'])
+        self.assertEqual(prefix_matches(words, 'c'), [])
+        self.assertEqual(prefix_matches(words, ''), words)
+
+    def test_commands(self):
+        self.assertEqual(self.engine.matches('gi', 'gi'), ['git', 'gitk'])
+        self.assertEqual(self.engine.matches('', ''), ['git', 'gitk', 'grep', 'ls'])
+
+    def test_states_served_from_session(self):
+        with mock.patch.object(self.engine, 'matches', wraps=self.engine.matches) as matches:
+            results = [self.engine.complete('g', state, buffer='g') for state in range(4)]
+        self.assertEqual(results, ['git', 'gitk', 'grep', None])
+        self.assertEqual(matches.call_count, 1)
+
+    def test_files(self):
+        os.mkdir(os.path.join(self.root, 'docs'))
+        for name in ('data1.txt', 'data2.txt', '.hidden'):
+            open(os.path.join(self.root, name), 'w').close()
+        prefix = self.root + os.sep
+        self.assertEqual(self.engine.matches('cat ' + prefix + 'd', prefix + 'd'),
+                         [prefix + 'data1.txt', prefix + 'data2.txt', prefix + 'docs/'])
+        self.assertEqual(self.engine.matches('cat ' + prefix, prefix), [prefix + n for n in ('bin/', 'data1.txt', 'data2.txt', 'docs/')])
+        self.assertEqual(self.engine.matches('cat ' + prefix + '.', prefix + '.'), [prefix + '.hidden'])
+
+    def test_large_directory_is_capped(self):
+        big = os.path.join(self.root, 'big')
+        os.mkdir(big)
+        for i in range(300):
+            open(os.path.join(big, f'f{i:03d}'), 'w').close()
+        self.engine.limit = 20
+        with mock.patch.object(completion, 'DIR_CACHE_ENTRIES', 50):
+            found = self.engine.file_matches(big + '/f1')
+        self.assertEqual(len(found), 20)
+        self.assertEqual(found, sorted(found))
+        self.assertTrue(all(os.path.basename(f).startswith('f1') for f in found))
+        self.assertNotIn(big, self.engine._dirs)
+
+    def test_sources(self):
+        calls = []
+        def branches():
+            calls.append(1)
+            return ['main', 'feature', 'fix']
+        self.engine.register_source('checkout', branches)
+        self.engine.register_source('git', ['status', 'stash', 'show'])
+        self.assertEqual(calls, [])
+        self.assertEqual(self.engine.matches('checkout f', 'f'), ['feature', 'fix'])
+        self.assertEqual(self.engine.matches('checkout m', 'm'), ['main'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.engine.matches('git st', 'st'), ['stash', 'status'])
+        # Readline-style completers still work
+        self.engine.register('say', lambda text, state: ['hello', 'hi'][state] if state < 2 else None)
+        self.assertEqual(self.engine.matches('say h', 'h'), ['hello', 'hi'])
+
+if __name__ == '__main__':
+    unittest.main()
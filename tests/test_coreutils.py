@@ -0,0 +1,102 @@
+"""
+test_coreutils.py - The in-process utilities must match the coreutils binaries.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import subprocess
+from parser import CommandParser
+from executor import CommandExecutor
+from pump import Capture
+import coreutils
+
+def run_in_process(args):
+    """(status, stdout, stderr) of the in-process utility, or None if it defers to the binary."""
+    utility = coreutils.prepare(args)
+    if utility is None:
+        return None
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        status = coreutils.InProcess(utility, {0: subprocess.DEVNULL, 1: out.fileno(), 2: err.fileno()},
+                                     inline=True).wait()
+        out.seek(0)
+        err.seek(0)
+        return status, out.read(), err.read()
+
+CASES = [
+    ['echo', 'a', 'b'], ['echo'], ['echo', '-n', 'x'], ['echo', '--', '-n'], ['echo', '-nx'],
+    ['echo', '-e', 'a\\tb\\n\\0101\\101\\x41\\q'], ['echo', '-e', 'x\\cy'], ['echo', '-E', 'a\\tb'],
+    ['printf', '%s-%d\\n', 'a', '1', 'b', '2', 'c'], ['printf', '%5.2f|%-4s|%x|%o|%X\\n', '3.14159', 'ab', '255', '8', '255'],
+    ['printf', '%d %d %d\\n', '010', '0x1f', "'a"], ['printf', '%u %x\\n', '-1', '-1'], ['printf', '\\0101\\101\\n'],
+    ['printf', '%b|%b\\n', 'a\\tb', '\\0101\\101'], ['printf', 'a\\cb'], ['printf', '%b%s\\n', 'x\\cy', 'z'],
+    ['printf', '%c%c\\n', 'hello', ''], ['printf', '%*d|%-*d|\\n', '5', '42', '4', '7'], ['printf', '%d|%s\\n'],
+    ['printf', '100%%\\n'], ['printf', '%i %+d % d %05d %.3d\\n', '3', '4', '5', '6', '7'], ['printf', '%.2s|%e|%g\\n', 'abc', '1.5', '0.0001'],
+    ['test'], ['test', 'x'], ['test', ''], ['test', '-n'], ['test', '!'], ['test', '!', 'x'], ['test', '-z', ''],
+    ['test', 'a', '=', 'a'], ['test', 'a', '!=', 'a'], ['test', '1', '-lt', '2'], ['test', ' 5 ', '-eq', '5'],
+    ['test', '-d', '/'], ['test', '-f', '/'], ['test', '-e', '/nonexistent'], ['test', '(', 'x', ')'],
+    ['test', 'x', '-a', ''], ['test', '', '-o', '', '-o', 'y'], ['test', '!', '(', 'a', '=', 'b', ')'],
+    ['test', 'a', '=', 'a', '-a', 'b', '=', 'c'], ['[', '1', '-eq', '1', ']'], ['[', '-t', '1', ']'],
+    ['true'], ['false'], ['pwd'], ['pwd', '-P'],
+    ['cat', '/etc/passwd'], ['cat', '/nonexistent', '/etc/passwd'], ['cat', '/'],
+]
+
+class TestCoreutils(unittest.TestCase):
+    def test_matches_binaries(self):
+        for args in CASES:
+            with self.subTest(args=args):
+                binary = shutil.which(args[0])
+                if binary is None:
+                    continue
+                got = run_in_process(args)
+                self.assertIsNotNone(got)
+                ref = subprocess.run(args, executable=binary, capture_output=True, stdin=subprocess.DEVNULL)
+                self.assertEqual(got, (ref.returncode, ref.stdout, ref.stderr.replace(binary.encode(), args[0].encode())))
+
+    def test_defers_to_binary(self):
+        # Errors and unsupported features are left to coreutils, with its messages
+        for args in (['printf', '%d\\n', 'abc'], ['printf', '%q', 'a'], ['printf'], ['echo', '--help'],
+                     ['test', 'a', '-eq', '1'], ['test', 'a', 'b'], ['[', 'x'], ['cat', '-n'], ['pwd', '-x']):
+            with self.subTest(args=args):
+                self.assertIsNone(coreutils.prepare(args))
+
+
+class TestInPipelines(unittest.TestCase):
+    def setUp(self):
+        self.parser = CommandParser()
+        self.executor = CommandExecutor()
+
+    def run_line(self, line):
+        capture = Capture()
+        status, _ = self.executor.execute(self.parser.parse(line), stdout=capture)
+        return status, capture.text()
+
+    def test_pipelines(self):
+        self.assertEqual(self.run_line('printf "b\\na\\n" | sort | cat'), (0, 'a\nb\n'))
+        self.assertEqual(self.run_line('echo hi | tr a-z A-Z'), (0, 'HI\n'))
+        self.assertEqual(self.run_line('! [ -d / ]')[0], 1)
+        self.assertEqual(self.run_line('cat /nonexistent 2>&1'), (1, 'cat: /nonexistent: No such file or directory\n'))
+        # The reader quits early: the writer ends as if killed by SIGPIPE
+        self.assertEqual(self.run_line('yes | head -n 1 | cat'), (0, 'y\n'))
+
+    def test_redirects(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'out')
+            self.assertEqual(self.run_line(f'echo one > {path}'), (0, ''))
+            self.assertEqual(self.run_line(f'printf "%s\\n" two >> {path}'), (0, ''))
+            self.assertEqual(self.run_line(f'cat < {path}'), (0, 'one\ntwo\n'))
+            self.assertEqual(self.run_line(f'cat {path} >> {path} 2>/dev/null'), (1, ''))
+            self.assertEqual(self.run_line(f'cat {path} 2>/dev/null'), (0, 'one\ntwo\n'))
+
+    def test_external_override(self):
+        self.executor.external.add('echo')
+        procs = []
+        status, _ = self.executor.execute(self.parser.parse('echo hi > /dev/null'), procs=procs)
+        self.assertEqual(status, 0)
+        self.assertIsNotNone(procs[0].pid)
+        self.executor.external.clear()
+        procs = []
+        self.executor.execute(self.parser.parse('echo hi > /dev/null'), procs=procs)
+        self.assertIsNone(procs[0].pid)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+test_globbing.py - Tests for brace expansion and pathname globbing of arguments.
+"""
+import io
+import os
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+import globbing
+from globbing import Globber, NoMatch, expand_braces
+from lexer import glob_pattern
+from parser import CommandParser
+from script import ScriptInterpreter
+
+class TestPatterns(unittest.TestCase):
+    def test_glob_pattern_escapes_quoted_parts(self):
+        self.assertEqual(glob_pattern('*.py'), '*.py')
+        self.assertEqual(glob_pattern('"my dir"/*'), 'my dir/*')
+        self.assertEqual(glob_pattern("'[x]'*"), '\\[x\\]*')
+        self.assertEqual(glob_pattern('a\\*b*'), 'a\\*b*')
+        self.assertIsNone(glob_pattern('"*.py"'))
+        self.assertIsNone(glob_pattern('plain'))
+
+    def test_braces(self):
+        self.assertEqual(expand_braces('a{b,c}d'), ['abd', 'acd'])
+        self.assertEqual(expand_braces('{x,y{1,2}}z'), ['xz', 'y1z', 'y2z'])
+        self.assertEqual(expand_braces('{1..3}'), ['1', '2', '3'])
+        self.assertEqual(expand_braces('{08..10}'), ['08', '09', '10'])
+        self.assertEqual(expand_braces('{5..1..2}'), ['5', '3', '1'])
+        self.assertEqual(expand_braces('{c..a}'), ['c', 'b', 'a'])
+        for word in ('{}', '{a}', '${x}', '\\{a,b}', '{a,b'):
+            self.assertEqual(expand_braces(word), [word])
+
+    def test_parser_records_patterns(self):
+        cmd = CommandParser().parse('ls -l *.py "*.txt" src/{a,b}.c x=[').commands[0]
+        self.assertEqual(cmd.globs, [(2, '*.py'), (4, 'src/{a,b}.c'), (5, 'x=[')])
+
+class TestGlobber(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        for path in ('a.py', 'b.py', 'c.txt', '.hidden', 'a-b/x.py', 'a/x.py', 'a/b/c/y.py', 'a/.d/z.py', 'q [1]/f'):
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            open(path, 'w').close()
+        os.symlink('a', 'link')
+        self.globber = Globber()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def expand(self, pattern):
+        return self.globber.expand(pattern)
+
+    def test_wildcards(self):
+        self.assertEqual(self.expand('*.py'), ['a.py', 'b.py'])
+        self.assertEqual(self.expand('?.*'), ['a.py', 'b.py', 'c.txt'])
+        self.assertEqual(self.expand('[!a].py'), ['b.py'])
+        self.assertEqual(self.expand('*/x.py'), ['a-b/x.py', 'a/x.py', 'link/x.py'])
+        self.assertEqual(self.expand('a*/'), ['a-b/', 'a/'])
+        self.assertEqual(self.expand('q\\ \\[1\\]/*'), ['q [1]/f'])
+        self.assertEqual(self.expand(os.path.join(self.tmp.name, '*.txt')), [os.path.join(self.tmp.name, 'c.txt')])
+
+    def test_globstar(self):
+        # Sorted as whole paths; the symlink to a/ is not followed, .d is hidden
+        self.assertEqual(self.expand('**/*.py'), ['a-b/x.py', 'a.py', 'a/b/c/y.py', 'a/x.py', 'b.py'])
+        self.assertEqual(self.expand('a/**'), ['a/b', 'a/b/c', 'a/b/c/y.py', 'a/x.py'])
+        self.globber.dotglob = True
+        self.assertEqual(self.expand('a/**/*.py'), ['a/.d/z.py', 'a/b/c/y.py', 'a/x.py'])
+
+    def test_no_match(self):
+        self.assertEqual(self.expand('*.c'), ['*.c'])
+        self.assertEqual(self.expand('['), ['['])
+        self.globber.nullglob = True
+        self.assertEqual(self.expand('*.c'), [])
+        self.globber.failglob = True
+        with self.assertRaises(NoMatch):
+            self.expand('*.c')
+
+    def test_dotglob(self):
+        self.assertNotIn('.hidden', self.expand('*'))
+        self.assertEqual(self.expand('.h*'), ['.hidden'])
+        self.globber.dotglob = True
+        self.assertIn('.hidden', self.expand('*'))
+
+    def test_shopt_errors_go_to_stderr(self):
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            self.assertEqual(self.globber.builtin(['-s', 'extglob']), 1)
+        self.assertEqual((out.getvalue(), err.getvalue()), ('', 'shopt: extglob: invalid shell option name\n'))
+
+    def test_directory_read_once_per_command(self):
+        cmd = CommandParser().parse('echo *.py *.txt a/*.py').commands[0]
+        with mock.patch.object(globbing.os, 'scandir', wraps=os.scandir) as scandir:
+            expanded = self.globber.command(cmd)
+        self.assertEqual(expanded.args, ['echo', 'a.py', 'b.py', 'c.txt', 'a/x.py'])
+        self.assertEqual(sorted(call.args[0] for call in scandir.call_args_list), ['.', 'a/'])
+        self.assertIsNot(expanded, cmd)
+        self.assertEqual(cmd.args, ['echo', '*.py', '*.txt', 'a/*.py'])
+
+class TestScripts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        for name in ('one.py', 'two.py'):
+            open(name, 'w').close()
+        self.interpreter = ScriptInterpreter()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def output(self, source):
+        self.interpreter.run_source(source)
+        with open('out') as f:
+            return f.read()
+
+    def test_arguments_and_loops(self):
+        self.assertEqual(self.output('echo *.py "*.py" {x,y} > out\n'), 'one.py two.py *.py x y\n')
+        self.assertEqual(self.output('for f in *.py; do echo $f >> out2; done; mv out2 out\n'), 'one.py\ntwo.py\n')
+
+    def test_options(self):
+        self.assertEqual(self.output('set -f\necho *.py > out\nset +f\n'), '*.py\n')
+        self.interpreter.run_source('shopt -s failglob\necho *.c > out\n')
+        self.assertEqual(self.interpreter.last_status, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+test_heredoc.py - Tests for here-documents and here-strings.
+"""
+import os
+import stat
+import tempfile
+import unittest
+import heredoc
+from parser import CommandParser
+from script import ScriptInterpreter, IncompleteScript
+
+class TestInputFd(unittest.TestCase):
+    def read_all(self, fd):
+        chunks = []
+        try:
+            while True:
+                chunk = os.read(fd, 1 << 20)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        finally:
+            os.close(fd)
+
+    def test_small_body_is_a_pipe(self):
+        fd = heredoc.input_fd(b'hello\n')
+        self.assertTrue(stat.S_ISFIFO(os.fstat(fd).st_mode))
+        self.assertEqual(self.read_all(fd), b'hello\n')
+
+    def test_large_body(self):
+        data = os.urandom(3 * heredoc.PIPE_SIZE + 7)
+        fd = heredoc.input_fd(data)
+        if hasattr(os, 'memfd_create'):
+            # Held in memory, not on disk, and seekable
+            self.assertTrue(stat.S_ISREG(os.fstat(fd).st_mode))
+            self.assertEqual(os.fstat(fd).st_size, len(data))
+        self.assertEqual(self.read_all(fd), data)
+
+    def test_empty_body(self):
+        self.assertEqual(self.read_all(heredoc.input_fd(b'')), b'')
+
+class TestReading(unittest.TestCase):
+    def test_delimiters(self):
+        self.assertEqual(heredoc.delimiters("cat <<EOF | tr a b <<-'X' 2<<\"Y\""),
+                         [('<<', 'EOF'), ('<<-', "'X'"), ('<<', '"Y"')])
+        self.assertEqual(heredoc.delimiters("echo '<<EOF' <<< word"), [])
+
+    def test_read_body(self):
+        lines = iter(['\tone $x', 'EOF', 'after'])
+        next_line = lambda: next(lines, None)
+        self.assertEqual(heredoc.read_body('<<', 'EOF', next_line), '\tone $x\n')
+        self.assertEqual(next_line(), 'after')
+        lines = iter(['\t\tone', '\tEOF'])
+        self.assertEqual(heredoc.read_body('<<-', "'EOF'", lambda: next(lines, None)), b'one\n')
+        self.assertIsNone(heredoc.read_body('<<', 'EOF', lambda: None))
+
+    def test_attach(self):
+        parsed = CommandParser().parse('cat <<A && (cat <<B) | cat <<C')
+        heredoc.attach(parsed, ['a\n', 'b\n', b'c\n'])
+        self.assertEqual(heredoc.pending(parsed), [])
+        bodies = [r.body for item, _ in parsed.items for cmd in item.commands
+                  for r in getattr(cmd, 'redirects', ()) if r.body is not None]
+        self.assertEqual(bodies, ['a\n', b'c\n'])
+
+class TestScripts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, 'out')
+        self.interpreter = ScriptInterpreter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_script(self, source):
+        self.interpreter.run_source(source.replace('OUT', self.out))
+        with open(self.out) as f:
+            return f.read()
+
+    def test_unquoted_body_is_expanded(self):
+        self.assertEqual(self.run_script('x=world\ncat <<EOF > OUT\nhello $x ${x}! \\$x\nEOF\n'),
+                         'hello world world! $x\n')
+
+    def test_quoted_body_is_literal(self):
+        self.assertEqual(self.run_script("x=world\ncat <<'EOF' > OUT\nhello $x \\$x\nEOF\n"),
+                         'hello $x \\$x\n')
+
+    def test_strip_tabs(self):
+        self.assertEqual(self.run_script('cat <<-EOF > OUT\n\t\tindented\n\tEOF\n'), 'indented\n')
+
+    def test_body_in_loop_expanded_each_time(self):
+        self.assertEqual(self.run_script('for i in 1 2; do cat <<EOF >> OUT; done\ni=$i\nEOF\n'), 'i=1\ni=2\n')
+
+    def test_pipeline_and_here_string(self):
+        self.assertEqual(self.run_script("x='a b'\ncat <<EOF | tr a-z A-Z > OUT\nup\nEOF\ncat <<< \"$x\" >> OUT\n"),
+                         'UP\na b\n')
+
+    def test_large_body(self):
+        body = 'line of a generated config\n' * 100000
+        self.assertEqual(self.run_script(f"cat <<'EOF' > OUT\n{body}EOF\n"), body)
+
+    def test_missing_delimiter(self):
+        with self.assertRaises(IncompleteScript):
+            self.interpreter.run_source('cat <<EOF\nno end\n')
+
+if __name__ == '__main__':
+    unittest.main()
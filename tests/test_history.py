@@ -0,0 +1,92 @@
+"""
+test_history.py - Tests for the persistent, indexed command history.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+from history import HistoryManager
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'history')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_expansion_and_dedup(self):
+        h = HistoryManager()
+        for line in ('git status', 'ls', 'git commit -m x', 'ls', 'make'):
+            h.add(line)
+        self.assertEqual(h.history, ['git status', 'git commit -m x', 'ls', 'make'])
+        self.assertEqual(h.expand('!!'), 'make')
+        self.assertEqual(h.expand('!git'), 'git commit -m x')
+        self.assertEqual(h.expand('!git s'), 'git status')
+        self.assertEqual(h.expand('!1'), 'git status')
+        self.assertEqual(h.expand('!nothing'), '!nothing')
+        self.assertEqual(h.search('git'), ['git commit -m x', 'git status'])
+
+    def test_bounded_memory(self):
+        h = HistoryManager(max_entries=100)
+        for i in range(1000):
+            h.add(f'cmd {i}')
+        self.assertLessEqual(len(h), 125)
+        self.assertEqual(h.last(), 'cmd 999')
+        self.assertEqual(h.expand('!cmd 99'), 'cmd 999')
+        self.assertEqual(h.expand('!cmd 1'), '!cmd 1')
+
+    def test_persistent_across_sessions(self):
+        first = HistoryManager(self.path)
+        second = HistoryManager(self.path)
+        first.add('echo one')
+        second.add('echo "two\nlines"')
+        first.add('ls')
+        first.add('echo one')
+        first.close()
+        second.close()
+        third = HistoryManager(self.path)
+        self.assertEqual(third.history, ['echo "two\nlines"', 'ls', 'echo one'])
+        self.assertEqual(third.expand('!echo "'), 'echo "two\nlines"')
+        third.close()
+
+    def test_load_reads_tail_and_compacts(self):
+        with open(self.path, 'w') as f:
+            for i in range(1000):
+                f.write(f'cmd {i % 50}\n')
+        h = HistoryManager(self.path, max_entries=20)
+        self.assertEqual(h.history, [f'cmd {i}' for i in range(30, 50)])
+        h.close()
+        with open(self.path) as f:
+            self.assertEqual(f.read().splitlines(), h.history)
+
+    def test_failed_compaction_keeps_the_file(self):
+        with open(self.path, 'w') as f:
+            f.write('a\nb\na\n')
+        h = HistoryManager(self.path)
+        with mock.patch('history.os.replace', side_effect=OSError('disk full')):
+            self.assertFalse(h.compact())
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'a\nb\na\n')
+        self.assertEqual(os.listdir(self.dir.name), ['history'])
+        h.add('c')
+        h.close()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'a\nb\na\nc\n')
+
+    def test_sessions_follow_a_compacted_file(self):
+        with open(self.path, 'w') as f:
+            f.write('a\nb\na\n')
+        first = HistoryManager(self.path)
+        second = HistoryManager(self.path)
+        self.assertTrue(first.compact())
+        second.add('c')
+        first.add('d')
+        first.close()
+        second.close()
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'b\na\nc\nd\n')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+if __name__ == '__main__':
+    unittest.main()
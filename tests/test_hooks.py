@@ -0,0 +1,95 @@
+"""
+test_hooks.py - Tests for hook dispatch, latency budgets and the worker queue.
+"""
+import io
+import time
+import threading
+import unittest
+import contextlib
+from hooks import HookManager, async_hook, sync_hook
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.hooks = HookManager(budget=0.05)
+        self.out = io.StringIO()
+
+    def fire(self, kind, *args):
+        with contextlib.redirect_stdout(self.out):
+            self.hooks.fire(kind, *args)
+
+    def test_sync_hook_blocks(self):
+        seen = []
+        self.hooks.register('pre_exec_hooks', lambda line: seen.append((line, threading.current_thread())))
+        self.fire('pre_exec_hooks', 'ls')
+        # Ran before fire() returned, on the calling thread
+        self.assertEqual(seen, [('ls', threading.current_thread())])
+
+    def test_async_hook_does_not_delay(self):
+        done = threading.Event()
+        @async_hook
+        def slow(line, status):
+            time.sleep(0.2)
+            done.set()
+        self.hooks.register('post_exec_hooks', slow)
+        start = time.perf_counter()
+        self.fire('post_exec_hooks', 'ls', 0)
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(self.hooks.drain(2))
+        self.assertTrue(done.is_set())
+        stats = self.hooks.stats[slow]
+        self.assertEqual((stats.mode, stats.calls, stats.overruns), ('async', 1, 1))
+
+    def test_coroutine_hook_is_async(self):
+        seen = []
+        async def audit(line):
+            seen.append(line)
+        self.hooks.register('pre_exec_hooks', audit)
+        self.fire('pre_exec_hooks', 'make')
+        self.assertTrue(self.hooks.drain(2))
+        self.assertEqual(seen, ['make'])
+        self.assertEqual(self.hooks.stats[audit].mode, 'async')
+
+    def test_budget_disables_after_strikes(self):
+        calls = []
+        @sync_hook(budget=0.001)
+        def slow(line):
+            calls.append(line)
+            time.sleep(0.005)
+        self.hooks.register('pre_exec_hooks', slow)
+        for i in range(5):
+            self.fire('pre_exec_hooks', str(i))
+        self.assertEqual(calls, ['0', '1', '2'])
+        self.assertTrue(self.hooks.stats[slow].disabled)
+        self.assertIn('disabled test_hooks.TestHooks.test_budget_disables_after_strikes.<locals>.slow', self.out.getvalue())
+        with contextlib.redirect_stdout(self.out):
+            self.assertEqual(self.hooks.builtin(['enable', 'slow']), 0)
+        self.fire('pre_exec_hooks', 'again')
+        self.assertEqual(calls[-1], 'again')
+
+    def test_errors_and_full_queue(self):
+        gate = threading.Event()
+        started = threading.Event()
+        def boom(line):
+            raise RuntimeError('bad hook')
+        @async_hook
+        def blocked(line):
+            started.set()
+            gate.wait(2)
+        self.hooks.queue.maxsize = 1
+        self.hooks.register('pre_exec_hooks', boom)
+        self.hooks.register('pre_exec_hooks', blocked)
+        self.fire('pre_exec_hooks', 'x')
+        started.wait(2)
+        for _ in range(3):
+            self.fire('pre_exec_hooks', 'x')
+        gate.set()
+        self.hooks.drain(2)
+        self.assertIn('[plugin pre-exec error] bad hook', self.out.getvalue())
+        self.assertEqual(self.hooks.stats[boom].errors, 4)
+        # One running, one queued, the rest dropped
+        self.assertEqual(self.hooks.stats[blocked].dropped, 2)
+        report = self.hooks.report()
+        self.assertIn('test_hooks.TestHooks.test_errors_and_full_queue.<locals>.boom', report)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+test_jobcontrol.py - Tests for the job table and the SIGCHLD reaper.
+"""
+import io
+import os
+import time
+import signal
+import unittest
+import contextlib
+from parser import CommandParser
+from executor import CommandExecutor
+from jobcontrol import JobControl
+
+class TestJobControl(unittest.TestCase):
+    def setUp(self):
+        self.parser = CommandParser()
+        self.executor = CommandExecutor()
+        self.jobs = JobControl()
+        self.previous = signal.getsignal(signal.SIGCHLD)
+
+    def tearDown(self):
+        for job in list(self.jobs.jobs.values()):
+            try:
+                os.killpg(job.pgid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.jobs.wait_all()
+        signal.signal(signal.SIGCHLD, self.previous)
+
+    def start(self, line):
+        procs = []
+        _, process = self.executor.execute(self.parser.parse(line), run_in_bg=True, procs=procs)
+        return self.jobs.add_job(process, line, procs)
+
+    def test_pipeline_is_one_process_group(self):
+        job = self.start('sleep 5 | sleep 5 | cat')
+        self.assertEqual(len(job.pids), 3)
+        self.assertEqual({os.getpgid(pid) for pid in job.pids}, {job.pgid})
+        self.assertIs(self.jobs.find(job.pgid), job)
+        self.assertIs(self.jobs.find(f'%{job.id}'), job)
+
+    def test_reaped_on_sigchld(self):
+        job = self.start('sh -c "exit 4"')
+        deadline = time.monotonic() + 5
+        while not job.finished and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Collected by the signal handler: no zombie left behind
+        self.assertTrue(job.finished)
+        self.assertEqual(job.exit_status, 4)
+        self.assertFalse(os.path.exists(f'/proc/{job.pid}'))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.jobs.notify()
+        self.assertIn('Exit 4', out.getvalue())
+        self.assertEqual(self.jobs.jobs, {})
+
+    def test_fg_waits_for_whole_pipeline(self):
+        job = self.start('sleep 0.1 | sh -c "cat; exit 7"')
+        with contextlib.redirect_stdout(io.StringIO()):
+            status = self.jobs.fg(str(job.id))
+        self.assertEqual(status, 7)
+        self.assertTrue(job.finished)
+        self.assertIsNone(self.jobs.find(job.id))
+
+    def test_stop_and_continue(self):
+        job = self.start('sleep 5')
+        os.killpg(job.pgid, signal.SIGSTOP)
+        deadline = time.monotonic() + 5
+        while job.status != 'Stopped' and time.monotonic() < deadline:
+            time.sleep(0.01)
+            self.jobs.reap()
+        self.assertEqual(job.status, 'Stopped')
+        self.assertEqual(self.jobs.bg(job.id), 0)
+        self.assertEqual(job.status, 'Running')
+        self.assertEqual(self.jobs.disown(job.id), 0)
+        self.assertIsNone(self.jobs.find(job.id))
+        os.killpg(job.pgid, signal.SIGKILL)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+test_parallel.py - Tests for the parallel builtin.
+"""
+import os
+import time
+import tempfile
+import unittest
+from script import ScriptInterpreter
+from parallel import parse_options, command_line, ParallelUsage
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = ScriptInterpreter()
+        self.dir = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.dir.name, 'out')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_line(self, line):
+        status = self.interpreter.run_line(f"{line} > {self.out}")
+        with open(self.out) as f:
+            return status, f.read()
+
+    def test_options(self):
+        options, words, args = parse_options(['-j4', '-k', '--halt', 'now,fail=1', 'gzip', '{}', ':::', 'a', 'b'])
+        self.assertEqual(options, {'jobs': 4, 'keep_order': True, 'halt': 'now'})
+        self.assertEqual((words, args), (['gzip', '{}'], ['a', 'b']))
+        self.assertEqual(command_line(['echo'], "it's"), "echo 'it'\"'\"'s'")
+        self.assertRaises(ParallelUsage, parse_options, ['-j', '0', 'echo'])
+
+    def test_bounded_jobs(self):
+        start = time.monotonic()
+        status, _ = self.run_line('parallel -j 2 sleep ::: 0.2 0.2 0.2 0.2')
+        elapsed = time.monotonic() - start
+        self.assertEqual(status, 0)
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertLess(elapsed, 0.75)
+
+    def test_grouped_output_in_order(self):
+        status, out = self.run_line(
+            "parallel -j 3 -k \"sh -c 'echo {}; sleep 0.0$((4-{})); echo {}'\" ::: 1 2 3")
+        self.assertEqual(status, 0)
+        self.assertEqual(out, '1\n1\n2\n2\n3\n3\n')
+
+    def test_args_from_pipeline(self):
+        status, out = self.run_line('seq 20 | parallel -j 4 echo n')
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(out.split('\n')[:-1]), sorted(f'n {i}' for i in range(1, 21)))
+
+    def test_jobs_expand_words(self):
+        for name in ('a.txt', 'b.txt'):
+            open(os.path.join(self.dir.name, name), 'w').close()
+        self.interpreter.variables.set('greeting', 'hi')
+        status, out = self.run_line(f"parallel -k 'echo $greeting {{}} {self.dir.name}/*.txt' ::: 1 2")
+        self.assertEqual(status, 0)
+        files = f'{self.dir.name}/a.txt {self.dir.name}/b.txt'
+        self.assertEqual(out, f'hi 1 {files}\nhi 2 {files}\n')
+
+    def test_failures_and_halt(self):
+        self.assertEqual(self.run_line('parallel "sh -c \'exit {}\'" ::: 0 1 2')[0], 2)
+        start = time.monotonic()
+        status, _ = self.run_line("parallel -j 4 --halt now \"sh -c 'sleep {}; exit 5'\" ::: 0.05 5 5 5 5")
+        self.assertEqual(status, 5)
+        self.assertLess(time.monotonic() - start, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+test_pathcache.py - Tests for the PATH command hash table.
+"""
+import unittest
+import tempfile
+import shutil
+import os
+from unittest import mock
+from pathcache import CommandHashTable, NGramIndex
+from shell_builtins import Builtins
+
+class TestCommandHashTable(unittest.TestCase):
+    def setUp(self):
+        self.bindir = tempfile.mkdtemp()
+        for name in ['grep', 'git', 'python3', 'ls']:
+            self.make_command(name)
+        self.table = CommandHashTable(path=self.bindir)
+
+    def tearDown(self):
+        shutil.rmtree(self.bindir)
+
+    def make_command(self, name):
+        path = os.path.join(self.bindir, name)
+        with open(path, 'w') as f:
+            f.write('#!/bin/sh\n')
+        os.chmod(path, 0o755)
+        return path
+
+    def test_lookup_resolves_and_counts_hits(self):
+        self.assertEqual(self.table.lookup('git'), os.path.join(self.bindir, 'git'))
+        self.table.lookup('git')
+        self.assertEqual(self.table.hits['git'], 2)
+        self.assertIsNone(self.table.lookup('no-such-command'))
+
+    def test_directory_change_invalidates_table(self):
+        self.assertIsNone(self.table.lookup('newcmd'))
+        path = self.make_command('newcmd')
+        # Make sure the directory mtime moves even on coarse-grained filesystems
+        st = os.stat(self.bindir)
+        os.utime(self.bindir, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(self.table.lookup('newcmd'), path)
+
+    def test_hashed_location_is_checked(self):
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        moved = os.path.join(other, 'git')
+        shutil.copy(os.path.join(self.bindir, 'git'), moved)
+        table = CommandHashTable()
+        with mock.patch.dict(os.environ, PATH=self.bindir):
+            self.assertEqual(table.lookup('git'), os.path.join(self.bindir, 'git'))
+        # A new PATH drops what the old one resolved
+        with mock.patch.dict(os.environ, PATH=other + os.pathsep + self.bindir):
+            self.assertEqual(table.lookup('git'), moved)
+            # A remembered file that is gone is looked up again
+            st = os.stat(other)
+            os.remove(moved)
+            os.utime(other, ns=(st.st_atime_ns, st.st_mtime_ns))
+            self.assertEqual(table.lookup('git'), os.path.join(self.bindir, 'git'))
+
+    def test_suggest(self):
+        self.assertEqual(self.table.suggest('gti')[0], 'git')
+        self.assertIn('grep', self.table.suggest('grpe'))
+        self.assertEqual(self.table.suggest('zzzzzz'), [])
+
+    def test_ngram_search(self):
+        index = NGramIndex(['book', 'books', 'cake', 'boo', 'cape', 'ab', 'ba'])
+        self.assertEqual(sorted(w for _, w in index.search('bok', 1)), ['boo', 'book'])
+        self.assertEqual(sorted(index.search('cakes', 2)), [(1, 'cake'), (2, 'cape')])
+        # A transposition leaves 'ab' no bigram in common with 'ba'
+        self.assertEqual(sorted(index.search('ab', 1)), [(0, 'ab'), (1, 'ba')])
+
+    def test_hash_builtin(self):
+        builtins = Builtins(hashtable=self.table)
+        builtins.hash(['-p', '/opt/tool', 'tool'])
+        self.assertEqual(self.table.lookup('tool'), '/opt/tool')
+        builtins.hash(['-r'])
+        self.assertEqual(self.table.hashed, {})
+
+if __name__ == '__main__':
+    unittest.main()
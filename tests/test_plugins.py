@@ -0,0 +1,86 @@
+"""
+test_plugins.py - Tests for plugin discovery, the manifest and lazy activation.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from diskcache import DiskCache
+from completion import CompletionEngine
+from plugins import PluginManager, load_plugins
+
+PLUGIN = '''
+import sys
+sys.modules['__plugin_loads__'].append(__name__)
+
+class Plugin:
+    def activate(self, shell):
+        shell['custom_commands']['greet'] = self.greet
+        shell['completion'].register('greet', lambda text, state: ['world'][state] if state == 0 else None)
+        shell['pre_exec_hooks'].append(self.before)
+    def greet(self, *args):
+        return 'hello ' + ' '.join(args)
+    def before(self, line):
+        sys.modules['__plugin_loads__'].append('hook:' + line)
+'''
+
+class TestPlugins(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, 'plugins')
+        os.mkdir(self.dir)
+        with open(os.path.join(self.dir, 'greeter.py'), 'w') as f:
+            f.write(PLUGIN)
+        self.store = DiskCache(os.path.join(self.tmp.name, 'cache'))
+        self.events = sys.modules['__plugin_loads__'] = []
+
+    def tearDown(self):
+        del sys.modules['__plugin_loads__']
+        self.tmp.cleanup()
+
+    def manager(self):
+        shell = {'completion': CompletionEngine()}
+        return shell, PluginManager(shell, self.dir, self.store)
+
+    def test_manifest_defers_import(self):
+        shell, manager = self.manager()
+        manager.load()
+        # No manifest yet: imported once to learn what it registers
+        self.assertEqual(self.events, ['greeter'])
+        shell, manager = self.manager()
+        manager.load()
+        self.assertEqual(self.events, ['greeter'])
+        self.assertEqual(manager.plugins, {})
+        self.assertIn('greet', shell['custom_commands'])
+        # The first use imports and activates it, exactly once
+        self.assertEqual(shell['custom_commands']['greet']('you'), 'hello you')
+        self.assertEqual(shell['completion'].custom_completions['greet']('', 0), 'world')
+        for hook in shell['pre_exec_hooks']:
+            hook('ls')
+        self.assertEqual(self.events, ['greeter', 'greeter', 'hook:ls'])
+        self.assertEqual(len(shell['pre_exec_hooks']), 1)
+
+    def test_changed_plugin_is_reimported(self):
+        self.manager()[1].load()
+        with open(os.path.join(self.dir, 'greeter.py'), 'a') as f:
+            f.write('\n# changed\n')
+        shell, manager = self.manager()
+        manager.load()
+        self.assertEqual(self.events, ['greeter', 'greeter'])
+        self.assertIn('greeter', manager.plugins)
+        self.assertEqual(shell['custom_commands']['greet'](), 'hello ')
+
+    def test_eager_load_activates_once(self):
+        shell = {'completion': CompletionEngine()}
+        plugins = load_plugins(shell, self.dir)
+        self.assertEqual(len(plugins), 1)
+        self.assertEqual(len(shell['pre_exec_hooks']), 1)
+        self.assertEqual(self.events, ['greeter'])
+
+    def test_missing_directory(self):
+        missing = os.path.join(self.tmp.name, 'none')
+        self.assertEqual(PluginManager({}, missing, self.store).load(), 0)
+        self.assertFalse(os.path.exists(missing))
+
+if __name__ == '__main__':
+    unittest.main()
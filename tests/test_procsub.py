@@ -0,0 +1,87 @@
+"""
+test_procsub.py - Tests for process substitution, <(list) and >(list).
+"""
+import os
+import tempfile
+import unittest
+from lexer import tokenize, PROCSUB
+from parser import CommandParser
+from nodes import ProcessSubstitution, Pipeline, ListNode
+from script import ScriptInterpreter, split_statements
+
+class TestParsing(unittest.TestCase):
+    def test_tokenize(self):
+        tokens = tokenize('diff <(sort a; echo ")") >(wc -l) < b')
+        self.assertEqual([t.value for t in tokens], ['diff', '<(sort a; echo ")")', '>(wc -l)', '<', 'b'])
+        self.assertEqual(tokens[1].kind, PROCSUB)
+
+    def test_parse(self):
+        cmd = CommandParser().parse('diff <(sort a) -u >(cat) < <(ls; pwd)').commands[0]
+        self.assertEqual(cmd.args, ['diff', '<(sort a)', '-u', '>(cat)'])
+        (first, sort), (second, cat), (redirect, ls) = cmd.substitutions
+        self.assertEqual((first, second), (1, 3))
+        self.assertIs(redirect, cmd.redirects[0])
+        self.assertEqual((sort.op, cat.op, ls.op), ('<', '>', '<'))
+        self.assertIsInstance(sort, ProcessSubstitution)
+        self.assertIsInstance(sort.body, Pipeline)
+        self.assertIsInstance(ls.body, ListNode)
+
+    def test_split_statements_keeps_parentheses(self):
+        self.assertEqual(split_statements('cat <(a; b) $(c; d); (e; f) | g; h'),
+                         ['cat <(a; b) $(c; d)', '(e; f) | g', 'h'])
+        self.assertEqual(split_statements('a|b) echo x;; *) echo y;;'),
+                         ['a|b) echo x', ';;', '*) echo y', ';;'])
+
+class TestRunning(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.interpreter = ScriptInterpreter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name, content=None):
+        path = os.path.join(self.tmp.name, name)
+        if content is not None:
+            with open(path, 'w') as f:
+                f.write(content)
+        return path
+
+    def output(self, source):
+        out = self.path('out')
+        status = self.interpreter.run_source(source.replace('OUT', out))
+        with open(out) as f:
+            return status, f.read()
+
+    def test_diff_of_two_substitutions(self):
+        a = self.path('a', 'b\na\nc\n')
+        b = self.path('b', 'c\nb\na\n')
+        self.assertEqual(self.output(f'diff <(sort {a}) <(sort {b}) > OUT'), (0, ''))
+        status, out = self.output(f'diff <(sort {a}) <(echo a) > OUT')
+        self.assertEqual(status, 1)
+        self.assertIn('< b', out)
+
+    def test_as_redirection_and_in_pipeline(self):
+        self.assertEqual(self.output('wc -l < <(seq 5; seq 3) > OUT')[1].strip(), '8')
+        self.assertEqual(self.output('cat <(echo one) | tr a-z A-Z > OUT')[1], 'ONE\n')
+
+    def test_output_substitutions_fan_out(self):
+        upper, count = self.path('upper'), self.path('count')
+        self.output(f'echo hello | tee >(tr a-z A-Z > {upper}) >(wc -c > {count}) > OUT')
+        with open(upper) as f:
+            self.assertEqual(f.read(), 'HELLO\n')
+        with open(count) as f:
+            self.assertEqual(f.read().strip(), '6')
+
+    def test_children_are_reaped(self):
+        procs = []
+        parsed = CommandParser().parse('cat <(true) <(true) > /dev/null')
+        self.interpreter.executor.execute(parsed, procs=procs)
+        self.assertEqual(len(procs), 3)
+        self.assertTrue(all(proc.returncode is not None for proc in procs))
+        for proc in procs:
+            with self.assertRaises(ChildProcessError):
+                os.waitpid(proc.pid, os.WNOHANG)
+
+if __name__ == '__main__':
+    unittest.main()
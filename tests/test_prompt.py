@@ -0,0 +1,81 @@
+"""
+test_prompt.py - Tests for prompt rendering and git branch detection.
+"""
+import unittest
+import tempfile
+import shutil
+import threading
+import os
+from prompt import PromptEngine, PromptTemplate, git_branch, find_git_dir
+from config import ShellConfig
+
+class TestPrompt(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.repo, '.git'))
+        os.makedirs(os.path.join(self.repo, 'src', 'pkg'))
+        self.write_head('ref: refs/heads/main\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def write_head(self, content):
+        head = os.path.join(self.repo, '.git', 'HEAD')
+        with open(head, 'w') as f:
+            f.write(content)
+        # Bump the mtime so the change is visible on coarse-grained filesystems
+        st = os.stat(head)
+        os.utime(head, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_git_branch_from_head(self):
+        self.assertEqual(git_branch(os.path.join(self.repo, 'src', 'pkg')), 'main')
+        self.write_head('0123456789abcdef0123456789abcdef01234567\n')
+        self.assertEqual(git_branch(self.repo), '0123456')
+
+    def test_git_branch_outside_repo(self):
+        plain = tempfile.mkdtemp()
+        try:
+            self.assertEqual(git_branch(plain), '')
+        finally:
+            shutil.rmtree(plain)
+
+    def test_git_dir_created_or_removed_above(self):
+        plain = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, plain)
+        cwd = os.path.join(plain, 'a', 'b')
+        os.makedirs(cwd)
+        self.assertIsNone(find_git_dir(cwd))
+        def touch(path):
+            # Coarse-grained filesystems may not move the mtime on their own
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        os.mkdir(os.path.join(plain, '.git'))
+        touch(plain)
+        self.assertEqual(find_git_dir(cwd), os.path.join(plain, '.git'))
+        os.rmdir(os.path.join(plain, '.git'))
+        touch(plain)
+        self.assertIsNone(find_git_dir(cwd))
+
+    def test_template_only_computes_used_fields(self):
+        template = PromptTemplate('{cwd}>{git:>5}$ ')
+        self.assertEqual(template.fields, {'cwd', 'git'})
+        self.assertEqual(template.render({'cwd': '/x', 'git': 'dev'}), '/x>  dev$ ')
+
+    def test_slow_segment_does_not_block(self):
+        engine = PromptEngine(budget=0.01)
+        release = threading.Event()
+        engine.register('slow', lambda cwd: release.wait(5) and 'ready', expensive=True)
+        self.assertEqual(engine.render('[{slow}]'), '[]')
+        release.set()
+        engine._pending[('slow', os.getcwd())].result(5)
+        self.assertEqual(engine.render('[{slow}]'), '[ready]')
+
+    def test_config_fallback_prompt(self):
+        config = ShellConfig()
+        config.config['THEME'] = 'no_such_theme'
+        config.config['PROMPT'] = 'sh:{cwd}$ '
+        self.assertEqual(config.render_prompt(), f'sh:{os.getcwd()}$ ')
+        self.assertIsNone(config._themes['no_such_theme'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+test_pump.py - Tests for pipeline output stages.
+"""
+import os
+import tempfile
+import unittest
+from parser import CommandParser
+from executor import CommandExecutor
+from pump import Capture, Meter, Tee, copy_fd
+
+class TestPump(unittest.TestCase):
+    def setUp(self):
+        self.parser = CommandParser()
+        self.executor = CommandExecutor()
+
+    def run_line(self, line, stdout):
+        return self.executor.execute(self.parser.parse(line), stdout=stdout)
+
+    def test_capture_more_than_pipe_buffer(self):
+        capture = Capture()
+        status, _ = self.run_line('head -c 300000 /dev/zero | cat', capture)
+        self.assertEqual(status, 0)
+        self.assertEqual(len(capture.data), 300000)
+
+    def test_capture_limit(self):
+        capture = Capture(limit=10)
+        self.run_line('seq 1 100000', capture)
+        self.assertEqual(capture.data, b'1\n2\n3\n4\n5\n')
+        self.assertTrue(capture.truncated)
+
+    def test_meter_and_tee(self):
+        with tempfile.TemporaryFile() as a, tempfile.TemporaryFile() as b:
+            meter = Meter(a.fileno())
+            self.run_line('printf hello', meter)
+            self.assertEqual(meter.bytes, 5)
+            tee = Tee(a.fileno(), b.fileno(), capture=True)
+            self.run_line('printf world', tee)
+            self.assertEqual(tee.data, b'world')
+            a.seek(0)
+            b.seek(0)
+            self.assertEqual((a.read(), b.read()), (b'helloworld', b'world'))
+
+    def test_stderr_follows_captured_stdout(self):
+        capture = Capture()
+        self.run_line('ls /no/such/path 2>&1', capture)
+        self.assertIn(b'/no/such/path', capture.data)
+
+    def test_copy_fd_from_file(self):
+        with tempfile.TemporaryFile() as src, tempfile.TemporaryFile() as dst:
+            src.write(b'x' * 100000)
+            src.flush()
+            src.seek(0)
+            self.assertEqual(copy_fd(src.fileno(), dst.fileno()), 100000)
+            self.assertEqual(os.fstat(dst.fileno()).st_size, 100000)
+
+if __name__ == '__main__':
+    unittest.main()
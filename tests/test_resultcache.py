@@ -0,0 +1,82 @@
+"""
+test_resultcache.py - Tests for the command result cache.
+"""
+import os
+import time
+import tempfile
+import unittest
+from script import ScriptInterpreter
+from resultcache import ResultCache, parse_options
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.interpreter = ScriptInterpreter()
+        self.interpreter.result_cache = ResultCache(os.path.join(self.dir.name, 'store'))
+        self.counter = os.path.join(self.dir.name, 'runs')
+        self.out = os.path.join(self.dir.name, 'out')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_line(self, line):
+        status = self.interpreter.run_line(f"{line} > {self.out} 2>&1")
+        with open(self.out) as f:
+            return status, f.read()
+
+    def runs(self):
+        with open(self.counter) as f:
+            return len(f.read())
+
+    def counting(self, text='hello'):
+        return f"sh -c 'printf x >> {self.counter}; echo {text}; echo warn >&2'"
+
+    def test_options(self):
+        options, argv = parse_options(['--ttl', '5', '--input', 'a', '--env', 'HOME', '--', 'ls', '-l'])
+        self.assertEqual((options['ttl'], options['inputs'], options['env'], argv), (5.0, ['a'], ['HOME'], ['ls', '-l']))
+
+    def test_hit_replays_without_spawning(self):
+        first = self.run_line(f"cache -- {self.counting()}")
+        second = self.run_line(f"cache -- {self.counting()}")
+        self.assertEqual(first, (0, 'hello\nwarn\n'))
+        self.assertEqual(second, first)
+        self.assertEqual(self.runs(), 1)
+        self.assertEqual((self.interpreter.result_cache.hits, self.interpreter.result_cache.misses), (1, 1))
+
+    def test_key_includes_inputs_and_env(self):
+        data = os.path.join(self.dir.name, 'data')
+        with open(data, 'w') as f:
+            f.write('1')
+        line = f"cache --input {data} --env CACHE_TEST -- {self.counting()}"
+        self.run_line(line)
+        self.run_line(line)
+        self.assertEqual(self.runs(), 1)
+        with open(data, 'w') as f:
+            f.write('22')
+        self.run_line(line)
+        self.assertEqual(self.runs(), 2)
+        os.environ['CACHE_TEST'] = 'x'
+        try:
+            self.run_line(line)
+        finally:
+            del os.environ['CACHE_TEST']
+        self.assertEqual(self.runs(), 3)
+
+    def test_ttl_and_failures(self):
+        self.run_line(f"cache --ttl 0.05 -- {self.counting()}")
+        time.sleep(0.1)
+        self.run_line(f"cache --ttl 0.05 -- {self.counting()}")
+        self.assertEqual(self.runs(), 2)
+        fail = f"cache -- sh -c 'printf x >> {self.counter}; exit 3'"
+        self.assertEqual(self.run_line(fail)[0], 3)
+        self.assertEqual(self.run_line(fail)[0], 3)
+        self.assertEqual(self.runs(), 4)
+
+    def test_config_patterns(self):
+        self.interpreter.result_cache.patterns = ['sh -c *printf x*']
+        self.run_line(self.counting())
+        self.run_line(self.counting())
+        self.assertEqual(self.runs(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
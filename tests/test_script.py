@@ -12,4 +12,96 @@ def test_sample_script():
     assert "Starting script..." in output
     assert "Current dir:" in output
     assert "Job 2 done" in output
-    assert "help" in output or "Built-in commands:" in output 
\ No newline at end of file
+    assert "help" in output or "Built-in commands:" in output 
+
+def make_interpreter(calls):
+    from script import ScriptInterpreter
+    record = lambda *args: calls.append(args)
+    return ScriptInterpreter(custom_commands={'record': record})
+
+def test_parse_nested_blocks():
+    from script import ScriptParser, For, If, While, Case, Function
+    nodes = ScriptParser().parse(
+        "f() { echo hi; }\n"
+        "for i in 1 2; do\n"
+        "  if [ $i = 1 ]; then\n"
+        "    while false; do echo no; done\n"
+        "  else\n"
+        "    case $i in 2) echo two ;; *) echo other ;; esac\n"
+        "  fi\n"
+        "done\n")
+    assert isinstance(nodes[0], Function) and nodes[0].name == 'f'
+    loop = nodes[1]
+    assert isinstance(loop, For) and loop.var == 'i'
+    branch = loop.body[0]
+    assert isinstance(branch, If)
+    assert isinstance(branch.clauses[0][1][0], While)
+    assert isinstance(branch.else_body[0], Case)
+
+def test_incomplete_script():
+    from script import ScriptParser, IncompleteScript
+    try:
+        ScriptParser().parse("for i in 1 2; do\n echo $i\n")
+    except IncompleteScript:
+        pass
+    else:
+        assert False, "expected IncompleteScript"
+
+def test_interpreter_runs_in_process():
+    calls = []
+    interp = make_interpreter(calls)
+    interp.run_source(
+        "greet() {\n"
+        "  record hello \"$1\"\n"
+        "}\n"
+        "x=0\n"
+        "for v in a b c; do\n"
+        "  case $v in\n"
+        "    b) continue ;;\n"
+        "  esac\n"
+        "  greet $v\n"
+        "done\n"
+        "record last $v\n")
+    assert calls == [('hello', 'a'), ('hello', 'c'), ('last', 'c')]
+    assert interp.variables['x'] == '0'
+
+def test_builtin_status_guards_lists(capsys):
+    calls = []
+    interp = make_interpreter(calls)
+    interp.run_source("cd /nonexistent-dir && record danger\n"
+                      "cd /nonexistent-dir || record handled\n"
+                      "record status $?\n"
+                      "export 1x=2\n"
+                      "record export $?\n")
+    assert calls == [('handled',), ('status', '0'), ('export', '1')]
+
+def test_exit_status_of_scripts(tmp_path):
+    shell_path = os.path.join(os.path.dirname(__file__), '../myshell.py')
+    script = tmp_path / 'exit.sh'
+    for source, code in (('exit 4\necho not reached\n', 4), ('false\nexit\n', 1), ('exit 300\n', 44),
+                         ('exit abc\n', 2), ('true\n', 0)):
+        script.write_text(source)
+        result = subprocess.run(['python3', shell_path, str(script)], capture_output=True, text=True)
+        assert result.returncode == code, source
+        assert 'not reached' not in result.stdout
+    result = subprocess.run(['python3', shell_path, '-c', 'exit 7'], capture_output=True)
+    assert result.returncode == 7
+
+def test_return_status(capsys):
+    from script import ScriptInterpreter
+    interp = ScriptInterpreter()
+    interp.run_source("f() { return abc; }\nf\n")
+    assert interp.last_status == 2
+    assert 'return: abc: numeric argument required' in capsys.readouterr().out
+    interp.run_source("g() { return 257; }\ng\n")
+    assert interp.last_status == 1
+
+def test_bad_quoting_in_words_is_a_syntax_error(capsys):
+    from script import ScriptInterpreter, Case, For
+    interp = ScriptInterpreter()
+    # Built by hand: the script parser never lets an open quote through
+    assert interp.run([Case("it's", [(['*'], [])])]) == 2
+    assert interp.run([For('w', "it's", [])]) == 2
+    assert 'syntax error' in capsys.readouterr().err
+    assert interp.run_source('x="it\'s"\ncase $x in it*) y=yes ;; esac\n') == 0
+    assert interp.variables['y'] == 'yes'
@@ -0,0 +1,45 @@
+"""
+test_scriptcache.py - Tests for the on-disk script cache and its LRU store.
+"""
+import os
+import tempfile
+import unittest
+from diskcache import DiskCache
+from scriptcache import ScriptCache
+from script import ScriptParser, For
+
+class TestScriptCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_hit_and_invalidation(self):
+        script = os.path.join(self.dir.name, 'loop.sh')
+        with open(script, 'w') as f:
+            f.write("for i in 1 2; do\n  echo $i\ndone\n")
+        cache = ScriptCache(os.path.join(self.dir.name, 'cache'))
+        parser = ScriptParser()
+        first = cache.load(script, parser)
+        second = cache.load(script, parser)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIsInstance(second[0], For)
+        self.assertEqual(second[0].body[0].line, first[0].body[0].line)
+        with open(script, 'w') as f:
+            f.write("echo changed\n")
+        st = os.stat(script)
+        os.utime(script, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(cache.load(script, parser)[0].line, 'echo changed')
+        self.assertEqual(cache.misses, 2)
+
+    def test_disk_cache_evicts_least_recently_used(self):
+        store = DiskCache(self.dir.name, max_bytes=250)
+        for i, key in enumerate(['a', 'b', 'c']):
+            store.put(key, b'x' * 100)
+            os.utime(store.path_for(key), ns=(i * 10**9, i * 10**9))
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(store.get('c'), b'x' * 100)
+
+if __name__ == '__main__':
+    unittest.main()
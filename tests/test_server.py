@@ -0,0 +1,69 @@
+"""
+test_server.py - Tests for the pre-forked shell server and its client.
+"""
+import os
+import sys
+import time
+import tempfile
+import unittest
+import subprocess
+from server import decode_request
+from shellclient import encode_request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+class TestProtocol(unittest.TestCase):
+    def test_round_trip(self):
+        frame = encode_request('/tmp', ['-c', 'echo "a b"', ''], {'A': '1', 'EQ': 'x=y'})
+        self.assertEqual(int.from_bytes(frame[:4], 'big'), len(frame) - 4)
+        self.assertEqual(decode_request(frame[4:]), ('/tmp', ['-c', 'echo "a b"', ''], {'A': '1', 'EQ': 'x=y'}))
+
+    def test_malformed(self):
+        for payload in (b'', b'9\0/\x000', b'1\0/\x005\0a'):
+            with self.assertRaises(ValueError):
+                decode_request(payload)
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.socket = os.path.join(self.tmp.name, 'server.sock')
+        self.env = dict(os.environ, MYSHELL_SOCKET=self.socket, HOME=self.tmp.name)
+        self.server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'myshell.py'), '--server'],
+                                       env=self.env, stderr=subprocess.DEVNULL)
+        self.addCleanup(self.server.wait)
+        self.addCleanup(self.server.terminate)
+        for _ in range(200):
+            if os.path.exists(self.socket):
+                break
+            time.sleep(0.025)
+
+    def client(self, *args, **kwargs):
+        return subprocess.run([sys.executable, os.path.join(ROOT, 'shellclient.py'), *args],
+                              capture_output=True, text=True, **kwargs)
+
+    def test_jobs_are_isolated(self):
+        result = self.client('-c', 'cd /; FOO=changed; echo $GREETING; pwd', cwd=self.tmp.name,
+                             env=dict(self.env, GREETING='hello'))
+        self.assertEqual(result.stdout, 'hello\n/\n')
+        # A new worker: the client's cwd and environment, nothing left from the last job
+        result = self.client('-c', 'echo $GREETING $FOO; pwd', cwd=self.tmp.name, env=self.env)
+        self.assertEqual(result.stdout, f'\n{os.path.realpath(self.tmp.name)}\n')
+
+    def test_stdio_and_status(self):
+        result = self.client('-c', 'cat; /bin/sh -c "echo oops >&2; exit 3"', input='piped\n', env=self.env)
+        self.assertEqual((result.stdout, result.stderr, result.returncode), ('piped\n', 'oops\n', 3))
+        script = os.path.join(self.tmp.name, 'job.sh')
+        with open(script, 'w') as f:
+            f.write('echo script $1\n')
+        result = self.client(script, 'arg', env=self.env)
+        self.assertEqual((result.stdout, result.returncode), ('script arg\n', 0))
+
+    def test_shutdown_removes_socket(self):
+        self.server.terminate()
+        self.assertEqual(self.server.wait(5), 0)
+        self.assertFalse(os.path.exists(self.socket))
+        self.assertEqual(self.client('-c', 'true', env=self.env).returncode, 127)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,10 +2,16 @@
 test_shell.py - Test suite for the advanced Python shell.
 """
 import unittest
+from unittest import mock
 from parser import CommandParser
+from executor import CommandExecutor
+from nodes import Pipeline, ListNode, Subshell, Redirect
+from lexer import tokenize
 from shell_builtins import Builtins
 from plugins import load_plugins
+import io
 import tempfile
+import contextlib
 import shutil
 import os
 
@@ -16,38 +22,88 @@ class TestShell(unittest.TestCase):
 
     def test_parse_simple_command(self):
         parsed = self.parser.parse('ls -l')
-        self.assertTrue(isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
-        if not (isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
+        self.assertTrue(isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
+        if not (isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
             return
         self.assertEqual(parsed['pipeline'][0]['args'], ['ls', '-l'])
 
     def test_parse_pipe(self):
         parsed = self.parser.parse('ls | grep py')
-        self.assertTrue(isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
-        if not (isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
+        self.assertTrue(isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
+        if not (isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
             return
         self.assertEqual(len(parsed['pipeline']), 2)
         self.assertEqual(parsed['pipeline'][1]['args'], ['grep', 'py'])
 
     def test_parse_redirection(self):
         parsed = self.parser.parse('echo hi > out.txt')
-        self.assertTrue(isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
-        if not (isinstance(parsed, dict) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
+        self.assertTrue(isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list))
+        if not (isinstance(parsed, Pipeline) and 'pipeline' in parsed and isinstance(parsed['pipeline'], list)):
             return
         self.assertEqual(parsed['pipeline'][0]['stdout'], 'out.txt')
 
+    def test_parse_quoted_operators(self):
+        parsed = self.parser.parse('echo "a | b" \'c & d\' e\\;f')
+        self.assertIsInstance(parsed, Pipeline)
+        self.assertEqual(parsed['pipeline'][0]['args'], ['echo', 'a | b', 'c & d', 'e;f'])
+
+    def test_parse_lists(self):
+        parsed = self.parser.parse('make && make test || echo failed; sleep 1 & wait')
+        self.assertIsInstance(parsed, ListNode)
+        self.assertEqual([op for _, op in parsed.items], ['&&', '||', ';', '&', None])
+        self.assertEqual(parsed.items[2][0].commands[0].args, ['echo', 'failed'])
+
+    def test_parse_redirections_and_assignments(self):
+        parsed = self.parser.parse('LANG=C sort < in 2>&1 >> out | (cd /tmp; ls) > list')
+        sort, sub = parsed.commands
+        self.assertEqual(sort.assignments[0].name, 'LANG')
+        self.assertEqual(sort.args, ['sort'])
+        self.assertEqual(sort.redirects, [Redirect(0, '<', 'in'), Redirect(2, '>&', '1'), Redirect(1, '>>', 'out')])
+        self.assertTrue(sort['append'])
+        self.assertIsInstance(sub, Subshell)
+        self.assertIsInstance(sub.body, ListNode)
+        self.assertEqual(sub['stdout'], 'list')
+
+    def test_parse_errors(self):
+        for line in ['echo "open', 'ls |', '| wc', 'echo >']:
+            with self.assertRaises(ValueError):
+                self.parser.parse(line)
+
+    def test_tokenize_substitution_is_one_word(self):
+        tokens = tokenize('echo $(ls "a b" | wc -l) `date`>x')
+        self.assertEqual([t.value for t in tokens], ['echo', '$(ls "a b" | wc -l)', '`date`', '>', 'x'])
+
+    def test_tokenize_other_whitespace_is_word_text(self):
+        self.assertEqual([t.value for t in tokenize('echo\x0cfoo')], ['echo\x0cfoo'])
+        self.assertEqual([t.value for t in tokenize('echo\u00a0foo bar')], ['echo\u00a0foo', 'bar'])
+        self.assertEqual([t.value for t in tokenize('a\x0b \x0c')], ['a\x0b', '\x0c'])
+
     def test_builtin_cd(self):
         parsed = self.parser.parse('cd /')
-        self.assertTrue(self.builtins.dispatch(parsed))
+        self.assertEqual(self.builtins.dispatch(parsed), 0)
 
     def test_builtin_alias(self):
         parsed = self.parser.parse("alias ll='ls -l'")
-        self.assertTrue(self.builtins.dispatch(parsed))
+        self.assertEqual(self.builtins.dispatch(parsed), 0)
         self.assertIn('ll', self.builtins.aliases)
 
+    def test_builtin_status(self):
+        for line in ('cd /nonexistent-dir', 'export 1x=2', 'unset NO_SUCH_VARIABLE_X', 'unalias nope'):
+            with self.subTest(line=line), contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(self.builtins.dispatch(self.parser.parse(line)), 1)
+        self.assertIsNone(self.builtins.dispatch(self.parser.parse('ls')))
+
+    def test_subshell_launch_error(self):
+        executor = CommandExecutor()
+        messages = io.StringIO()
+        with mock.patch.object(executor, '_fork_subshell', side_effect=FileNotFoundError(2, 'No such file')):
+            status, _ = executor.execute(self.parser.parse('(true) | cat'), messages=messages)
+        self.assertEqual(status, 127)
+        self.assertIn('(subshell)', messages.getvalue())
+
     def test_help(self):
         parsed = self.parser.parse('help')
-        self.assertTrue(self.builtins.dispatch(parsed))
+        self.assertEqual(self.builtins.dispatch(parsed), 0)
 
     def test_plugin_loading(self):
         # Use a temporary directory for plugins to avoid read-only errors
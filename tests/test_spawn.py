@@ -0,0 +1,60 @@
+"""
+test_spawn.py - Tests for the process launch backends.
+"""
+import os
+import tempfile
+import unittest
+from parser import CommandParser
+from executor import CommandExecutor
+from pump import Capture
+import spawn
+
+@unittest.skipUnless(spawn.HAVE_POSIX_SPAWN, "posix_spawn not available")
+class TestSpawn(unittest.TestCase):
+    def setUp(self):
+        self.parser = CommandParser()
+        self.executor = CommandExecutor(backend='posix_spawn')
+
+    def run_line(self, line):
+        capture = Capture()
+        status, _ = self.executor.execute(self.parser.parse(line), stdout=capture)
+        return status, capture.text()
+
+    def test_own_process_group(self):
+        status, out = self.run_line("sh -c 'ps -o pgid= -p $$'")
+        self.assertEqual(status, 0)
+        self.assertNotEqual(int(out), os.getpgrp())
+
+    def test_pipeline_and_status(self):
+        self.assertEqual(self.run_line('printf "b\\na\\n" | sort'), (0, 'a\nb\n'))
+        self.assertEqual(self.run_line('false')[0], 1)
+        self.assertEqual(self.run_line("sh -c 'kill -TERM $$'")[0], 128 + 15)
+
+    def test_redirect_order(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'out')
+            # stderr goes where stdout pointed before stdout was redirected
+            status, out = self.run_line(f"sh -c 'echo err >&2; echo out' 2>&1 > {path}")
+            self.assertEqual(status, 0)
+            self.assertEqual(out, 'err\n')
+            with open(path) as f:
+                self.assertEqual(f.read(), 'out\n')
+
+    def test_env_and_devnull(self):
+        status, out = self.run_line('SPAWN_TEST=1 sh -c \'echo $SPAWN_TEST; cat\' <&-')
+        self.assertEqual((status, out), (0, '1\n'))
+        os.environ['SPAWN_TEST'] = 'changed'
+        try:
+            self.assertEqual(self.run_line("sh -c 'echo $SPAWN_TEST'")[1], 'changed\n')
+        finally:
+            del os.environ['SPAWN_TEST']
+
+    def test_backends_agree(self):
+        popen = CommandExecutor(backend='popen')
+        for line in ('seq 3 | tail -n 1', 'missing-command-xyz', 'sh -c "exit 3"'):
+            capture = Capture()
+            expected = popen.execute(self.parser.parse(line), stdout=capture)[0], capture.text()
+            self.assertEqual(self.run_line(line), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+test_substitution.py - Tests for command substitution, $(...) and `...`.
+"""
+import os
+import io
+import tempfile
+import unittest
+import contextlib
+from script import ScriptInterpreter
+
+class TestCommandSubstitution(unittest.TestCase):
+    def setUp(self):
+        self.interpreter = ScriptInterpreter()
+
+    def run_script(self, source):
+        self.interpreter.run_source(source)
+        return self.interpreter.variables
+
+    def test_builtins_and_externals(self):
+        variables = self.run_script('a=$(pwd)\nb=`echo tick`\nc=$(/bin/echo ext)\nd="$(printf \'x\\n\\n\\n\')"\n')
+        self.assertEqual(variables['a'], os.getcwd())
+        self.assertEqual(variables['b'], 'tick')
+        self.assertEqual(variables['c'], 'ext')
+        # Trailing newlines are removed
+        self.assertEqual(variables['d'], 'x')
+
+    def test_nested(self):
+        self.assertEqual(self.run_script('x=$(echo $(echo in) `echo out`)\n')['x'], 'in out')
+
+    def test_quoting(self):
+        variables = self.run_script("a=$(echo '1   2')\nb=\"$(printf 'l1\\n  l2')\"\nc='$(echo no)'\n")
+        self.assertEqual(variables['a'], '1   2')
+        self.assertEqual(variables['b'], 'l1\n  l2')
+        self.assertEqual(variables['c'], '$(echo no)')
+
+    def test_functions_run_in_a_subshell_environment(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            variables = self.run_script(f'f() {{ cd {tmp}; inner=set; echo "f $1"; }}\n'
+                                        f'x=$(f arg; pwd)\n')
+            self.assertEqual(variables['x'], f'f arg\n{os.path.realpath(tmp)}')
+        self.assertNotIn('inner', variables)
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_status(self):
+        self.interpreter.run_source('x=$(false)\n')
+        self.assertEqual(self.interpreter.last_status, 1)
+        self.interpreter.run_source('x=$(true)\n')
+        self.assertEqual(self.interpreter.last_status, 0)
+
+    def test_in_arguments_and_loops(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, 'out')
+            self.interpreter.run_source(f'for i in $(seq 3); do echo "n=$(echo $i)" >> {out}; done\n'
+                                        f'cat <<EOF >> {out}\nheredoc $(echo sub) \\$(echo no)\nEOF\n')
+            with open(out) as f:
+                self.assertEqual(f.read(), 'n=1\nn=2\nn=3\nheredoc sub $(echo no)\n')
+
+    def test_capture_limit(self):
+        self.interpreter.capture_limit = 1000
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err):
+            self.run_script('x=$(head -c 100000 /dev/zero | tr "\\0" a)\n')
+        self.assertEqual(self.interpreter.variables['x'], 'a' * 1000)
+        self.assertIn('cut at 1000 bytes', err.getvalue())
+
+    def test_lists_expand_each_item_as_it_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            marker = os.path.join(tmp, 'ran')
+            variables = self.run_script(f'x=1\nx=5 && a=$x\ncd {tmp}; b=$PWD; cd {os.getcwd()}\n'
+                                        f'false && c=$(touch {marker})\ntrue || d=$(touch {marker})\n')
+            self.assertEqual((variables['a'], variables['b']), ('5', os.path.realpath(tmp)))
+            self.assertFalse(os.path.exists(marker))
+
+    def test_parsed_once_expanded_each_run(self):
+        parsed = self.interpreter.parse('echo $x "$x" > $f')
+        cmd = parsed.commands[0]
+        self.assertEqual([w for w, raw in cmd.expansions if isinstance(w, int)], [1, 2])
+        self.interpreter.variables['x'] = 'a  b'
+        self.interpreter.variables['f'] = 'out'
+        expanded = self.interpreter.expand_words(parsed).commands[0]
+        self.assertEqual(expanded.args, ['echo', 'a', 'b', 'a  b'])
+        self.assertEqual(expanded.redirects[0].target, 'out')
+        # The cached tree is left as parsed
+        self.assertEqual(cmd.args, ['echo', '$x', '$x'])
+
+    def test_assignment_status(self):
+        self.interpreter.run_source('false; x=$?\n')
+        self.assertEqual(self.interpreter.variables['x'], '1')
+        self.assertEqual(self.interpreter.last_status, 0)
+
+    def test_assignment_values_are_not_split(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, 'out')
+            variables = self.run_script(f"x=$(printf 'a\\nb\\n')\necho \"$x\" > {out}\ny='p   q'\nz=$y\nw=\"$x  $z\"\n")
+            with open(out) as f:
+                self.assertEqual(f.read(), 'a\nb\n')
+        self.assertEqual(variables['z'], 'p   q')
+        self.assertEqual(variables['w'], 'a\nb  p   q')
+
+    def test_unterminated_is_literal(self):
+        self.assertEqual(self.interpreter.expand('echo $(oops'), 'echo $(oops')
+
+if __name__ == '__main__':
+    unittest.main()
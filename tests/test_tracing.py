@@ -0,0 +1,76 @@
+"""
+test_tracing.py - Tests for execution tracing, Chrome trace export and set -x.
+"""
+import io
+import os
+import json
+import tempfile
+import unittest
+import contextlib
+from tracing import Tracer, TRACER, NO_SPAN
+
+class TestTracer(unittest.TestCase):
+    def test_inactive_records_nothing(self):
+        tracer = Tracer()
+        with tracer.span('parse') as span:
+            span.set(status=0)
+        self.assertIs(tracer.span('parse'), NO_SPAN)
+        self.assertEqual(tracer.events, [])
+
+    def test_chrome_export(self):
+        tracer = Tracer()
+        tracer.start()
+        with tracer.span('wait', pid=42) as span:
+            span.set(status=1)
+        with self.assertRaises(ValueError):
+            with tracer.span('parse'):
+                raise ValueError('bad')
+        tracer.stop()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.json')
+            self.assertEqual(tracer.export(path), 2)
+            with open(path) as f:
+                events = json.load(f)['traceEvents']
+        spans = [e for e in events if e['ph'] == 'X']
+        self.assertEqual([e['name'] for e in spans], ['wait', 'parse'])
+        self.assertEqual(spans[0]['args'], {'pid': 42, 'status': 1})
+        self.assertEqual(spans[1]['args'], {'error': 'ValueError'})
+        self.assertTrue(all(e['dur'] >= 0 for e in spans))
+
+    def test_builtin(self):
+        tracer = Tracer()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(tracer.builtin(['start']), 0)
+            with tracer.span('execute'):
+                pass
+            self.assertEqual(tracer.builtin(['summary']), 0)
+            self.assertEqual(tracer.builtin(['stop']), 0)
+            self.assertEqual(tracer.builtin(['bogus']), 2)
+        self.assertIn('execute', out.getvalue())
+        self.assertIn('Usage: trace', out.getvalue())
+
+class TestShellTracing(unittest.TestCase):
+    def setUp(self):
+        from script import ScriptInterpreter
+        self.interp = ScriptInterpreter()
+        self.addCleanup(TRACER.stop)
+        self.addCleanup(setattr, TRACER, 'xtrace', False)
+
+    def test_execute_spans(self):
+        TRACER.start()
+        self.interp.run_source('/bin/true | /bin/true\n')
+        names = [e[0] for e in TRACER.events]
+        self.assertIn('execute', names)
+        self.assertEqual(names.count('spawn'), 2)
+        self.assertEqual(names.count('wait'), 2)
+
+    def test_set_x(self):
+        err = io.StringIO()
+        with contextlib.redirect_stderr(err), contextlib.redirect_stdout(io.StringIO()):
+            self.interp.run_source('set -x\necho "a b" hi\nset +x\necho quiet\n')
+        self.assertIn("+ echo 'a b' hi\n", err.getvalue())
+        self.assertNotIn('quiet', err.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+test_variables.py - Tests for shell variables, scopes, export and ${...} expansion.
+"""
+import os
+import tempfile
+import unittest
+from variables import VariableStore
+from nodes import Assignment
+from spawn import current_environ
+from script import ScriptInterpreter
+
+class TestVariableStore(unittest.TestCase):
+    def setUp(self):
+        self.store = VariableStore()
+        self.names = ['VARSTORE_A', 'VARSTORE_B']
+
+    def tearDown(self):
+        for name in self.names:
+            os.environ.pop(name, None)
+
+    def test_shell_variables_stay_out_of_the_environment(self):
+        environ = current_environ()
+        self.store.set('VARSTORE_A', '1')
+        self.assertEqual(self.store['VARSTORE_A'], '1')
+        self.assertNotIn('VARSTORE_A', os.environ)
+        # The cached block is still valid
+        self.assertIs(current_environ(), environ)
+
+    def test_export(self):
+        self.store.set('VARSTORE_A', '1')
+        self.store.export('VARSTORE_A')
+        self.assertEqual(os.environ['VARSTORE_A'], '1')
+        self.store.set('VARSTORE_A', '2')
+        self.assertEqual(os.environ['VARSTORE_A'], '2')
+        # Exported before it has a value
+        self.store.export('VARSTORE_B')
+        self.assertNotIn('VARSTORE_B', os.environ)
+        self.store.set('VARSTORE_B', 'later')
+        self.assertEqual(os.environ['VARSTORE_B'], 'later')
+        self.assertTrue(self.store.unset('VARSTORE_B'))
+        self.assertNotIn('VARSTORE_B', os.environ)
+        self.assertFalse(self.store.unset('VARSTORE_B'))
+
+    def test_local_scopes(self):
+        self.assertFalse(self.store.local('x', 'no'))
+        self.store.set('x', 'global')
+        self.store.push_scope()
+        self.store.local('x', 'local')
+        self.store.set('x', 'changed')
+        self.assertEqual(self.store['x'], 'changed')
+        self.store.pop_scope()
+        self.assertEqual(self.store['x'], 'global')
+
+    def test_prefix_assignments_overlay_a_copy(self):
+        environ = current_environ()
+        env = self.store.environ([Assignment('VARSTORE_A', 'x')])
+        self.assertEqual(env[b'VARSTORE_A'], b'x')
+        self.assertNotIn(b'VARSTORE_A', environ)
+        self.assertIs(self.store.environ(), environ)
+
+    def test_snapshot_restore(self):
+        saved = self.store.snapshot()
+        self.store.set('x', '1')
+        self.store.export('VARSTORE_A', '2')
+        self.store.restore(saved)
+        self.assertNotIn('x', self.store)
+        self.assertNotIn('VARSTORE_A', os.environ)
+
+class TestScripts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.out = os.path.join(self.tmp.name, 'out')
+        self.interpreter = ScriptInterpreter()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        os.environ.pop('VARSTORE_X', None)
+
+    def run_script(self, source):
+        self.interpreter.run_source(source.replace('OUT', self.out))
+        with open(self.out) as f:
+            return f.read()
+
+    def test_parameter_expansion(self):
+        self.assertEqual(self.run_script('x=abc\ne=\necho "${x:-d} ${nope:-two words} ${e-u}|${e:+alt}${x:+alt} ${#x}" > OUT\n'),
+                         'abc two words |alt 3\n')
+        self.assertEqual(self.run_script('echo ${y:=set} $y "${1-none}" > OUT\n'), 'set set none\n')
+
+    def test_export_and_prefix(self):
+        script = ('VARSTORE_X=shell\nsh -c \'echo "[$VARSTORE_X]"\' > OUT\n'
+                  'VARSTORE_X=prefix sh -c \'echo "[$VARSTORE_X]"\' >> OUT\n'
+                  'export VARSTORE_X\nsh -c \'echo "[$VARSTORE_X]"\' >> OUT\n')
+        self.assertEqual(self.run_script(script), '[]\n[prefix]\n[shell]\n')
+        self.assertEqual(self.interpreter.variables['VARSTORE_X'], 'shell')
+
+    def test_local(self):
+        script = 'x=global\nf() { local x=inner; g; }\ng() { echo $x > OUT; }\nf\necho $x >> OUT\n'
+        self.assertEqual(self.run_script(script), 'inner\nglobal\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,10 @@
 """
 default.py - Default prompt theme for the advanced Python shell.
 """
-import os
-import datetime
-import subprocess
+from prompt import PromptEngine
+
+PROMPT = "myshell:{cwd} ({git}) [{time}]$ "
+engine = PromptEngine()
 
 def get_prompt():
-    cwd = os.getcwd()
-    now = datetime.datetime.now().strftime('%H:%M:%S')
-    git = ''
-    try:
-        git = subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
-    except Exception:
-        pass
-    return f"myshell:{cwd} ({git}) [{now}]$ " 
\ No newline at end of file
+    return engine.render(PROMPT)
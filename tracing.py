@@ -0,0 +1,163 @@
+"""
+tracing.py - Execution tracing for the advanced Python shell.
+
+The shell marks its stages -- read line, history expansion, parse, builtin
+and plugin dispatch, spawn, wait and hooks -- as spans on the module-level
+TRACER. Timestamps come from time.perf_counter_ns(), so they are monotonic.
+While tracing is off, span() returns one shared no-op object and nothing is
+recorded, so the instrumentation costs a method call per stage.
+
+    trace start [FILE]    record spans (FILE gets them at 'trace stop' or exit)
+    trace stop            stop recording and write FILE
+    trace dump FILE       write what was recorded so far
+    trace summary         count, total and max time per stage
+    set -x / set +x       print each command before it runs ('+ cmd'), with
+                          the seconds since 'trace start' while recording
+
+Files are Chrome trace-event JSON: open them in chrome://tracing or
+https://ui.perfetto.dev for a flame chart per thread. 'myshell.py --trace
+FILE' (or MYSHELL_TRACE=FILE) records a whole session or script.
+"""
+import os
+import sys
+import shlex
+import threading
+from time import perf_counter_ns
+
+class _NoSpan:
+    """What span() returns while tracing is off."""
+    __slots__ = ()
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return None
+    def set(self, **args):
+        pass
+
+NO_SPAN = _NoSpan()
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'cat', 'args', 'start')
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        end = perf_counter_ns()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.record(self.name, self.cat, self.start, end, self.args)
+        return None
+    def set(self, **args):
+        """Attach more arguments once they are known (e.g. an exit status)."""
+        self.args.update(args)
+
+class Tracer:
+    """Collects completed spans and prints the set -x trace."""
+    def __init__(self, max_events=1000000):
+        self.active = False
+        self.xtrace = False
+        self.path = None
+        self.max_events = max_events
+        self.events = []        # (name, cat, start ns, end ns, thread id, args)
+        self.dropped = 0
+        self.origin = perf_counter_ns()
+    def start(self, path=None):
+        self.events = []
+        self.dropped = 0
+        self.origin = perf_counter_ns()
+        self.path = path
+        self.active = True
+    def stop(self):
+        """Stop recording; write the trace file if one was given. Returns its path or None."""
+        self.active = False
+        path, self.path = self.path, None
+        if path:
+            self.export(path)
+        return path
+    def span(self, name, cat='shell', **args):
+        if not self.active:
+            return NO_SPAN
+        return _Span(self, name, cat, args)
+    def record(self, name, cat, start, end, args):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        # list.append is atomic, so worker threads can record too
+        self.events.append((name, cat, start, end, threading.get_native_id(), args))
+    # ----- set -x -----
+    def xtrace_pipeline(self, pipeline):
+        """Print '+ words' for each stage of a pipeline about to run."""
+        prefix = '+ '
+        if self.active:
+            prefix = f"+ {(perf_counter_ns() - self.origin) / 1e9:.6f} "
+        lines = []
+        for cmd in pipeline.commands:
+            args = getattr(cmd, 'args', None)
+            if args:
+                assignments = [f"{a.name}={shlex.quote(a.value)}" for a in cmd.assignments]
+                lines.append(prefix + ' '.join(assignments + [shlex.quote(a) for a in args]) + '\n')
+        if lines:
+            sys.stdout.flush()
+            sys.stderr.write(''.join(lines))
+            sys.stderr.flush()
+    # ----- output -----
+    def chrome_events(self):
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'myshell'}}]
+        for name, cat, start, end, tid, args in self.events:
+            event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': (start - self.origin) / 1000, 'dur': (end - start) / 1000}
+            if args:
+                event['args'] = {k: v if isinstance(v, (int, float, bool)) or v is None else str(v)
+                                 for k, v in args.items()}
+            events.append(event)
+        return events
+    def export(self, path):
+        """Write the recorded spans as Chrome trace-event JSON."""
+        import json
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.chrome_events(), 'displayTimeUnit': 'ms'}, f)
+        return len(self.events)
+    def summary(self):
+        totals = {}
+        for name, _, start, end, _, _ in self.events:
+            count, total, longest = totals.get(name, (0, 0, 0))
+            totals[name] = (count + 1, total + end - start, max(longest, end - start))
+        lines = [f"{'stage':<16} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+        for name, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<16} {count:>7} {total / 1e6:>10.3f} {total / count / 1e6:>9.3f} {longest / 1e6:>9.3f}")
+        if self.dropped:
+            lines.append(f"{self.dropped} spans dropped (over {self.max_events})")
+        return '\n'.join(lines)
+    # ----- the trace builtin -----
+    def builtin(self, args):
+        """trace start [FILE] | trace stop | trace dump FILE | trace summary"""
+        op = args[0] if args else 'summary'
+        try:
+            if op == 'start' and len(args) <= 2:
+                self.start(os.path.abspath(args[1]) if len(args) == 2 else None)
+                return 0
+            if op == 'stop' and len(args) == 1:
+                count = len(self.events)
+                path = self.stop()
+                if path:
+                    print(f"trace: wrote {count} spans to {path}")
+                return 0
+            if op == 'dump' and len(args) == 2:
+                print(f"trace: wrote {self.export(args[1])} spans to {args[1]}")
+                return 0
+            if op == 'summary' and len(args) <= 1:
+                print(self.summary())
+                return 0
+        except OSError as e:
+            print(f"trace: {e}")
+            return 1
+        print("Usage: trace start [FILE] | trace stop | trace dump FILE | trace summary")
+        return 2
+
+TRACER = Tracer()
@@ -1,7 +1,31 @@
 """
 utils.py - Utility functions for the advanced Python shell.
 """
+import sys
+import time
+
+SHELL_VERSION = '1.0.0'
 
 def shell_print(msg):
     """Print a message to the shell (placeholder for advanced formatting)."""
-    print(msg) 
\ No newline at end of file
+    print(msg)
+
+class StartupProfile:
+    """Wall-clock time of each startup phase, printed by --profile-startup."""
+    def __init__(self, start=None, enabled=True):
+        self.start = self.last = time.perf_counter() if start is None else start
+        self.enabled = enabled
+        self.phases = []
+    def mark(self, phase):
+        """End the current phase, naming it phase."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+    def report(self, file=None):
+        if not self.enabled:
+            return
+        file = file or sys.stderr
+        print("startup profile (from the start of myshell.py, ms):", file=file)
+        for phase, seconds in self.phases:
+            print(f"  {phase:<14} {seconds * 1000:8.2f}", file=file)
+        print(f"  {'total':<14} {(self.last - self.start) * 1000:8.2f}", file=file)
@@ -0,0 +1,115 @@
+"""
+variables.py - Shell variables, function-local scopes and the exported environment for the advanced Python shell.
+
+    x=1              a shell variable; children do not see it
+    export x         exported: children see it from now on
+    export y=2       set and export
+    local z=3        local to the running function call
+    unset x
+    VAR=val cmd      VAR is in cmd's environment only
+
+Exported variables live in os.environ, so Python code in the shell (the
+$PATH table, ~ expansion, plugins) sees them; variables inherited from the
+environment are exported. Shell and local variables never touch it, so
+assigning them costs no putenv.
+
+Children are spawned with spawn.py's bytes snapshot of os.environ, which
+is only copied again after an exported variable changed. A command's
+prefix assignments are laid over a copy of that dict, which is a C-level
+copy, not a re-encoding of the environment.
+"""
+import os
+from spawn import current_environ
+
+class VariableStore:
+    """Shell variables in a global scope and one scope per running function call."""
+    def __init__(self):
+        self.scopes = [{}]          # [globals, locals of each function call, innermost last]
+        self.exported = set()       # exported with no value yet ("export NAME")
+    # ----- lookups -----
+    def get(self, name, default=None):
+        scopes = self.scopes
+        for i in range(len(scopes) - 1, -1, -1):
+            scope = scopes[i]
+            if name in scope:
+                return scope[name]
+        return os.environ.get(name, default)
+    def __getitem__(self, name):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+    def __contains__(self, name):
+        return self.get(name) is not None
+    # ----- changes -----
+    def set(self, name, value):
+        """Assign to the innermost local of that name, else to the global (exported if it is)."""
+        scopes = self.scopes
+        for i in range(len(scopes) - 1, 0, -1):
+            if name in scopes[i]:
+                scopes[i][name] = value
+                return
+        if name in os.environ or name in self.exported:
+            self.exported.discard(name)
+            scopes[0].pop(name, None)
+            os.environ[name] = value
+        else:
+            scopes[0][name] = value
+    __setitem__ = set
+    def export(self, name, value=None):
+        """Export name, with value if given, else with its current value (or once it gets one)."""
+        if value is None:
+            value = self.scopes[0].pop(name, None)
+            if value is None:
+                if name not in os.environ:
+                    self.exported.add(name)
+                return
+        else:
+            self.scopes[0].pop(name, None)
+        self.exported.discard(name)
+        os.environ[name] = value
+    def local(self, name, value=''):
+        """Declare name in the running function call. False outside a function."""
+        if len(self.scopes) < 2:
+            return False
+        self.scopes[-1][name] = value
+        return True
+    def unset(self, name):
+        """Remove the innermost variable of that name. False if there was none."""
+        self.exported.discard(name)
+        scopes = self.scopes
+        for i in range(len(scopes) - 1, -1, -1):
+            if name in scopes[i]:
+                del scopes[i][name]
+                return True
+        if name in os.environ:
+            del os.environ[name]
+            return True
+        return False
+    # ----- function calls -----
+    def push_scope(self):
+        self.scopes.append({})
+    def pop_scope(self):
+        if len(self.scopes) > 1:
+            self.scopes.pop()
+    # ----- the environment of children -----
+    def environ(self, assignments=()):
+        """The bytes environment block to spawn with, plus a command's prefix assignments."""
+        env = current_environ()
+        if assignments:
+            env = dict(env)
+            for a in assignments:
+                env[os.fsencode(a.name)] = os.fsencode(a.value)
+        return env
+    # ----- subshell emulation -----
+    def snapshot(self):
+        """State that restore() puts back: a $(...) runs in-process but must not leak changes."""
+        return [dict(scope) for scope in self.scopes], set(self.exported), current_environ()
+    def restore(self, saved):
+        scopes, exported, environ = saved
+        self.scopes = [dict(scope) for scope in scopes]
+        self.exported = set(exported)
+        # current_environ() returns the same object until os.environ changes
+        if current_environ() is not environ:
+            os.environb.clear()
+            os.environb.update(environ)